@@ -1,4 +1,7 @@
+import time
+
 import streamlit as st
+from utils.scheduler import get_refresh_scheduler
 
 for k, v in st.session_state.items():
     st.session_state[k] = v
@@ -11,5 +14,19 @@ st.set_page_config(
 
 )
 
+# Data is refreshed ahead of and after each gameweek deadline on a background thread
+get_refresh_scheduler()
+
 pg = st.navigation([st.Page("team.py", title='Team Selection'), st.Page("player.py", title='Player Comparison')])
-pg.run()
\ No newline at end of file
+pg.run()
+with st.sidebar.expander("Data & Cache Status"):
+    from utils.registry import loaded_datasets
+    from utils.figure_cache import get_figure_cache
+
+    st.dataframe(loaded_datasets(), hide_index=True)
+    scheduler = get_refresh_scheduler()
+    st.caption("Next data refresh: {} UTC{}".format(
+        time.strftime("%a %d %b %H:%M", time.gmtime(scheduler.next_refresh())),
+        f" (last refresh failed: {', '.join(scheduler.last_errors)})" if scheduler.last_errors else "",
+    ))
+    st.caption("Figure cache: {hits} hits, {misses} misses, {entries} figures, {bytes:,} bytes".format(**get_figure_cache().stats()))
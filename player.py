@@ -1,91 +1,52 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
 import numpy as np
 from copy import copy
-from PIL import Image
-import requests
-from io import BytesIO
-from sklearn.preprocessing import StandardScaler
-from scipy.spatial.distance import cdist
-import umap
 
 # repo
-from utils.data_loader import load_player_data_from_api, load_gameweek_data_from_github
+from utils.constants import SEASON
+from utils.data_loader import load_player_data_from_api, load_element_summary
+from utils.identity import load_player_identity
+from utils.similarity import load_similarity_table
+from utils.residuals import load_residual_stats
+from utils.photo_cache import get_photo_cache
 from visualizations import plot_transfers_in_out_by_player, plot_fpl_performance_funnel, plot_gw_performance_by_player, radar_chart_player_comparison
 
+def show_past_seasons(player):
+    # previous Premier League seasons of the player, from the element-summary store
+    past = history_past[history_past['element'] == player] if not history_past.empty else history_past
+    if past.empty:
+        st.caption("No previous seasons on record yet.")
+        return
+    st.dataframe(
+        past[['season_name', 'total_points', 'minutes', 'end_cost']].assign(end_cost=lambda d: d['end_cost'] / 10),
+        hide_index=True,
+        column_config={
+            "season_name": "Season",
+            "total_points": "Points",
+            "minutes": "Minutes",
+            "end_cost": st.column_config.NumberColumn("End Price", format="£%.1fm"),
+        },
+    )
+
 def format_keys(metrics):
     formatted_keys =  [' '.join(word.capitalize() for word in metric.split('_')) for metric in metrics]
     # formatted_keys = [k.replace(' ', '\n') for k in formatted_keys]
     return formatted_keys
 
-def get_prof_pic(image_url):
-    response = requests.get(image_url)
-    if response.status_code == 200:
-        image = Image.open(BytesIO(response.content))
-        return image
-    else:
-        print(f"Failed to fetch image. HTTP Status Code: {response.status_code}")
-        return Image.fromarray(np.zeros((110,140,3), dtype=np.uint8))
-
-@st.cache_data()
-def get_similar_players(df_new: pd.DataFrame, player_name:str, target_position=None, top_n: int = 5):
-    
-    """Returns top_n similar players based on the player input. Uses UMAP for dimensional reduction and euclidean distance to find similarities
-       Requires sklearn, scipy and umap modules.   
-    """
-    df = df_new.copy()
-
-    df["now_cost_m"] = df["now_cost"]/10
-    
-    # target_position = df[df.web_name == player_name].position.values[0]
-    # df[df.web_name == 'Havertz'].position.values[0]
-
-    if target_position == 'GKP':
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_conceded", "clean_sheets", "ict_index"]
-    elif target_position == 'DEF':
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_conceded", "clean_sheets", "assists", "creativity", "goals_scored", "ict_index"]
-    elif target_position == "MID":
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_scored", "assists", "creativity", "influence", "threat", "goals_conceded", "clean_sheets", "ict_index"]
-    else:
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_scored", "assists", "creativity", "influence", "threat", "ict_index"]
-    metadata = ['full_name', 'position']
-    filtered_data = df[metadata + numeric_features].dropna()
-    
-    scaler = StandardScaler()
-    normalized_features = scaler.fit_transform(filtered_data[numeric_features])
-
-    umap_reducer = umap.UMAP(n_neighbors=5, min_dist=0.1, n_components=2, random_state=1337)
-    umap_features = umap_reducer.fit_transform(normalized_features)
-
-    distance_matrix_umap = cdist(umap_features, umap_features, metric='euclidean')
-
-    distance_df_umap = pd.DataFrame(distance_matrix_umap, index=filtered_data['full_name'], columns=filtered_data['full_name'])
-
-    if player_name not in distance_df_umap.index:
-        return f"Player '{player_name}' not found in the dataset."
-
-    same_position_players = df[df['position'] == target_position]['full_name']
-    distances = distance_df_umap.loc[player_name, same_position_players]
-
-    # Normalize similarity scores (invert distances and normalize)
-    similarity_scores = 1 / (1 + distances)  # Invert distances to get similarity
-    normalized_scores = (similarity_scores - similarity_scores.min()) / (similarity_scores.max() - similarity_scores.min())
-
-    # Get top N most similar players (excluding the player itself)
-    similar_players = normalized_scores.sort_values(ascending=False)[1:top_n + 1]  # Exclude self (similarity = 1)
-
-    return similar_players
-
 ############################
 df = load_player_data_from_api()
+history_past = load_element_summary('history_past')
 
-year = '2024-25'
-df_gh = load_gameweek_data_from_github(year)
+year = SEASON
+identity = load_player_identity(year)
 
-# players = df.name.values.tolist()
-players = sorted(df.full_name.values.tolist())
+# Player keys ordered by name; widgets display the name but hold the key
+players = identity.keys_by_name()
+
+# Photos are served from the local thumbnail cache; missing ones download in the background
+photo_cache = get_photo_cache()
+photo_cache.prefetch(df['photo_url'])
 
 BUDGET = 100
 ############################################
@@ -100,6 +61,9 @@ class Dashboard(object):
 
     def create_field(self, col_num):
         
+        import matplotlib.pyplot as plt
+        import matplotlib.image as mpimg
+
         with self.col[col_num]:
             img = mpimg.imread("../data/dark_field.png")  # Assume you have an image of the field in the same directory
             fig, ax = plt.subplots(figsize=(3,3), frameon=False)
@@ -141,6 +105,7 @@ with dash.col[0]:
     player0 = st.selectbox(
         "Select first player:",
         players,
+        format_func=identity.name,
         index=None, #default value for user not come to an empty page, required
         key='p0'
     )
@@ -149,21 +114,37 @@ with dash.col[2]:
     player1 = st.selectbox(
         "Select second player:",
         players,
+        format_func=identity.name,
         index=None, #default value for user not come to an empty page, not required
         key='p1'
     )
 
 if (player0 is not None and player1 is None) or (player0 is None and player1 is not None):
     player = copy(player0 if player0 is not None else player1)
-    player_position = str(df[df.full_name==player].position.values[0])
-    sim_players = get_similar_players(df, player, target_position=player_position, top_n=5)
+    player_name = identity.name(player)
+    similarity_table = load_similarity_table()
 
     with dash.col[1]:
-        sim_players_df = pd.DataFrame(sim_players)
-        sim_players_df = sim_players_df.reset_index()
-        sim_players_df.rename(columns={"full_name": "Similar Players", player: 'Similarity Score'}, inplace=True)
-        sim_players_df.set_index('Similar Players', inplace=True)
-        st.write(sim_players_df)
+        if similarity_table is None:
+            st.info("Similar players are being computed, they will appear on the next refresh.")
+        elif player in similarity_table:
+            sim_players = similarity_table.similar(player, top_n=5)
+            sim_players_df = sim_players.to_frame()
+            sim_players_df.index = sim_players_df.index.map(identity.name).rename('Similar Players')
+            st.write(sim_players_df)
+
+            export_df = similarity_table.table.assign(
+                player=lambda d: d['player_key'].map(identity.name),
+                neighbour=lambda d: d['neighbour_key'].map(identity.name),
+            )
+            st.download_button(
+                "Download all similarities",
+                export_df.to_csv(index=False),
+                file_name="similar_players.csv",
+                mime="text/csv",
+            )
+        else:
+            st.write(f"Player '{player_name}' not found in the dataset.")
 
 if player0 is not None and player1 is not None:
 
@@ -171,6 +152,7 @@ if player0 is not None and player1 is not None:
     st.session_state.selected_player0 = player0
     st.session_state.selected_player1 = player1
     selected_players = [st.session_state.selected_player0, st.session_state.selected_player1]
+    player0_name, player1_name = identity.name(player0), identity.name(player1)
 
     ############################## create demo charts
     pie_data=[]
@@ -181,8 +163,8 @@ if player0 is not None and player1 is not None:
     metrics_formatted = format_keys(metrics)
 
     with dash.col[0]:
-        st.markdown(f'#### {st.session_state.selected_player0}', unsafe_allow_html=True)
-        url0 = df[df.full_name==st.session_state.selected_player0].photo_url.values[0]
+        st.markdown(f'#### {player0_name}', unsafe_allow_html=True)
+        url0 = photo_cache.data_uri(identity.players.at[player0, 'photo_url'])
         st.markdown(
             f"""
             <div style="text-align: center;">
@@ -193,15 +175,20 @@ if player0 is not None and player1 is not None:
         )
 
         # transfers plot
-        plot_transfers_in_out_by_player(player0, df_gh)
+        plot_transfers_in_out_by_player(player0_name, identity.gameweeks(player0))
 
         st.divider()
 
-        plot_gw_performance_by_player(player0, df_gh)
+        plot_gw_performance_by_player(player0_name, identity.gameweeks(player0))
+
+        st.divider()
+
+        st.markdown('##### Past Seasons')
+        show_past_seasons(player0)
 
     with dash.col[2]:
-        st.markdown(f'#### {st.session_state.selected_player1}', unsafe_allow_html=True)
-        url1 = df[df.full_name==st.session_state.selected_player1].photo_url.values[0]
+        st.markdown(f'#### {player1_name}', unsafe_allow_html=True)
+        url1 = photo_cache.data_uri(identity.players.at[player1, 'photo_url'])
         st.markdown(
             f"""
             <div style="text-align: center;">
@@ -212,20 +199,24 @@ if player0 is not None and player1 is not None:
         )
 
         # transfers plot
-        plot_transfers_in_out_by_player(player1, df_gh)
+        plot_transfers_in_out_by_player(player1_name, identity.gameweeks(player1))
+
+        st.divider()
+
+        plot_gw_performance_by_player(player1_name, identity.gameweeks(player1))
 
         st.divider()
 
-        plot_gw_performance_by_player(player1, df_gh)
+        st.markdown('##### Past Seasons')
+        show_past_seasons(player1)
 
     with dash.col[1]:
-        radar_chart_player_comparison(df, player0, player1, 
+        radar_chart_player_comparison(df, player0_name, player1_name, 
                                        metrics = ['total_points', 'minutes', 'goals_scored', 
                                                   'assists', 'goals_conceded', 'clean_sheets', 'selected_by_percent'])
         st.divider()
 
     with dash.col[1]:
         # julian's plot
-        plot_fpl_performance_funnel(df_gh, [player0, player1], player='name',
-                                total_points_column='total_points', xp_column='xP')
+        plot_fpl_performance_funnel(load_residual_stats(year), [player0, player1])
         
\ No newline at end of file
@@ -0,0 +1,408 @@
+# benchmark.py
+"""
+Times the app's data transforms, team computations, prediction lookups and figure builders on
+synthetic data at several scales, records their peak memory, and compares results between commits.
+
+The data comes from scripts/synthetic_data.py. It is the bundled players and predictions
+scaled to each `--scale` (a multiple of the bundled players), with `--seasons` seasons of
+gameweeks, so nothing is downloaded. Each benchmark runs once to warm up, then up to
+`--repeat` times. The fastest run and the median run are kept. A last run under tracemalloc
+gives the peak memory that Python and numpy allocated. A benchmark whose optional dependency
+is missing (umap, matplotlib) is recorded as skipped, and one that fails is recorded with its
+error. Neither stops the suite.
+
+Usage, from the repository root:
+
+    python scripts/benchmark.py                            # 1x and 10x, written to benchmark_results/<commit>.json
+    python scripts/benchmark.py --scale 1 10 100 --seasons 3 --only team. figures. --max-memory 4000
+    python scripts/benchmark.py --compare benchmark_results/abc1234.json   # run, then compare with an older run
+    python scripts/benchmark.py --compare old.json new.json                # compare two saved runs
+
+When comparing, exits with status 1 if a benchmark's fastest run is more than `--threshold`
+times the old one.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import plotly.io as pio
+import streamlit.logger
+from streamlit import config
+from synthetic_data import generate
+from utils.constants import BUDGET, SEASON
+from utils.captaincy import rank_captains
+from utils.data_loader import build_player_table, add_derived_metrics, build_fixture_table, prepare_gameweek_data
+from utils.gameweek_store import _write_partition, read_gameweeks
+from utils.identity import PlayerIdentity
+from utils.normalization import remove_accents, name_key
+from utils.points_model import predict_points
+from utils.predictions import PredictionIndex
+from utils.registry import fingerprint
+from utils.residuals import residual_stats
+from utils.schema import apply_schema, GAMEWEEK_SCHEMA
+from utils.similarity import SimilarityModel, SIMILARITY_FEATURES, _position_features
+from utils.simulation import PointsSimulator, simulate_teams
+from utils.team_computation import get_top_players_by_position, optimize_team, optimize_squad, adjust_team_to_budget
+from utils.transfer_planner import prediction_horizon, plan_transfers
+import visualizations
+
+RESULTS_DIR = os.path.join(ROOT, "benchmark_results")
+PACKAGES = ['numpy', 'pandas', 'scipy', 'scikit-learn', 'plotly', 'streamlit']
+FORMATION = '4-4-2'
+HORIZON = 5  # Gameweeks planned by the transfer planner
+LOOKUPS = 1000  # Player lookups per lookup benchmark
+MAX_SECONDS = 10  # A benchmark stops repeating once its runs add up to this
+MIN_CHANGE_MS = 1.0  # Smaller differences are timer noise, never a regression
+
+
+def _quiet_streamlit():
+    """Silences Streamlit's warnings about rendering without a session, which every chart would print."""
+    config.get_option('logger.level')  # Parsing the config resets the log level, so parse it first
+    streamlit.logger.set_log_level('error')
+
+
+def _clear_name_caches():
+    """Empties the memoized name normalization, so each run pays for it as a fresh process would."""
+    remove_accents.cache_clear()
+    name_key.cache_clear()
+    return ()
+
+
+def _similarity_model(players):
+    """
+    Returns a similarity model of the players: UMAP embeddings if umap is installed, otherwise
+    a random 2-D projection of the same features. Queries cost the same on either.
+    """
+    try:
+        return SimilarityModel.fit(players), 'umap'
+    except ImportError:
+        rng = np.random.default_rng(0)
+        embeddings = {}
+        for position, features in SIMILARITY_FEATURES.items():
+            ids, values = _position_features(players, position)
+            values = (values - values.mean(axis=0)) / (values.std(axis=0) + 1e-9)
+            embeddings[position] = (ids, (values @ rng.normal(size=(len(features), 2))).astype(np.float32))
+        return SimilarityModel(embeddings), 'random projection'
+
+
+def prepare(scale, n_seasons, seed, root):
+    """
+    Generates the synthetic data of one scale and the intermediate results the benchmarks start from.
+
+    Parameters:
+    - scale (int): Multiple of the bundled number of players.
+    - n_seasons (int): Seasons of gameweek rows.
+    - seed (int): Seed of the generator.
+    - root (str): Directory the gameweek store is written to.
+
+    Returns:
+    - data (dict): Raw payloads, built tables and fitted models, by name.
+    """
+    data = generate(scale, n_seasons, SEASON, seed)
+    data['root'] = root
+    data['player_table'] = build_player_table(data['bootstrap'])
+    data['player_data'] = add_derived_metrics(data['player_table'])
+    data['seasons'] = {season: prepare_gameweek_data(raw.copy()) for season, raw in data['gameweeks'].items()}
+    for season, frame in data['seasons'].items():
+        for gw, rows in frame.groupby('GW', observed=True):
+            _write_partition(rows, season, int(gw), root)
+    season = data['season'] = data['seasons'][SEASON]
+    players = data['player_data']
+
+    identity = data['identity'] = PlayerIdentity(players, season, data['predictions'])
+    index = data['index'] = PredictionIndex(data['predictions'], identity.prediction_keys)
+    data['residual_stats'] = residual_stats(season, identity.gameweek_keys).join(
+        identity.players[['full_name', 'position']], how='left')
+    data['simulator'] = PointsSimulator.fit(season, identity.gameweek_keys, identity.players['position'])
+    data['similarity'], data['embedding'] = _similarity_model(players)
+
+    data['top_team'] = get_top_players_by_position(players, FORMATION)
+    xi, bench = optimize_squad(players, FORMATION, BUDGET)
+    data['xi'], data['squad'] = xi, xi + bench
+    data['expected'] = {player['id']: float(points) for player, points in zip(data['squad'], index.predict_team(data['squad']))}
+    start_gw = int(data['predictions']['gw'].max()) + 1
+    data['horizon'] = prediction_horizon(index, players, start_gw, HORIZON)
+    data['totals'] = simulate_teams(data['simulator'], {
+        'Your Team': [player['id'] for player in data['top_team']],
+        'Best Team': [player['id'] for player in xi],
+    }, data['expected'] | {player['id']: 2.0 for player in data['top_team'] if player['id'] not in data['expected']})
+
+    ranked = players.sort_values('total_points', ascending=False)
+    data['stars'] = ranked['id'].head(2).tolist()
+    data['star_names'] = ranked['full_name'].head(2).tolist()
+    rng = np.random.default_rng(seed)
+    data['lookup_ids'] = rng.choice(players['id'].to_numpy(), LOOKUPS).tolist()
+    return data
+
+
+def cases(data):
+    """
+    Lists the benchmarks of one dataset.
+
+    Returns:
+    - cases (list of tuple): (name, run, setup); `run(*setup())` is timed, `setup()` is not.
+    """
+    players, season, index, identity = data['player_data'], data['season'], data['index'], data['identity']
+    xi, squad, top_team, stars = data['xi'], data['squad'], data['top_team'], data['stars']
+    raw_seasons = list(data['gameweeks'].values())
+    predicted = index.predict_players(players)
+    lookup_ids = data['lookup_ids']
+
+    def similar(model):
+        for player_id in lookup_ids:
+            if player_id in model:
+                model.similar(player_id, 5)
+
+    def identity_lookups():
+        for player_id in lookup_ids:
+            identity.gameweeks(player_id)
+
+    def read_all_seasons():
+        for name in data['seasons']:
+            apply_schema(read_gameweeks(name, data['root']), GAMEWEEK_SCHEMA)
+
+    return [
+        # Loaders: every transform between a downloaded payload and the shared datasets
+        ('loaders.build_player_table', lambda: build_player_table(data['bootstrap']), _clear_name_caches),
+        ('loaders.add_derived_metrics', lambda: add_derived_metrics(data['player_table']), None),
+        ('loaders.build_fixture_table', lambda: build_fixture_table(data['fixtures']), None),
+        ('loaders.prepare_gameweek_data', lambda *frames: [prepare_gameweek_data(frame) for frame in frames],
+         lambda: _clear_name_caches() + tuple(frame.copy() for frame in raw_seasons)),
+        ('loaders.read_gameweeks', read_all_seasons, None),
+        ('loaders.fingerprint', lambda: [fingerprint(frame) for frame in data['seasons'].values()], None),
+
+        # Predictions: building the indexes and looking players up in them
+        ('predictions.prediction_index', lambda: PredictionIndex(data['predictions'], identity.prediction_keys), _clear_name_caches),
+        ('predictions.predict_players', lambda: index.predict_players(players), None),
+        ('predictions.predict_team', lambda: index.predict_team(squad), None),
+        ('predictions.player_identity', lambda: PlayerIdentity(players, season, data['predictions']), _clear_name_caches),
+        ('predictions.identity_lookups', identity_lookups, None),
+        ('predictions.prediction_horizon', lambda: prediction_horizon(index, players, int(data['horizon'].columns[0]), HORIZON), None),
+        ('predictions.predict_points', lambda: predict_points(season, players, build_fixture_table(data['fixtures']), data['teams']), None),
+        ('predictions.residual_stats', lambda: residual_stats(season, identity.gameweek_keys), None),
+
+        # Team computations
+        ('team.top_players_by_position', lambda: get_top_players_by_position(players, FORMATION), None),
+        ('team.optimize_team', lambda: optimize_team(players, FORMATION, BUDGET), None),
+        ('team.optimize_squad', lambda: optimize_squad(players, FORMATION, BUDGET), None),
+        ('team.optimize_squad_predicted', lambda: optimize_squad(players, FORMATION, BUDGET, objective=predicted), None),
+        ('team.adjust_team_to_budget', lambda: adjust_team_to_budget(top_team, BUDGET * len(top_team) // 15, players), None),
+        ('team.plan_transfers', lambda: plan_transfers(squad, players, data['horizon'], BUDGET), None),
+        ('team.similarity_fit', lambda: SimilarityModel.fit(players), None),
+        ('team.similarity_neighbour_table', lambda: data['similarity'].neighbour_table(), None),
+        ('team.similarity_queries', lambda: similar(data['similarity']), None),
+        ('team.simulator_fit', lambda: PointsSimulator.fit(season, identity.gameweek_keys, identity.players['position']), None),
+        ('team.simulate_teams', lambda: simulate_teams(data['simulator'], {'Best Team': [p['id'] for p in xi]}, data['expected']), None),
+        ('team.rank_captains', lambda: rank_captains(data['simulator'], xi, [data['expected'][p['id']] for p in xi]), None),
+
+        # Figure builders, as the pages call them
+        ('figures.draw_soccer_field', lambda: visualizations.draw_soccer_field(xi, FORMATION, index), None),
+        ('figures.total_points_comparison', lambda: visualizations.plot_total_points_comparison(top_team, xi), None),
+        ('figures.team_radar_chart', lambda: visualizations.plot_team_radar_chart(top_team, xi), None),
+        ('figures.cost_breakdown_by_position', lambda: visualizations.plot_cost_breakdown_by_position(top_team, xi), None),
+        ('figures.score_distributions', lambda: visualizations.plot_score_distributions(data['totals']), None),
+        ('figures.points_vs_cost', lambda: visualizations.total_points_vs_cost_yearly_figure(players, 500), None),
+        ('figures.points_vs_cost_json', lambda: pio.to_json(visualizations.total_points_vs_cost_yearly_figure(players, 500), validate=False), None),
+        ('figures.ownership_bubble_chart', lambda: visualizations.ownership_vs_points_bubble_chart_figure(players, 10.0), None),
+        ('figures.top_roi_by_position', lambda: visualizations.top_n_roi_by_position(players, 'MID', 5), None),
+        ('figures.player_radar_comparison', lambda: visualizations.radar_chart_player_comparison(
+            players, *data['star_names'], metrics=['total_points', 'minutes', 'goals_scored', 'assists', 'goals_conceded',
+                                                   'clean_sheets', 'selected_by_percent']), None),
+        ('figures.gw_performance', lambda: visualizations.plot_gw_performance_by_player(data['star_names'][0], identity.gameweeks(stars[0])), None),
+        ('figures.transfers_in_out', lambda: visualizations.plot_transfers_in_out_by_player(data['star_names'][0], identity.gameweeks(stars[0])), None),
+        ('figures.performance_funnel', lambda: visualizations.plot_fpl_performance_funnel(data['residual_stats'], stars), None),
+        ('figures.player_vs_average', lambda: visualizations.plot_player_vs_avg_actual_points(season, data['star_names'][0]), None),
+    ]
+
+
+def measure(run, setup=None, repeat=5, max_seconds=MAX_SECONDS):
+    """
+    Times `run(*setup())`: once to warm up, up to `repeat` times, then once under tracemalloc.
+
+    Returns:
+    - result (dict): `min_ms`, `median_ms`, the number of timed `runs` and `peak_mb`; or
+      `skipped` with the import error if an optional dependency is missing.
+    """
+    setup = setup or tuple
+    try:
+        run(*setup())
+    except ImportError as e:
+        return {'skipped': str(e)}
+
+    times = []
+    while len(times) < repeat and (not times or sum(times) < max_seconds * 1000):
+        args = setup()
+        start = time.perf_counter()
+        run(*args)
+        times.append((time.perf_counter() - start) * 1000)
+
+    args = setup()
+    tracemalloc.start()
+    try:
+        run(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'min_ms': round(min(times), 3), 'median_ms': round(statistics.median(times), 3),
+            'runs': len(times), 'peak_mb': round(peak / 1024 ** 2, 3)}
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _packages():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def run_suite(scales, n_seasons=2, repeat=5, only=(), seed=0):
+    """
+    Runs every benchmark at every scale and prints one line per benchmark.
+
+    Returns:
+    - report (dict): The commit and environment, the configuration, the size of each scale's
+      data and `results` ({'<scale>x': {benchmark: result of `measure`}}).
+    """
+    report = {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'packages': _packages(),
+        'config': {'scales': scales, 'seasons': n_seasons, 'repeat': repeat, 'only': list(only), 'seed': seed},
+        'data': {},
+        'results': {},
+    }
+    for scale in scales:
+        label = f"{scale}x"
+        with tempfile.TemporaryDirectory() as root:
+            start = time.perf_counter()
+            data = prepare(scale, n_seasons, seed, root)
+            report['data'][label] = {
+                'players': len(data['player_data']),
+                'gameweek_rows': sum(len(frame) for frame in data['seasons'].values()),
+                'prediction_rows': len(data['predictions']),
+                'similarity_embedding': data['embedding'],
+            }
+            print(f"{label}: {report['data'][label]} (generated in {time.perf_counter() - start:,.1f} s)")
+
+            results = report['results'][label] = {}
+            for name, run, setup in cases(data):
+                if only and not any(pattern in name for pattern in only):
+                    continue
+                gc.collect()
+                try:
+                    result = measure(run, setup, repeat)
+                except Exception as e:  # Includes MemoryError: record it and go on with the next benchmark
+                    result = {'error': f"{type(e).__name__}: {e}"}
+                results[name] = result
+                if 'min_ms' in result:
+                    print(f"    {name:40} {result['min_ms']:11,.1f} ms  {result['median_ms']:11,.1f} ms median"
+                          f"  {result['peak_mb']:9,.1f} MB peak")
+                else:
+                    print(f"    {name:40} {result.get('skipped') or result.get('error')}")
+            del data
+    return report
+
+
+def compare(old, new, threshold):
+    """
+    Prints the change of every benchmark timed in both reports.
+
+    Returns:
+    - regressions (list of str): '<scale> <benchmark>' of those whose fastest run grew by more
+      than `threshold` times (and by at least MIN_CHANGE_MS).
+    """
+    print(f"{old.get('commit')} -> {new.get('commit')}{' (dirty)' if new.get('dirty') else ''}")
+    data_settings = [{key: report['config'].get(key) for key in ('seasons', 'seed')} for report in (old, new)]
+    if data_settings[0] != data_settings[1]:
+        print(f"Note: the data differs ({data_settings[0]} -> {data_settings[1]}), so the times are not comparable")
+    regressions = []
+    for label, results in new['results'].items():
+        for name, result in results.items():
+            before = old['results'].get(label, {}).get(name, {})
+            if 'min_ms' not in result or 'min_ms' not in before:
+                continue
+            ratio = result['min_ms'] / max(before['min_ms'], 1e-3)
+            slower = ratio > threshold and result['min_ms'] - before['min_ms'] >= MIN_CHANGE_MS
+            if slower:
+                regressions.append(f"{label} {name}")
+            flag = "SLOWER" if slower else "faster" if ratio < 1 / threshold else ""
+            print(f"{label:>5} {name:40} {before['min_ms']:11,.1f} -> {result['min_ms']:11,.1f} ms  x{ratio:5.2f}"
+                  f"  {before['peak_mb']:9,.1f} -> {result['peak_mb']:9,.1f} MB  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app's computations on synthetic data.")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="Multiples of the bundled players (default: 1 10).")
+    parser.add_argument("--seasons", type=int, default=2, help="Seasons of gameweek data per scale.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark; the fastest and the median are kept.")
+    parser.add_argument("--only", nargs="+", default=[], help="Only run benchmarks whose name contains one of these, e.g. team. figures.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument("--max-memory", type=int, metavar="MB",
+                        help="Address space limit, so a benchmark that needs more fails with MemoryError instead of being killed.")
+    parser.add_argument("--output", help="JSON file to write (default: benchmark_results/<commit>.json).")
+    parser.add_argument("--compare", nargs="+", metavar="JSON",
+                        help="An older report to compare this run with, or two reports to compare without running.")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio reported as a regression.")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes one or two reports")
+    if args.compare and len(args.compare) == 2:
+        reports = []
+        for path in args.compare:
+            with open(path) as f:
+                reports.append(json.load(f))
+    else:
+        _quiet_streamlit()
+        if args.max_memory:
+            limit = args.max_memory * 1024 ** 2
+            resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+        report = run_suite(args.scale, args.seasons, args.repeat, args.only, args.seed)
+        path = args.output or os.path.join(
+            RESULTS_DIR, f"{report['commit'] or 'results'}{'-dirty' if report['dirty'] else ''}.json")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+        if not args.compare:
+            return
+        with open(args.compare[0]) as f:
+            reports = [json.load(f), report]
+
+    regressions = compare(*reports, args.threshold)
+    if regressions:
+        print(f"FAIL: {len(regressions)} benchmark(s) over x{args.threshold}: {', '.join(regressions)}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# import_profile.py
+"""
+Measures what each Streamlit page costs to import and checks it against scripts/import_budget.json.
+
+Each page's top-level imports are run in a fresh interpreter with `-X importtime`, so the
+numbers are cold-start costs. A page fails the check if its imports take longer than its
+`max_ms` budget, or load any of its `forbidden` modules (dependencies that should only be
+imported inside the code paths that use them).
+
+Usage, from the repository root:
+
+    python scripts/import_profile.py            # profile and check every page in the budget
+    python scripts/import_profile.py team.py -n 15 --runs 5
+
+Exits with status 1 if any page is over budget.
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(ROOT, "scripts", "import_budget.json")
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def page_imports(page):
+    """Returns the source of a page's top-level import statements."""
+    with open(os.path.join(ROOT, page)) as f:
+        tree = ast.parse(f.read(), filename=page)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def _top_level_imports(stderr):
+    """Sums `-X importtime` output by top-level package, counting only modules imported directly by the code run."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match and len(match.group(3)) == 1:
+            package = match.group(4).split(".")[0]
+            modules[package] = modules.get(package, 0) + int(match.group(2)) / 1000
+    return modules
+
+
+def profile_page(page):
+    """
+    Imports a page's dependencies in a fresh interpreter.
+
+    Returns:
+    - total_ms (float): Cumulative import time of everything the page imports.
+    - modules (dict): Top-level package to cumulative milliseconds.
+    - loaded (set): Names of every module left in sys.modules.
+    """
+    code = page_imports(page) + "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the dependencies of {page} failed:\n{result.stderr[-2000:]}")
+
+    startup = _top_level_imports(subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"],
+                                                capture_output=True, text=True).stderr)
+    modules = {
+        package: ms for package, ms in _top_level_imports(result.stderr).items()
+        if package not in startup
+    }
+    loaded = set(json.loads(result.stdout.strip().splitlines()[-1]))
+    return sum(modules.values()), modules, loaded
+
+
+def check_page(page, budget, runs=3, top_n=10):
+    """Profiles a page `runs` times, keeps the fastest run, prints a report and returns whether it is within budget."""
+    total_ms, modules, loaded = min((profile_page(page) for _ in range(runs)), key=lambda run: run[0])
+    forbidden = sorted(
+        module for module in budget.get("forbidden", [])
+        if module in loaded or any(name.startswith(module + ".") for name in loaded)
+    )
+    over = total_ms > budget.get("max_ms", float("inf"))
+
+    print(f"{page}: {total_ms:,.0f} ms (budget {budget.get('max_ms', '-')} ms)")
+    for package, ms in sorted(modules.items(), key=lambda item: -item[1])[:top_n]:
+        print(f"    {ms:8,.0f} ms  {package}")
+    if over:
+        print("    FAIL: over the import-time budget")
+    if forbidden:
+        print(f"    FAIL: loads {', '.join(forbidden)} at import time")
+    return not over and not forbidden
+
+
+def main():
+    with open(BUDGET_PATH) as f:
+        budgets = json.load(f)
+
+    parser = argparse.ArgumentParser(description="Profile and check the import time of the Streamlit pages.")
+    parser.add_argument("pages", nargs="*", default=sorted(budgets), help="Pages to check (default: every page in the budget).")
+    parser.add_argument("-n", "--top", type=int, default=10, help="Number of slowest imports to list per page.")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per page; the fastest one is reported.")
+    args = parser.parse_args()
+
+    ok = [check_page(page, budgets.get(page, {}), args.runs, args.top) for page in args.pages]
+    sys.exit(0 if all(ok) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# synthetic_data.py
+"""
+Synthetic FPL data at any scale, generated offline from the bundled data/players.csv and
+data/predicted_df.csv, for the benchmark suite (scripts/benchmark.py).
+
+The bundled player table is replicated `scale` times: each copy gets new ids, a numbered
+suffix on its names and jittered statistics, so a 10x dataset has ten times the players with
+the same positions, clubs and spread of prices and points. From those players it builds what
+the app downloads: a bootstrap-static payload, a fixtures payload (a double round robin of
+the 20 clubs), the gameweek rows of one or more seasons in the GitHub dataset's columns, and
+a prediction table whose points are drawn from the bundled predictions.
+
+Everything is seeded, so the same arguments always produce the same data.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAYERS_PATH = os.path.join(ROOT, "data", "players.csv")
+PREDICTIONS_PATH = os.path.join(ROOT, "data", "predicted_df.csv")
+
+POSITIONS = {'GKP': 1, 'DEF': 2, 'MID': 3, 'FWD': 4}  # Short name -> FPL element_type
+POSITION_NAMES = {'GKP': 'Goalkeepers', 'DEF': 'Defenders', 'MID': 'Midfielders', 'FWD': 'Forwards'}
+GAMEWEEKS = 38
+CURRENT_GAMEWEEK = 30  # Gameweeks played in the current season; earlier seasons are complete
+
+# Season totals jittered between copies of a player, and turned into per-gameweek rates
+COUNT_STATS = ['total_points', 'minutes', 'goals_scored', 'assists', 'clean_sheets', 'goals_conceded',
+               'own_goals', 'penalties_saved', 'penalties_missed', 'yellow_cards', 'red_cards', 'saves',
+               'bonus', 'bps', 'starts', 'dreamteam_count', 'transfers_in', 'transfers_out']
+FLOAT_STATS = ['influence', 'creativity', 'threat', 'ict_index', 'expected_goals', 'expected_assists',
+               'expected_goal_involvements', 'expected_goals_conceded', 'form', 'points_per_game',
+               'selected_by_percent']
+
+
+def load_bundled():
+    """Returns the bundled player table and prediction table."""
+    return pd.read_csv(PLAYERS_PATH), pd.read_csv(PREDICTIONS_PATH)
+
+
+def scale_players(players, scale, seed=0):
+    """
+    Replicates the player table `scale` times.
+
+    The first copy is the bundled table unchanged. Later copies get ids after the last one, a
+    ` {copy}` suffix on `name` and `web_name`, statistics multiplied by a lognormal factor and
+    prices moved by up to 0.5m, so copies are distinct players rather than duplicates.
+
+    Parameters:
+    - players (pd.DataFrame): The bundled player table.
+    - scale (int): Number of copies.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    - players (pd.DataFrame): `scale` times as many players, ids 1..n.
+    """
+    rng = np.random.default_rng(seed)
+    players = players.reset_index(drop=True)
+    n = len(players)
+    copies = [players]
+    for copy in range(1, scale):
+        jitter = rng.lognormal(0, 0.2, (n, 1))
+        scaled = players.copy()
+        scaled['id'] = players['id'] + copy * players['id'].max()
+        scaled['name'] = players['name'] + f" {copy}"
+        scaled['web_name'] = players['web_name'] + f" {copy}"
+        counts = [column for column in COUNT_STATS if column in players]
+        floats = [column for column in FLOAT_STATS if column in players]
+        scaled[counts] = (players[counts].to_numpy(dtype=float) * jitter).round()
+        scaled[floats] = (players[floats].to_numpy(dtype=float) * jitter).round(1)
+        scaled['now_cost'] = (players['now_cost'] + rng.integers(-5, 6, n)).clip(lower=38)
+        copies.append(scaled)
+    return pd.concat(copies, ignore_index=True)
+
+
+def team_ids(players):
+    """Returns {team id: team name}, numbering the clubs alphabetically as FPL does."""
+    return {i + 1: team for i, team in enumerate(sorted(players['team'].unique()))}
+
+
+def bootstrap_payload(players):
+    """
+    Builds a bootstrap-static payload (`elements`, `element_types`, `teams`) from a player table.
+
+    `name` is split into `first_name` and `second_name` at its first space, and the player id
+    doubles as the photo `code`.
+    """
+    teams = team_ids(players)
+    ids = {team: team_id for team_id, team in teams.items()}
+    names = players['name'].str.split(' ', n=1, expand=True).reindex(columns=[0, 1]).fillna('')
+    elements = players.drop(columns=['name', 'position', 'team']).assign(
+        element_type=players['position'].map(POSITIONS),
+        team=players['team'].map(ids),
+        first_name=names[0],
+        second_name=names[1],
+        code=players['id'],
+        photo=players['id'].astype(str) + '.jpg',
+    )
+    element_types = [
+        {'id': element_type, 'plural_name_short': position, 'plural_name': POSITION_NAMES[position]}
+        for position, element_type in POSITIONS.items()
+    ]
+    return {
+        'elements': elements.astype(object).where(elements.notna(), None).to_dict('records'),
+        'element_types': element_types,
+        'teams': [{'id': team_id, 'name': team} for team_id, team in teams.items()],
+    }
+
+
+def season_start(year):
+    """Returns the kickoff of the first gameweek of a season such as '2024-25'."""
+    return pd.Timestamp(f"{year[:4]}-08-16 14:00", tz='UTC')
+
+
+def fixtures_payload(teams, year, played=GAMEWEEKS, seed=0):
+    """
+    Builds a season's fixtures payload: a double round robin with one fixture per club and gameweek.
+
+    Parameters:
+    - teams (dict): {team id: team name}.
+    - year (str): Season, e.g. '2024-25'.
+    - played (int): Gameweeks already played; their fixtures are finished and have scores.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    - fixtures (list of dict): One dict per fixture, like the FPL fixtures endpoint.
+    """
+    rng = np.random.default_rng(seed)
+    clubs = list(teams)
+    rounds = []
+    for _ in range(len(clubs) - 1):  # Circle method: every club meets every other once
+        rounds.append([(clubs[i], clubs[-1 - i]) for i in range(len(clubs) // 2)])
+        clubs = [clubs[0], clubs[-1]] + clubs[1:-1]
+    rounds += [[(away, home) for home, away in pairings] for pairings in rounds]
+    order = rng.permutation(len(rounds))
+
+    fixtures = []
+    start = season_start(year)
+    for gw, round_index in enumerate(order, start=1):
+        kickoff = (start + pd.Timedelta(weeks=gw - 1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        for home, away in rounds[round_index]:
+            finished = gw <= played
+            fixtures.append({
+                'id': len(fixtures) + 1, 'event': gw, 'team_h': home, 'team_a': away,
+                'kickoff_time': kickoff, 'finished': finished,
+                'team_h_score': int(rng.poisson(1.5)) if finished else None,
+                'team_a_score': int(rng.poisson(1.2)) if finished else None,
+            })
+    return fixtures
+
+
+def gameweek_season(players, fixtures, teams, played=GAMEWEEKS, seed=0):
+    """
+    Simulates the gameweek rows of a season, in the columns of the GitHub gameweek dataset.
+
+    Each player plays with a probability taken from their season minutes, and every per-90
+    statistic of their season totals is turned into a Poisson (or, for the expected stats, a
+    Gamma) draw per fixture, so players keep their relative output across gameweeks.
+
+    Parameters:
+    - players (pd.DataFrame): Player table from `scale_players`.
+    - fixtures (list of dict): Fixtures payload from `fixtures_payload`.
+    - teams (dict): {team id: team name}.
+    - played (int): Gameweeks to generate.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    - gameweeks (pd.DataFrame): One row per player and fixture played, `position` spelled 'GK'
+      for goalkeepers as in the source data.
+    """
+    rng = np.random.default_rng(seed)
+    fixtures = pd.DataFrame(fixtures)
+    fixtures = fixtures[fixtures['event'] <= played].rename(columns={'id': 'fixture'})
+    sides = pd.concat([
+        fixtures.assign(team_id=fixtures['team_h'], opponent_team=fixtures['team_a'], was_home=True),
+        fixtures.assign(team_id=fixtures['team_a'], opponent_team=fixtures['team_h'], was_home=False),
+    ])
+    ids = {team: team_id for team_id, team in teams.items()}
+    # Only the statistics drawn from are repeated per fixture, in float32, to bound memory at 100x
+    stats = list(dict.fromkeys(column for column in COUNT_STATS + FLOAT_STATS + ['now_cost'] if column in players))
+    players = players[['id', 'name', 'position', 'team']].assign(
+        team_id=players['team'].map(ids), **{column: players[column].astype('float32') for column in stats})
+    rows = players.merge(sides[['team_id', 'opponent_team', 'was_home', 'fixture', 'event', 'kickoff_time',
+                                'team_h_score', 'team_a_score']], on='team_id')
+    n = len(rows)
+
+    season_minutes = rows['minutes'].to_numpy(dtype=float)
+    per_90 = 90 / np.maximum(season_minutes, 90)
+    play_probability = np.clip(season_minutes / (GAMEWEEKS * 90) * 1.2, 0.02, 0.98)
+    plays = rng.random(n) < play_probability
+    minutes = np.where(plays, np.where(rng.random(n) < 0.75, 90, rng.integers(1, 90, n)), 0)
+    share = minutes / 90 * np.where(rows['was_home'], 1.1, 0.9)
+
+    def count(column):
+        return rng.poisson(np.nan_to_num(rows[column].to_numpy(dtype=float)).clip(0) * per_90 * share)
+
+    def amount(column):
+        mean = np.nan_to_num(rows[column].to_numpy(dtype=float)).clip(0) * per_90 * share
+        return (rng.gamma(2.0, 0.5, n) * mean).round(2)
+
+    points_rate = np.nan_to_num(rows['total_points'].to_numpy(dtype=float)).clip(0) * per_90
+    total_points = np.where(plays, 1 + (minutes >= 60) + rng.poisson(np.maximum(points_rate * share - 2, 0.1)), 0)
+    selected = (rows['selected_by_percent'].fillna(0).to_numpy(dtype=float) * 1e5 * rng.lognormal(0, 0.1, n)).round()
+    transfers_in = rng.poisson(rows['transfers_in'].fillna(0).to_numpy(dtype=float).clip(0) / GAMEWEEKS)
+    transfers_out = rng.poisson(rows['transfers_out'].fillna(0).to_numpy(dtype=float).clip(0) / GAMEWEEKS)
+
+    gameweeks = pd.DataFrame({
+        'name': rows['name'],
+        'position': rows['position'].replace({'GKP': 'GK'}),
+        'team': rows['team'],
+        'xP': (play_probability * points_rate + rng.normal(0, 0.5, n)).clip(0).round(1),
+        'assists': count('assists'),
+        'bonus': count('bonus'),
+        'bps': count('bps'),
+        'clean_sheets': count('clean_sheets').clip(max=1),
+        'creativity': amount('creativity'),
+        'element': rows['id'],
+        'expected_assists': amount('expected_assists'),
+        'expected_goal_involvements': amount('expected_goal_involvements'),
+        'expected_goals': amount('expected_goals'),
+        'expected_goals_conceded': amount('expected_goals_conceded'),
+        'fixture': rows['fixture'],
+        'goals_conceded': count('goals_conceded'),
+        'goals_scored': count('goals_scored'),
+        'ict_index': amount('ict_index'),
+        'influence': amount('influence'),
+        'kickoff_time': rows['kickoff_time'],
+        'minutes': minutes,
+        'opponent_team': rows['opponent_team'],
+        'own_goals': count('own_goals'),
+        'penalties_missed': count('penalties_missed'),
+        'penalties_saved': count('penalties_saved'),
+        'red_cards': count('red_cards').clip(max=1),
+        'round': rows['event'],
+        'saves': count('saves'),
+        'selected': selected,
+        'starts': (minutes >= 60).astype(int),
+        'team_a_score': rows['team_a_score'],
+        'team_h_score': rows['team_h_score'],
+        'threat': amount('threat'),
+        'total_points': total_points,
+        'transfers_balance': transfers_in - transfers_out,
+        'transfers_in': transfers_in,
+        'transfers_out': transfers_out,
+        'value': rows['now_cost'].astype(int),
+        'was_home': rows['was_home'],
+        'yellow_cards': count('yellow_cards').clip(max=1),
+        'GW': rows['event'],
+    })
+    return gameweeks.sort_values(['GW', 'fixture', 'element'], ignore_index=True)
+
+
+def prediction_table(players, bundled_predictions, seed=0):
+    """
+    Builds a prediction table for every player, over the gameweeks of the bundled predictions.
+
+    Predicted and actual points are drawn from the bundled table's own values, so lookups and
+    the charts see the same distribution while every synthetic player has a prediction.
+
+    Returns:
+    - predictions (pd.DataFrame): One row per player and gameweek, in the bundled table's columns.
+    """
+    rng = np.random.default_rng(seed)
+    gameweeks = np.sort(bundled_predictions['gw'].dropna().unique())
+    teams = players['team'].unique()
+    n = len(players) * len(gameweeks)
+    rows = bundled_predictions.iloc[rng.integers(0, len(bundled_predictions), n)]
+    return pd.DataFrame({
+        'player': np.repeat(players['name'].to_numpy(), len(gameweeks)),
+        'web_name': np.repeat(players['web_name'].to_numpy(), len(gameweeks)),
+        'gw': np.tile(gameweeks, len(players)),
+        'team': np.repeat(players['team'].to_numpy(), len(gameweeks)),
+        'opponent_team': teams[rng.integers(0, len(teams), n)],
+        'position': np.repeat(players['position'].map(POSITIONS).to_numpy(), len(gameweeks)),
+        'total_points': rows['total_points'].to_numpy(),
+        'pred_points_rounded': rows['pred_points_rounded'].to_numpy(),
+    })
+
+
+def seasons(current, count):
+    """Returns `count` season names ending with `current`, e.g. ['2023-24', '2024-25']."""
+    first = int(current[:4])
+    return [f"{year}-{(year + 1) % 100:02d}" for year in range(first - count + 1, first + 1)]
+
+
+def generate(scale=1, n_seasons=1, current_season='2024-25', seed=0):
+    """
+    Generates a full synthetic dataset.
+
+    Parameters:
+    - scale (int): Multiple of the bundled number of players.
+    - n_seasons (int): Seasons of gameweek rows, the last one being `current_season`.
+    - current_season (str): Season the player table and predictions belong to.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    - data (dict): `players` (scaled table), `teams`, `bootstrap` and `fixtures` payloads of the
+      current season, `gameweeks` ({season: raw gameweek rows}) and `predictions`.
+    """
+    bundled_players, bundled_predictions = load_bundled()
+    players = scale_players(bundled_players, scale, seed)
+    teams = team_ids(players)
+    gameweeks, fixtures = {}, None
+    for offset, season in enumerate(seasons(current_season, n_seasons)):
+        played = CURRENT_GAMEWEEK if season == current_season else GAMEWEEKS
+        season_fixtures = fixtures_payload(teams, season, played, seed + offset)
+        gameweeks[season] = gameweek_season(players, season_fixtures, teams, played, seed + offset)
+        if season == current_season:
+            fixtures = season_fixtures
+    return {
+        'players': players,
+        'teams': teams,
+        'bootstrap': bootstrap_payload(players),
+        'fixtures': fixtures,
+        'gameweeks': gameweeks,
+        'predictions': prediction_table(players, bundled_predictions, seed),
+    }
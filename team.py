@@ -1,30 +1,30 @@
 import streamlit as st
-from utils.data_loader import load_player_data_from_api, load_gameweek_data_from_github
+from utils.data_loader import load_player_data_from_api, next_gameweek
 from utils.team_selection import adjust_selected_players, select_players_for_position
-from utils.team_computation import get_top_players_by_position, adjust_team_to_budget
+from utils.team_computation import optimize_squad
+from utils.transfer_planner import prediction_horizon, plan_transfers, xi_budget
+from utils.predictions import load_prediction_index
+from utils.simulation import load_points_simulator, simulate_teams, N_SIMULATIONS
+from utils.captaincy import rank_captains, UPSIDE_POINTS
+from utils.registry import get_dataset
+from utils.photo_cache import get_photo_cache
 from visualizations import (
     draw_soccer_field,
     plot_total_points_comparison,
     plot_team_radar_chart,
     plot_cost_breakdown_by_position,
+    plot_score_distributions,
     total_points_vs_cost_yearly,
     ownership_vs_points_bubble_chart_with_dropdown
 )
-from utils.constants import FORMATION_MAP, BUDGET, COLOR_PALETTE, SECTION_ICONS, POSITION_FULL_NAMES
-import pandas as pd
+from utils.constants import FORMATION_MAP, BUDGET, COLOR_PALETTE, SECTION_ICONS, POSITION_FULL_NAMES, MAX_FREE_TRANSFERS, SEASON
 
-players_pred_df = pd.read_csv("data/predicted_df.csv")
+prediction_index = load_prediction_index()
 
-def get_player_pred(name, team):
-    try:
-        name_clean = name.strip().split(".")[-1]
-        x = players_pred_df[players_pred_df.web_name.str.contains(name_clean)][players_pred_df.team == team]
-        return int(x.sort_values(['gw'], ascending=False).pred_points_rounded.iloc[0])
-    except:
-        return 0
+next_gw = next_gameweek(SEASON)
 
 st.markdown(
-    f"<h2 style='text-align: center; color: {COLOR_PALETTE['App Title']};'>{SECTION_ICONS['App Title']} Ultimate FPL Manager<br> GW {load_gameweek_data_from_github('2024-25').GW.max() + 1}</h1>",
+    f"<h2 style='text-align: center; color: {COLOR_PALETTE['App Title']};'>{SECTION_ICONS['App Title']} Ultimate FPL Manager<br> GW {next_gw}</h1>",
     unsafe_allow_html=True
 )
 
@@ -32,11 +32,17 @@ player_data = load_player_data_from_api()
 if player_data.empty:
     st.stop()
 
+# Photos are served from the local thumbnail cache; missing ones download in the background
+photo_cache = get_photo_cache()
+photo_cache.prefetch(player_data['photo_url'])
+
 # Initialize session state
 if 'selected_players' not in st.session_state:
     st.session_state.selected_players = {pos: [] for pos in ['GKP', 'DEF', 'MID', 'FWD']}
 if 'best_team' not in st.session_state:
     st.session_state.best_team = None
+    st.session_state.best_bench = []
+    st.session_state.best_team_key = None
 if 'formation' not in st.session_state:
     st.session_state.formation = None
 
@@ -47,6 +53,11 @@ st.sidebar.markdown(
 
 formation = st.sidebar.selectbox("Choose Your Formation", list(FORMATION_MAP.keys()), index=0)
 position_counts = FORMATION_MAP[formation]
+optimize_for = st.sidebar.radio("Optimise Best Team For", ['Total Points', 'Predicted Points'], horizontal=True)
+bench_weight = st.sidebar.slider(
+    "Best Team Bench Weight", min_value=0.0, max_value=1.0, value=0.1, step=0.05,
+    help="How much the four substitutes' points count when building the best 15-man squad."
+)
 
 formation_changed = (formation != st.session_state.formation)
 st.session_state.formation = formation
@@ -76,12 +87,20 @@ if not all_positions_complete:
 if total_cost > BUDGET:
     st.sidebar.error("Budget exceeded!")
 
-if st.session_state.best_team is None or formation_changed:
-    best_team = get_top_players_by_position(player_data, formation)
-    best_team = adjust_team_to_budget(best_team, BUDGET, player_data)
+best_team_key = (formation, bench_weight, optimize_for)
+if st.session_state.best_team is None or st.session_state.best_team_key != best_team_key:
+    if optimize_for == 'Predicted Points':
+        objective = prediction_index.predict_players(player_data)
+    else:
+        objective = 'total_points'
+    best_team, best_bench = optimize_squad(player_data, formation, BUDGET, objective=objective,
+                                           bench_weight=bench_weight)
     st.session_state.best_team = best_team
+    st.session_state.best_bench = best_bench
+    st.session_state.best_team_key = best_team_key
 else:
     best_team = st.session_state.best_team
+    best_bench = st.session_state.best_bench
 
 col1, col2 = st.columns([2, 1])
 with col1:
@@ -101,16 +120,16 @@ with col1:
 
 with col2:
     user_total_cost = sum(p['now_cost'] for p in selected_players)
-    best_total_cost = sum(p['now_cost'] for p in best_team)
-    user_xp_next_gw = sum(get_player_pred(p['web_name'], p['team_name']) for p in selected_players)
-    best_xp_next_gw = sum(get_player_pred(p['web_name'], p['team_name']) for p in best_team)
+    best_total_cost = sum(p['now_cost'] for p in best_team + best_bench)
+    user_xp_next_gw = prediction_index.predict_team(selected_players).sum()
+    best_xp_next_gw = prediction_index.predict_team(best_team).sum()
 
     st.markdown(
         f"<h3 style='color: {COLOR_PALETTE['Sidebar Budget']};'>{SECTION_ICONS['Budget Overview']} Budget Overview</h3>",
         unsafe_allow_html=True
     )
     st.write(f"**Your Team Cost:** £{user_total_cost / 10:.1f}m / £{BUDGET / 10:.1f}m")
-    st.write(f"**Best Team Cost:** £{best_total_cost / 10:.1f}m / £{BUDGET / 10:.1f}m")
+    st.write(f"**Best Team Cost (incl. bench):** £{best_total_cost / 10:.1f}m / £{BUDGET / 10:.1f}m")
 
     st.markdown(
         f"<h3 style='color: {COLOR_PALETTE['Predicted Points']};'>{SECTION_ICONS['Target']} Points Prediction</h3>",
@@ -119,6 +138,55 @@ with col2:
     st.write(f"**Your Team Predicted Points next GW:** {user_xp_next_gw}")
     st.write(f"**Best Team Predicted Points next GW:** {best_xp_next_gw}")
 
+    simulator = load_points_simulator(SEASON)
+    with st.expander(f"{SECTION_ICONS['Score Distribution']} Score Distribution"):
+        # Both XIs are simulated over the same draws, so shared players score the same in each
+        teams = {'Your Team': selected_players, 'Best Team': best_team}
+        if not simulator.fitted:
+            st.write("**No gameweek history yet to simulate scores from.**")
+        else:
+            if not all_positions_complete:
+                st.write("**Complete your team to compare it with the Best Team.**")
+                del teams['Your Team']
+            expected = {}
+            for team in teams.values():
+                expected.update(zip((p['id'] for p in team), prediction_index.predict_team(team)))
+            totals = simulate_teams(simulator, {name: [p['id'] for p in team] for name, team in teams.items()}, expected)
+            plot_score_distributions(totals)
+            if 'Your Team' in totals:
+                st.write(f"**Your Team outscores the Best Team in** {(totals['Your Team'] > totals['Best Team']).mean():.0%} "
+                         f"of {N_SIMULATIONS:,} simulated gameweeks")
+
+    with st.expander(f"{SECTION_ICONS['Captaincy']} Captain & Vice-Captain: {team_to_display}"):
+        if not simulator.fitted:
+            st.write("**No gameweek history yet to simulate captain scores from.**")
+        elif len(team_to_show) < 2:
+            st.write("**Select your team to pick a captain.**")
+        else:
+            rank_by = st.radio("Rank pairs by", ['Expected Points', 'Upside'], horizontal=True,
+                               help=f"Upside is the chance the armband adds at least {UPSIDE_POINTS} points.")
+            ranking = rank_captains(simulator, team_to_show, prediction_index.predict_team(team_to_show),
+                                    by='armband_points' if rank_by == 'Expected Points' else 'upside')
+            st.write(f"**Captain:** {ranking['Captain'].iloc[0]} &nbsp; **Vice-Captain:** {ranking['Vice'].iloc[0]}")
+            st.dataframe(ranking.head(10).round(2), hide_index=True)
+
+    with st.expander(f"{SECTION_ICONS['Transfer Planner']} Transfer Planner"):
+        horizon = st.slider("Gameweeks to plan", min_value=1, max_value=5, value=3)
+        free_transfers = st.number_input("Free transfers available", min_value=0, max_value=MAX_FREE_TRANSFERS, value=1)
+        # The page only holds the XI, so by default the bank is what is left of the XI's share of the
+        # budget after the cheapest bench that completes the squad
+        bank = st.number_input("Money in the bank (£m)", min_value=0.0, step=0.1, format="%.1f",
+                               value=max(xi_budget(player_data, formation) - user_total_cost, 0) / 10)
+        if not all_positions_complete:
+            st.write("**Complete your team to plan transfers.**")
+        elif st.button("Plan Transfers"):
+            predictions = prediction_horizon(prediction_index, player_data, next_gw, horizon)
+            plan = plan_transfers(selected_players, player_data, predictions, user_total_cost + round(bank * 10), free_transfers)
+            st.dataframe(plan, hide_index=True)
+            st.caption("The plan transfers your XI and comes from a beam search over the most promising transfers, "
+                       "so it is a good plan rather than a guaranteed best one.")
+            st.write(f"**Predicted Points over {horizon} GW (after hits):** {plan['Predicted Points'].sum():.0f}")
+
     if user_total_cost > BUDGET:
         st.error("Your team's budget is exceeded!")
 
@@ -138,7 +206,7 @@ with col2:
                 cols = st.columns(len(pos_players))
                 for idx, player in enumerate(pos_players):
                     with cols[idx]:
-                        photo_url = player.get('photo_url', 'https://via.placeholder.com/100')
+                        photo_url = photo_cache.data_uri(player.get('photo_url'))
                         # Center-align photo and caption using HTML
                         st.markdown(
                             f"""
@@ -149,6 +217,8 @@ with col2:
                             """,
                             unsafe_allow_html=True
                         )
+        if team_to_display == 'Best Team' and best_bench:
+            st.write(f"**Bench:** {', '.join(p['web_name'] for p in best_bench)}")
     else:
         st.write("**Please select your team or best team to view players.**")
 
@@ -169,9 +239,11 @@ with tab1:
     plot_team_radar_chart(selected_players, best_team)
 
 with tab2:
-    total_points_vs_cost_yearly(player_data, 500)
+    # Both charts depend only on the player table, so they are cached per version of it
+    players_version = get_dataset('players').version
+    total_points_vs_cost_yearly(player_data, 500, version=players_version)
     st.divider()
-    ownership_vs_points_bubble_chart_with_dropdown(player_data, min_ownership_pct=10.0)
+    ownership_vs_points_bubble_chart_with_dropdown(player_data, min_ownership_pct=10.0, version=players_version)
 
 st.divider()
 
@@ -0,0 +1,72 @@
+# conftest.py
+
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+# Make the `utils` package importable however pytest is invoked
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeUpstream(object):
+    """
+    A local HTTP server standing in for the FPL API and its image CDN.
+
+    `routes` maps a path to a list of responses served in turn, the last one repeating. A response
+    is a (status, headers, body) tuple, a callable taking the request handler and returning one,
+    or None to drop the connection without answering. Every request is kept in `requests`.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                with upstream._lock:
+                    upstream.requests.append((self.path, dict(self.headers)))
+                    responses = upstream.routes.get(self.path) or [(404, {}, b"")]
+                    response = responses.pop(0) if len(responses) > 1 else responses[0]
+                if callable(response):
+                    response = response(self)
+                if response is None:
+                    self.close_connection = True
+                    return
+                status, headers, body = response
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def hits(self, path):
+        """Number of requests received for `path`."""
+        return sum(1 for requested, _ in self.requests if requested == path)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = FakeUpstream()
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,98 @@
+# test_element_store.py
+
+import json
+import threading
+
+import pytest
+
+from utils.element_store import ElementSummaryStore
+
+
+def summary(player_id, points):
+    body = {
+        'history': [{'round': 1, 'total_points': points}],
+        'history_past': [{'season_name': '2023/24', 'total_points': points * 10}],
+        'fixtures': [],
+    }
+    return 200, {'Content-Type': 'application/json'}, json.dumps(body).encode()
+
+
+def error(status, retry_after=None):
+    return status, {'Retry-After': retry_after} if retry_after else {}, b'{}'
+
+
+DROP = None  # Close the connection without answering
+
+
+@pytest.fixture
+def store(upstream, tmp_path):
+    return ElementSummaryStore(root=str(tmp_path), url=upstream.url + '/element-summary/{id}/',
+                               max_concurrency=4, retries=2, backoff=0.01, batch_size=2)
+
+
+def test_retries_then_resumes(upstream, store):
+    upstream.routes.update({
+        '/element-summary/1/': [error(500), error(503, retry_after='0'), summary(1, 5)],
+        '/element-summary/2/': [DROP, summary(2, 7)],
+        '/element-summary/3/': [error(404)],
+        '/element-summary/4/': [error(502)],  # Fails every attempt
+        '/element-summary/5/': [summary(5, 1)],
+    })
+
+    report = store.sync([1, 2, 3, 4, 5], gameweek=1)
+    assert report == {'fetched': 4, 'skipped': 0, 'failed': [4]}
+    assert upstream.hits('/element-summary/1/') == 3
+    assert upstream.hits('/element-summary/2/') == 2
+    assert upstream.hits('/element-summary/4/') == 3  # The first attempt and two retries
+    assert len(store._parts()) == 1  # Batches were compacted into one part
+    history = store.read('history')
+    assert sorted(zip(history['element'], history['total_points'])) == [(1, 5), (2, 7), (5, 1)]
+
+    # The next sync only fetches the player that failed
+    upstream.routes['/element-summary/4/'] = [summary(4, 9)]
+    report = store.sync([1, 2, 3, 4, 5], gameweek=1)
+    assert report == {'fetched': 1, 'skipped': 4, 'failed': []}
+    assert upstream.hits('/element-summary/1/') == 3
+    assert sorted(store.read('history_past')['element']) == [1, 2, 4, 5]
+
+    # A new finished gameweek makes every player stale again, and new rows replace old ones
+    upstream.routes['/element-summary/1/'] = [summary(1, 8)]
+    assert store.sync([1, 2, 3, 4, 5], gameweek=2)['fetched'] == 5
+    history = store.read('history')
+    assert history.loc[history['element'] == 1, 'total_points'].tolist() == [8]
+    assert set(store.manifest()['synced'].values()) == {2}
+
+
+def test_reads_during_a_sync_see_whole_parts(upstream, store):
+    ids = list(range(1, 41))
+    for player_id in ids:
+        upstream.routes[f'/element-summary/{player_id}/'] = [summary(player_id, player_id)]
+    store.batch_size = 1
+    store.sync(ids[:20], gameweek=1)
+
+    errors, stop = [], threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                history = store.read('history')
+                assert history['element'].is_unique and len(history) >= 20
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    syncs = [threading.Thread(target=store.sync, args=(ids, 1)) for _ in range(2)]
+    for sync in syncs:
+        sync.start()
+    for sync in syncs:
+        sync.join()
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert len(store.read('history')) == 40
+    assert all(upstream.hits(f'/element-summary/{player_id}/') == 1 for player_id in ids)
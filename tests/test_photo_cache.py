@@ -0,0 +1,79 @@
+# test_photo_cache.py
+
+import json
+import os
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from utils.photo_cache import PhotoCache
+
+
+def png(color, size=(220, 280)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def photos(upstream):
+    red, blue = png((200, 0, 0)), png((0, 0, 200))
+    upstream.routes.update({
+        "/p1.png": [(200, {"Content-Type": "image/png"}, red)],
+        "/p2.png": [(200, {"Content-Type": "image/png"}, blue)],
+        "/p3.png": [(200, {"Content-Type": "image/png"}, red)],  # The same photo under another URL
+        "/broken.png": [(200, {"Content-Type": "image/png"}, b"not an image")],
+    })
+    return {name: f"{upstream.url}/{name}.png" for name in ["p1", "p2", "p3", "broken", "gone"]}
+
+
+def test_fetch_stores_thumbnails_on_disk(upstream, photos, tmp_path):
+    cache = PhotoCache(root=str(tmp_path), size=(55, 70))
+
+    assert cache.fetch(photos.values()) == 3
+    pngs = sorted(name for name in os.listdir(tmp_path) if name.endswith(".png"))
+    assert len(pngs) == 2  # p1 and p3 share one file
+    for name in pngs:
+        assert Image.open(tmp_path / name).size == (55, 70)
+
+    with open(tmp_path / "index.json") as f:
+        index = json.load(f)
+    assert set(index) == {photos["p1"], photos["p2"], photos["p3"]}
+    assert index[photos["p1"]] == index[photos["p3"]]
+
+    assert cache.data_uri(photos["p1"]).startswith("data:image/png;base64,")
+    assert cache.data_uri(photos["p1"]) != cache.placeholder
+
+    # A new process reads the thumbnails from disk without downloading again
+    reopened = PhotoCache(root=str(tmp_path), size=(55, 70))
+    assert reopened.thumbnail(photos["p2"]) == cache.thumbnail(photos["p2"])
+    assert reopened.missing(photos.values()) == [photos["broken"], photos["gone"]]
+
+
+def test_failed_photos_get_the_placeholder_until_retry(upstream, photos, tmp_path):
+    cache = PhotoCache(root=str(tmp_path), retry_after=60)
+    cache.fetch([photos["gone"], photos["broken"]])
+
+    assert cache.data_uri(photos["gone"]) == cache.placeholder
+    assert cache.data_uri(photos["broken"]) == cache.placeholder
+    assert cache.missing([photos["gone"], photos["broken"]]) == []
+    assert cache.fetch([photos["gone"]]) == 0
+    assert upstream.hits("/gone.png") == 1
+
+
+def test_prefetch_fills_the_cache_in_the_background(upstream, photos, tmp_path):
+    cache = PhotoCache(root=str(tmp_path))
+    urls = [photos["p1"], photos["p2"]]
+    assert all(cache.data_uri(url) == cache.placeholder for url in urls)
+
+    cache.prefetch(urls)
+    cache.prefetch(urls)  # Already running, or nothing left to fetch
+    deadline = time.time() + 5
+    while cache.missing(urls) and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert cache.missing(urls) == []
+    assert all(cache.data_uri(url) != cache.placeholder for url in urls)
+    assert upstream.hits("/p1.png") == upstream.hits("/p2.png") == 1
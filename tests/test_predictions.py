@@ -0,0 +1,103 @@
+# test_predictions.py
+
+import os
+
+import pandas as pd
+
+from utils import predictions
+from utils.points_model import PointsModel
+from utils.registry import get_dataset
+
+
+def test_retrains_only_when_a_gameweek_lands(tmp_path, monkeypatch):
+    path, model_dir = str(tmp_path / "predicted_df.csv"), str(tmp_path / "models")
+    played = {'GW': [1, 2]}
+    trained, refreshed = [], []
+
+    def update(year, path, model_dir):
+        PointsModel(gameweeks=played['GW']).save(os.path.join(model_dir, f"{year}.npz"))
+        table = pd.DataFrame({'gw': [max(played['GW']) + 1], 'pred_points_rounded': [3]})
+        table.to_csv(path, index=False)
+        trained.append(max(played['GW']))
+        return table
+
+    monkeypatch.setattr(predictions, 'load_gameweek_data_from_github', lambda year: pd.DataFrame(played))
+    monkeypatch.setattr(predictions, 'update_predictions', update)
+    monkeypatch.setattr(predictions, 'refresh_dataset', lambda name, *args: refreshed.append((name, args)))
+
+    assert predictions.refresh_predictions('2024-25', path, model_dir) is True  # Nothing written yet
+    assert predictions.refresh_predictions('2024-25', path, model_dir) is False
+    played['GW'] = [1, 2, 3]
+    assert predictions.refresh_predictions('2024-25', path, model_dir) is True
+    assert trained == [2, 3]
+    assert refreshed == [('predictions', (path,))] * 2
+
+
+def test_loader_only_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(predictions, 'update_predictions', lambda *args, **kwargs: 1 / 0)
+    path = str(tmp_path / "predicted_df.csv")
+    pd.DataFrame({'gw': [4], 'pred_points_rounded': [2]}).to_csv(path, index=False)
+
+    assert get_dataset('predictions', path).data['gw'].tolist() == [4]
+    monkeypatch.setattr(predictions, 'PREDICTIONS_PATH', str(tmp_path / "missing.csv"))
+    bundled = pd.read_csv(predictions.BUNDLED_PREDICTIONS_PATH)
+    assert len(predictions._load_predictions(predictions.PREDICTIONS_PATH)) == len(bundled)
+
+
+# FPL names of players the bundled prediction table spells differently
+RENAMED = pd.DataFrame([
+    (25, 'Tomiyasu', 'Takehiro Tomiyasu', 'Arsenal', 'Tomiyasu Takehiro'),
+    (54, 'Philogene', 'Jaden Philogene-Bidace', 'Aston Villa', 'Jaden Philogene'),
+    (120, 'Yarmoliuk', 'Yehor Yarmoliuk', 'Brentford', 'Yehor Yarmoliuk'),
+    (668, 'Endo', 'Wataru Endo', 'Liverpool', 'Endo Wataru'),
+    (604, 'Aina', 'Olu Aina', "Nott'm Forest", 'Ola Aina'),
+    (568, 'Neto', 'Pedro Lomba Neto', 'Chelsea', 'Pedro Lomba Neto'),
+    (77, 'Neto', 'Norberto Murara Neto', 'Arsenal', 'Norberto Murara Neto'),
+    (999, 'Trialist', 'Young Trialist', 'Arsenal', None),
+], columns=['id', 'web_name', 'full_name', 'team_name', 'predicted_as'])
+
+
+def test_predictions_are_found_by_player_id():
+    from utils.identity import PlayerIdentity
+
+    table = pd.read_csv(predictions.BUNDLED_PREDICTIONS_PATH)
+    identity = PlayerIdentity(RENAMED, pd.DataFrame(), table)
+    index = predictions.PredictionIndex(identity.prediction_table, identity.prediction_keys)
+
+    team = RENAMED.to_dict('records')
+    expected = [
+        table[table['player'] == row['predicted_as']].sort_values('gw')['pred_points_rounded'].iloc[-1]
+        if pd.notna(row['predicted_as']) else 0
+        for row in team
+    ]
+    assert index.predict_team(team).tolist() == expected
+    assert index.predict_players(RENAMED).tolist() == expected
+    assert index.misses == 2  # Only the trialist, who has no prediction, in both calls
+    by_name = predictions.PredictionIndex(table)  # Names alone miss all but the Netos
+    assert (by_name.predict_team(team) == 0).sum() == 6
+    resolved = set(identity.prediction_keys[table['player'].isin(RENAMED['predicted_as'])]) - {-1}  # Rows at a former club stay unresolved
+    assert resolved == set(RENAMED['id'][:-1])
+
+
+def test_model_rows_are_keyed_by_element():
+    from utils.identity import PlayerIdentity
+
+    table = pd.DataFrame({'element': [604, 12345], 'player': ['Someone Else', 'Ghost'], 'web_name': ['X', 'Ghost'],
+                          'gw': [3, 3], 'team': ['Arsenal', 'Arsenal'], 'pred_points_rounded': [5, 2]})
+    identity = PlayerIdentity(RENAMED, pd.DataFrame(), table)
+    assert identity.prediction_keys.tolist() == [604, -1]
+
+
+def test_horizon_joins_players_by_id():
+    from utils.identity import PlayerIdentity
+    from utils.transfer_planner import prediction_horizon
+
+    table = pd.read_csv(predictions.BUNDLED_PREDICTIONS_PATH)
+    identity = PlayerIdentity(RENAMED, pd.DataFrame(), table)
+    index = predictions.PredictionIndex(identity.prediction_table, identity.prediction_keys)
+    last = int(table['gw'].max())
+
+    horizon = prediction_horizon(index, RENAMED, last, 2)
+    assert horizon.columns.tolist() == [last, last + 1]
+    assert horizon[last].tolist() == index.predict_team(RENAMED.to_dict('records')).tolist()
+    assert (horizon[last + 1] == horizon[last]).all()  # Carried forward
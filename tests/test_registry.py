@@ -0,0 +1,35 @@
+# test_registry.py
+
+import pandas as pd
+import pytest
+
+from utils import registry
+from utils.registry import get_dataset, loaded_datasets, refresh_dataset, register_dataset
+
+
+@pytest.fixture
+def test_rows():
+    """Registers the 'test_rows' dataset for one test, then removes its loader and built versions."""
+    register_dataset('test_rows')(lambda n: pd.DataFrame({'x': range(n)}))
+    yield 'test_rows'
+    with registry._LOCK:
+        registry._LOADERS.pop('test_rows', None)
+        for table in (registry._DATASETS, registry._KEY_LOCKS):
+            for key in [key for key in table if key[0] == 'test_rows']:
+                del table[key]
+
+
+def test_memory_is_measured_once_per_build(test_rows, monkeypatch):
+    measured = []
+    monkeypatch.setattr(registry, 'frame_memory_mb', lambda df: measured.append(len(df)) or 1.5)
+
+    get_dataset('test_rows', 3)
+    for _ in range(5):
+        report = loaded_datasets()
+    assert measured == [3]
+    row = report[report['dataset'] == 'test_rows'].iloc[0]
+    assert (row['rows'], row['memory_mb']) == (3, 1.5)
+
+    refresh_dataset('test_rows', 3)  # Unchanged data keeps the measured dataset
+    assert measured == [3, 3]
+    assert get_dataset('test_rows', 3).memory_mb == 1.5
@@ -0,0 +1,21 @@
+# test_residuals.py
+
+import numpy as np
+import pandas as pd
+
+from utils.residuals import funnel_limits, residual_stats
+
+
+def test_stats_per_player():
+    data = pd.DataFrame({'total_points': [6, 2, 1, 9], 'xP': [4.0, 4.0, 1.0, 'bad']})
+    stats = residual_stats(data, np.array([1, 1, 2, -1]))
+    assert stats['n'].tolist() == [2, 1]
+    assert stats.loc[1, 'mean_residual'] == 0.0
+    assert len(funnel_limits(stats)) == 2
+
+
+def test_no_gameweeks_gives_empty_stats():
+    stats = residual_stats(pd.DataFrame(), np.array([], dtype=np.int64))
+    assert stats.empty
+    assert list(stats.columns) == ['n', 'mean_residual', 'std_residual', 'se_residual']
+    assert stats.join(pd.DataFrame({'full_name': ['Saka']}, index=[1]), how='left').empty
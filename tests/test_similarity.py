@@ -0,0 +1,67 @@
+# test_similarity.py
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils import similarity
+from utils.similarity import SimilarityTableBuilder
+
+
+class GatedModel(object):
+    """Stands in for a fitted model; `neighbour_table` waits for the snapshot's gate to open."""
+
+    gates = {}
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def neighbour_table(self, top_k):
+        self.gates[self.snapshot].wait(5)
+        return pd.DataFrame({'player_key': [1], 'neighbour_key': [self.snapshot], 'score': [1.0]})
+
+
+def players(snapshot):
+    return pd.DataFrame({'snapshot': [snapshot]})
+
+
+def test_older_build_finishing_last_does_not_win(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity, 'similarity_model', lambda data, root, remove_stale=True: GatedModel(int(data['snapshot'][0])))
+    monkeypatch.setattr(similarity, 'fingerprint', lambda data: f"model-{data['snapshot'][0]}")
+    GatedModel.gates = {1: threading.Event(), 2: threading.Event()}
+    builder = SimilarityTableBuilder(root=str(tmp_path))
+
+    assert builder.get(players(1), 'old') is None
+    assert builder.get(players(2), 'new') is None
+    GatedModel.gates[2].set()
+    deadline = time.time() + 5
+    while builder._current is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert builder._current.fingerprint == 'new'
+
+    GatedModel.gates[1].set()
+    for thread in threading.enumerate():
+        if thread.name == 'similarity-table':
+            thread.join(5)
+
+    assert builder._current.fingerprint == 'new'
+    assert os.listdir(tmp_path) == ['new.parquet']
+    assert builder.get(players(2), 'new').similar(1).index.tolist() == [2]
+    assert builder._building is None
+
+
+def test_waiting_get_builds_on_the_calling_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity, 'similarity_model', lambda data, root, remove_stale=True: GatedModel(int(data['snapshot'][0])))
+    monkeypatch.setattr(similarity, 'fingerprint', lambda data: f"model-{data['snapshot'][0]}")
+    GatedModel.gates = {3: threading.Event()}
+    GatedModel.gates[3].set()
+    builder = SimilarityTableBuilder(root=str(tmp_path))
+    threads = threading.active_count()
+
+    table = builder.get(players(3), 'warm', wait=True)
+    assert table is builder._current and table.fingerprint == 'warm'
+    assert threading.active_count() == threads
+    assert os.listdir(tmp_path) == ['warm.parquet']
+    assert builder._building is None
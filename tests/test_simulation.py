@@ -0,0 +1,53 @@
+# test_simulation.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.simulation import PointsSimulator
+
+
+def season():
+    """Two midfielders over 20 gameweeks: a regular starter averaging 5 points, and a player who played once."""
+    rng = np.random.default_rng(1)
+    rows = []
+    for gw in range(1, 21):
+        rows.append({'key': 1, 'minutes': 90, 'total_points': int(rng.integers(2, 9)), 'xP': 5.0})
+        rows.append({'key': 2, 'minutes': 90 if gw == 1 else 0, 'total_points': 2 if gw == 1 else 0, 'xP': 1.0})
+    return pd.DataFrame(rows)
+
+
+def test_rare_starter_is_capped_and_keeps_its_mean():
+    data = season()
+    simulator = PointsSimulator.fit(data, data['key'].to_numpy(), pd.Series({1: 'MID', 2: 'MID'}))
+    cap = simulator.max_mean_points['MID']
+    regular = data[data['key'] == 1]['total_points']
+    assert regular.min() < cap < regular.mean()  # Shrunk towards the position average
+    assert simulator.play_probability[2] < 0.25
+
+    expected = 4.0  # Far more than the rare starter's chance to play allows below the cap
+    plays, points = simulator.draw([2], [expected], n_simulations=200_000)
+    scores = points[0][plays[0]]
+    assert abs(np.median(scores) - cap) <= 1.5  # Not expected / probability, several times the cap
+    assert plays.mean() >= expected / cap - 0.01
+    assert abs(points.mean() - expected) < 0.1
+
+
+def test_no_gameweek_history_gives_an_unfitted_simulator():
+    simulator = PointsSimulator.fit(pd.DataFrame(), np.array([], dtype=np.int64), pd.Series({1: 'MID'}))
+    assert not simulator.fitted
+    with pytest.raises(ValueError):
+        simulator.draw([1], [4.0], n_simulations=10)
+
+
+def test_single_haul_does_not_set_the_cap():
+    data = season()
+    haul = pd.DataFrame([{'key': 3, 'minutes': 90 if gw == 1 else 0, 'total_points': 24 if gw == 1 else 0, 'xP': 2.0}
+                         for gw in range(1, 21)])
+    data = pd.concat([data, haul], ignore_index=True)
+    simulator = PointsSimulator.fit(data, data['key'].to_numpy(), pd.Series({1: 'MID', 2: 'MID', 3: 'MID'}))
+    cap = simulator.max_mean_points['MID']
+    assert cap < 10  # Not 24, the unshrunk mean of the one-appearance outlier
+
+    plays, points = simulator.draw([2], [4.0], n_simulations=50_000)
+    assert np.median(points[0][plays[0]]) <= 10
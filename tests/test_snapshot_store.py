@@ -0,0 +1,97 @@
+# test_snapshot_store.py
+
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from utils.snapshot_store import SnapshotStore
+
+PAYLOAD = {"elements": [{"id": 1, "web_name": "Saka"}, {"id": 2, "web_name": "Salah"}]}
+
+
+def to_table(payload):
+    return pd.DataFrame(payload["elements"])
+
+
+def ok(payload, etag='"v1"'):
+    return 200, {"ETag": etag, "Content-Type": "application/json"}, json.dumps(payload).encode()
+
+
+def revalidate(etag='"v1"'):
+    """Answers 304 to a conditional GET carrying `etag`, a full 200 otherwise."""
+    def respond(handler):
+        if handler.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return ok(PAYLOAD, etag)
+    return respond
+
+
+@pytest.fixture
+def store(upstream, tmp_path):
+    return SnapshotStore("bootstrap", f"{upstream.url}/bootstrap", to_table, root=str(tmp_path), max_age=60)
+
+
+def wait_for_refresh(store):
+    deadline = time.time() + 5
+    while store._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    assert not store._refreshing
+
+
+def test_stores_then_revalidates(upstream, store):
+    upstream.routes["/bootstrap"] = [ok(PAYLOAD), revalidate()]
+
+    assert store.is_stale()
+    assert store.refresh() is True
+    assert store.table()["web_name"].tolist() == ["Saka", "Salah"]
+    assert store.payload() == PAYLOAD
+    assert store.meta()["etag"] == '"v1"'
+    assert not store.is_stale()
+
+    fetched_at = store.meta()["fetched_at"]
+    assert store.refresh() is False
+    assert upstream.requests[-1][1]["If-None-Match"] == '"v1"'
+    assert store.meta()["fetched_at"] == fetched_at
+    assert store.meta()["checked_at"] >= fetched_at
+
+
+def test_upstream_error_keeps_snapshot_and_waits(upstream, store):
+    upstream.routes["/bootstrap"] = [ok(PAYLOAD), revalidate(), (500, {}, b"down")]
+    store.refresh()
+    store.refresh()
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        store.refresh()
+    assert store.table()["id"].tolist() == [1, 2]
+    assert store.meta()["etag"] == '"v1"'
+    assert store.meta()["failed_at"] == store.meta()["checked_at"]
+    assert not store.is_stale()  # The failed check counts, so the next rerun does not retry at once
+
+
+def test_malformed_payload_does_not_escape_background_thread(upstream, store):
+    upstream.routes["/bootstrap"] = [ok(PAYLOAD), ok({"teams": []}, etag='"v2"')]
+    store.refresh()
+    store._write_json("meta.json", {**store.meta(), "checked_at": 0})  # Age the snapshot
+    assert store.is_stale()
+
+    escaped = []
+    previous_hook = threading.excepthook
+    threading.excepthook = escaped.append
+    try:
+        store.refresh_in_background()
+        wait_for_refresh(store)
+    finally:
+        threading.excepthook = previous_hook
+
+    assert escaped == []
+    assert store.table()["web_name"].tolist() == ["Saka", "Salah"]
+    assert store.meta()["etag"] == '"v1"'
+    assert not store.is_stale()
+    assert upstream.hits("/bootstrap") == 2
+
+    with pytest.raises(ValueError):
+        store.refresh()
@@ -0,0 +1,55 @@
+# test_team_computation.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import team_computation
+from utils.constants import SQUAD_COMPOSITION
+from utils.team_computation import optimize_squad, optimize_team
+
+
+def players(seed, n=160):
+    """Random players from eight clubs with few distinct prices and scores, so dominance ties are common."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': range(n),
+        'web_name': [f"P{i}" for i in range(n)],
+        'position': rng.choice(list(SQUAD_COMPOSITION), n, p=[0.15, 0.35, 0.35, 0.15]),
+        'team_name': rng.choice([f"Club {i}" for i in range(8)], n),
+        'now_cost': rng.integers(8, 14, n) * 5,
+        'total_points': rng.integers(0, 25, n),
+    })
+
+
+def unpruned(monkeypatch):
+    """Makes the optimizers solve their integer program over every player."""
+    monkeypatch.setattr(team_computation, '_prune_dominated', lambda costs, *args, **kwargs: np.ones(len(costs), dtype=bool))
+
+
+def score(team, weight=1.0):
+    return weight * sum(player['total_points'] for player in team)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pruned_squad_matches_the_unpruned_program(seed, monkeypatch):
+    data = players(seed)
+    kept = team_computation._prune_dominated(data['now_cost'].to_numpy(), data['total_points'].to_numpy(float),
+                                             data['position'].to_numpy(), SQUAD_COMPOSITION,
+                                             data['team_name'].to_numpy(), 2, 7)
+    assert kept.sum() < len(data)
+
+    pruned = {}
+    for budget in [700, 800]:
+        xi, bench = optimize_squad(data, '4-4-2', budget, bench_weight=0.3, max_per_club=2)
+        pruned[budget] = score(xi) + score(bench, 0.3)
+        assert len(xi) == 11 and len(bench) == 4
+        assert pd.DataFrame(xi + bench)['team_name'].value_counts().max() <= 2
+        assert sum(player['now_cost'] for player in xi + bench) <= budget
+    team = score(optimize_team(data, '3-5-2', 600))
+
+    unpruned(monkeypatch)
+    for budget in [700, 800]:
+        xi, bench = optimize_squad(data, '4-4-2', budget, bench_weight=0.3, max_per_club=2)
+        assert pruned[budget] == pytest.approx(score(xi) + score(bench, 0.3))
+    assert team == score(optimize_team(data, '3-5-2', 600))
@@ -0,0 +1,96 @@
+# test_transfer_planner.py
+
+from itertools import combinations, permutations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.constants import MAX_FREE_TRANSFERS, TRANSFER_HIT
+from utils.transfer_planner import plan_transfers
+
+MAX_PER_CLUB = 2
+
+
+def small_pool(seed):
+    """Twelve players from three clubs, a four-man squad among them, and 3 gameweeks of predictions."""
+    rng = np.random.default_rng(seed)
+    players = pd.DataFrame({
+        'id': range(1, 13),
+        'web_name': [f"P{i}" for i in range(1, 13)],
+        'position': ['GKP'] * 3 + ['DEF'] * 5 + ['MID'] * 4,
+        'team_name': rng.choice(['ARS', 'CHE', 'LIV'], 12),
+        'now_cost': rng.integers(40, 80, 12),
+    })
+    while True:
+        squad = players.iloc[np.r_[rng.choice(3, 1), 3 + rng.choice(5, 2, replace=False), 8 + rng.choice(4, 1)]]
+        if squad['team_name'].value_counts().max() <= MAX_PER_CLUB:
+            break
+    predictions = pd.DataFrame(rng.integers(0, 10, (12, 3)), index=players['id'], columns=[10, 11, 12])
+    budget = int(squad['now_cost'].sum() + rng.integers(0, 15))
+    return players, squad.to_dict('records'), predictions, budget, int(rng.integers(0, 3))
+
+
+def brute_force(players, squad, predictions, budget, free_transfers, max_transfers_per_gw):
+    """Best points after hits over every sequence of up to `max_transfers_per_gw` transfers a gameweek."""
+    cost, position, club = (players.set_index('id')[column].to_dict() for column in ['now_cost', 'position', 'team_name'])
+    points = {player_id: row.tolist() for player_id, row in predictions.iterrows()}
+
+    def allowed(ids):
+        clubs = [club[i] for i in ids]
+        return sum(cost[i] for i in ids) <= budget and max(clubs.count(c) for c in clubs) <= MAX_PER_CLUB
+
+    def squads_after(current):
+        yield current, 0
+        for made in range(1, max_transfers_per_gw + 1):
+            for out in combinations(sorted(current), made):
+                for new in permutations(sorted(set(cost) - current), made):
+                    if all(position[o] == position[i] for o, i in zip(out, new)):
+                        new_squad = current - set(out) | set(new)
+                        if allowed(new_squad):
+                            yield new_squad, made
+
+    def best(current, ft, t):
+        if t == predictions.shape[1]:
+            return 0
+        return max(
+            sum(points[i][t] for i in new_squad) - max(0, made - ft) * TRANSFER_HIT
+            + best(new_squad, min(MAX_FREE_TRANSFERS, max(ft - made, 0) + 1), t + 1)
+            for new_squad, made in squads_after(current)
+        )
+
+    return best(frozenset(player['id'] for player in squad), free_transfers, 0)
+
+
+@pytest.mark.parametrize('seed', range(12))
+@pytest.mark.parametrize('max_transfers_per_gw', [1, 2])
+def test_exact_search_matches_brute_force(seed, max_transfers_per_gw):
+    players, squad, predictions, budget, free_transfers = small_pool(seed)
+    plan = plan_transfers(squad, players, predictions, budget, free_transfers, max_transfers_per_gw,
+                          beam_width=None, max_per_club=MAX_PER_CLUB)
+    expected = brute_force(players, squad, predictions, budget, free_transfers, max_transfers_per_gw)
+    assert plan['Predicted Points'].sum() == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_beam_plan_is_valid_and_no_better_than_exact(seed):
+    players, squad, predictions, budget, free_transfers = small_pool(seed)
+    exact = plan_transfers(squad, players, predictions, budget, free_transfers, beam_width=None, max_per_club=MAX_PER_CLUB)
+    beam = plan_transfers(squad, players, predictions, budget, free_transfers, beam_width=3, max_per_club=MAX_PER_CLUB)
+    assert beam['Predicted Points'].sum() <= exact['Predicted Points'].sum() + 1e-9
+
+    # Replaying the beam plan stays within the budget and club limit and scores what it reports
+    by_name = players.set_index('web_name')
+    held, ft = {player['web_name'] for player in squad}, free_transfers
+    for row, gw in zip(beam.itertuples(), predictions.columns):
+        moved_out = [name for name in row[2].split(', ') if name]
+        moved_in = [name for name in row[3].split(', ') if name]
+        assert set(moved_out) <= held and not set(moved_in) & held
+        held = held - set(moved_out) | set(moved_in)
+        chosen = by_name.loc[sorted(held)]
+        assert chosen['now_cost'].sum() <= budget
+        assert chosen['team_name'].value_counts().max() <= MAX_PER_CLUB
+        hits = max(0, len(moved_in) - ft) * TRANSFER_HIT
+        assert row[4] == ft and row[5] == -hits
+        assert row[6] == pytest.approx(predictions.loc[chosen['id'], gw].sum() - hits)
+        ft = min(MAX_FREE_TRANSFERS, max(ft - len(moved_in), 0) + 1)
@@ -0,0 +1,74 @@
+# captaincy.py
+
+import numpy as np
+import pandas as pd
+from utils.simulation import SIMULATION_SEED
+
+CAPTAIN_SIMULATIONS = 20_000  # Per pair the draws are 110 x this, so fewer than for team totals
+UPSIDE_POINTS = 10  # Armband points counted as a captaincy haul
+
+
+def captain_pairs(plays, points, upside_points=UPSIDE_POINTS):
+    """
+    Evaluates every ordered (captain, vice-captain) pair of a team over simulated gameweeks.
+
+    The armband doubles the captain's score; if the captain does not play, the vice-captain's
+    score is doubled instead. All pairs are evaluated as one pairs x simulations array.
+
+    Parameters:
+    - plays (np.ndarray): players x simulations booleans, True where the player plays.
+    - points (np.ndarray): players x simulations scores, 0 where the player does not play.
+    - upside_points (int): Extra points from the armband counted as a haul.
+
+    Returns:
+    - pairs (pd.DataFrame): One row per ordered pair with the `captain` and `vice` row numbers,
+      the mean extra points of the armband (`armband_points`), the chance of at least
+      `upside_points` of them (`upside`) and the chance the vice-captain's score counts (`vice_used`).
+    """
+    n_players = len(points)
+    captain, vice = np.nonzero(~np.eye(n_players, dtype=bool))
+    captain_plays = plays[captain]
+    # Scores are 0 for players who do not play, so a vice who does not play adds nothing
+    armband = np.where(captain_plays, points[captain], points[vice])
+    return pd.DataFrame({
+        'captain': captain,
+        'vice': vice,
+        'armband_points': armband.mean(axis=1),
+        'upside': (armband >= upside_points).mean(axis=1),
+        'vice_used': (~captain_plays & plays[vice]).mean(axis=1),
+    })
+
+
+def rank_captains(simulator, team, expected_points, by='armband_points', n_simulations=CAPTAIN_SIMULATIONS,
+                  seed=SIMULATION_SEED, upside_points=UPSIDE_POINTS):
+    """
+    Ranks the captain / vice-captain pairs of a team.
+
+    Parameters:
+    - simulator (PointsSimulator): Fitted simulator.
+    - team (list of dict): The XI; each player needs `id` and `web_name`.
+    - expected_points (array-like): Each player's expected points, in the order of `team`.
+    - by (str): 'armband_points' to rank by expected value, 'upside' by the chance of a haul.
+    - n_simulations (int): Simulated gameweeks.
+    - seed (int): Seed of the random generator.
+    - upside_points (int): Extra points from the armband counted as a haul.
+
+    Returns:
+    - ranking (pd.DataFrame): Every pair, best first, with the captain and vice names, the
+      expected armband points, the upside chance and how often the vice-captain's score counts.
+    """
+    if len(team) < 2:
+        return pd.DataFrame(columns=['Captain', 'Vice', 'Armband Points', 'Upside', 'Vice Used'])
+    plays, points = simulator.draw([player['id'] for player in team], expected_points, n_simulations, seed)
+    pairs = captain_pairs(plays, points, upside_points)
+    other = 'upside' if by == 'armband_points' else 'armband_points'
+    pairs = pairs.sort_values([by, other], ascending=False, kind='stable')
+
+    names = np.array([player['web_name'] for player in team])
+    return pd.DataFrame({
+        'Captain': names[pairs['captain']],
+        'Vice': names[pairs['vice']],
+        'Armband Points': pairs['armband_points'].to_numpy(),
+        'Upside': pairs['upside'].to_numpy(),
+        'Vice Used': pairs['vice_used'].to_numpy(),
+    })
@@ -3,6 +3,15 @@
 # App Constants
 APP_TITLE = "Fantasy Premier League"
 BUDGET = 1000  # Represents £100.0m (since costs are in tenths of millions)
+SEASON = '2024-25'  # Season of the gameweek data the pages and the points model use
+
+# FPL squad rules: 15 players split by position, at most 3 from any one club
+SQUAD_COMPOSITION = {'GKP': 2, 'DEF': 5, 'MID': 5, 'FWD': 3}
+MAX_PLAYERS_PER_CLUB = 3
+
+# Transfers: points deducted per transfer beyond the free ones, and how many free transfers can be banked
+TRANSFER_HIT = 4
+MAX_FREE_TRANSFERS = 5
 
 # Define formations with positions and required players
 FORMATION_MAP = {
@@ -40,6 +49,11 @@ FIELD_COORDS_HALF = {
     },
 }
 
+# Team names used by other data sources mapped to their FPL API spelling
+TEAM_NAME_ALIASES = {
+    'Brighton and Hove Albion': 'Brighton',
+}
+
 # Position-specific metrics
 POSITION_METRICS = {
     'GKP': ['saves', 'clean_sheets', 'goals_conceded'],
@@ -113,6 +127,9 @@ SECTION_ICONS = {
     'Cost Distribution': '💸',
     'Shared Players': '🔍',
     'Target' : '🎯',
+    'Transfer Planner': '🔁',
+    'Score Distribution': '🎲',
+    'Captaincy': '🎖️',
     # Add the following keys:
     'Your Team': '👤',       # Represents the user's team
     'Best Team': '🏆'        # Represents the best possible team
@@ -1,10 +1,24 @@
 # data_loader.py
 
+import logging
+
+import numpy as np
 import pandas as pd
 import requests
 import streamlit as st
 from utils.constants import COMMON_METRICS
-import unicodedata
+from utils.snapshot_store import SnapshotStore
+from utils.gameweek_store import sync_gameweeks, local_gameweeks, read_gameweeks
+from utils.schema import apply_schema, GAMEWEEK_SCHEMA, PLAYER_SCHEMA
+from utils.normalization import strip_accents, photo_urls
+from utils.registry import register_dataset, get_dataset, loaded_keys, refresh_dataset
+from utils.element_store import get_element_store
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_URL = "https://fantasy.premierleague.com/api/bootstrap-static/"
+FIXTURES_URL = "https://fantasy.premierleague.com/api/fixtures/"
+FIXTURE_COLS = ['id', 'event', 'team_h', 'team_a', 'kickoff_time', 'finished']
 
 
 READ_COLS = ['name',
@@ -49,17 +63,8 @@ READ_COLS = ['name',
  'yellow_cards',
  'GW']
 
-@st.cache_data
-def load_player_data_from_api():
-    """Fetches player data from the FPL API and returns a DataFrame with selected columns."""
-    try:
-        response = requests.get("https://fantasy.premierleague.com/api/bootstrap-static/")
-        response.raise_for_status()
-        data = response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"There was an error: {e} while retrieving data")
-        return pd.DataFrame()  # Return empty DataFrame on error
-
+def build_player_table(data):
+    """Builds the player DataFrame with selected columns from a bootstrap-static payload."""
     # Load data into DataFrames
     df_elements = pd.DataFrame(data["elements"])
     df_element_types = pd.DataFrame(data["element_types"])
@@ -101,10 +106,7 @@ def load_player_data_from_api():
     df_merged['player_value_score'] = df_merged['total_points']
 
     # Construct player photo URLs
-    df_merged['photo_url'] = df_merged.apply(
-        lambda row: f"https://resources.premierleague.com/premierleague/photos/players/110x140/p{row['code']}.png",
-        axis=1
-    )
+    df_merged['photo_url'] = photo_urls(df_merged['code'])
 
     # Select the desired columns
     columns_to_use = [
@@ -120,40 +122,191 @@ def load_player_data_from_api():
     df_final = df_merged[columns_to_use]
     df_final.loc[:, 'full_name_pre'] = df_final['first_name'] + ' ' + df_final['second_name']
     # Remove accents from player_names
-    
-    # Function to remove accents
-    def remove_accents(input_str):
-        return ''.join(
-            char for char in unicodedata.normalize('NFD', input_str)
-            if unicodedata.category(char) != 'Mn'
-        )
+    df_final['full_name'] = strip_accents(df_final['full_name_pre'])
 
-    # Apply the function to the 'web_name' column
-    df_final['full_name'] = df_final['full_name_pre'].apply(remove_accents)
+    return apply_schema(df_final, PLAYER_SCHEMA)
 
-    return df_final
+def add_derived_metrics(players):
+    """
+    Adds the metrics the charts derive from the player table, computed once when it is loaded.
 
-@st.cache_data()
-def load_gameweek_data_from_github(year: str):
-    """Fetches gameweek by gameweek player data from the Github Dataset and returns a DataFrame with selected columns."""
+    - now_cost_m: cost in £ millions.
+    - points/90: total points per 90 minutes played (0 for players without minutes).
+    - ROI: points/90 per £ million.
+    """
+    now_cost_m = players['now_cost'] / 10
+    with np.errstate(divide='ignore', invalid='ignore'):
+        points_per_90 = (players['total_points'] / players['minutes'] * 90).replace([np.inf, -np.inf], np.nan)
+        points_per_90 = points_per_90.fillna(0).round(3)
+        roi = (points_per_90 / now_cost_m).replace([np.inf, -np.inf], np.nan).fillna(0).round(3)
+    return players.assign(**{'now_cost_m': now_cost_m, 'points/90': points_per_90, 'ROI': roi})
+
+def build_fixture_table(data):
+    """Builds the fixture DataFrame from a fixtures payload, leaving out fixtures not yet scheduled."""
+    fixtures = pd.DataFrame(data, columns=FIXTURE_COLS).dropna(subset=['event'])
+    return fixtures.astype({'id': 'int16', 'event': 'int8', 'team_h': 'int8', 'team_a': 'int8', 'finished': 'bool'})
+
+@st.cache_resource
+def get_bootstrap_store():
+    """Returns the process-wide snapshot store for the FPL bootstrap-static endpoint."""
+    return SnapshotStore("bootstrap-static", BOOTSTRAP_URL, build_player_table)
+
+@st.cache_resource
+def get_fixtures_store():
+    """Returns the process-wide snapshot store for the FPL fixtures endpoint."""
+    return SnapshotStore("fixtures", FIXTURES_URL, build_fixture_table)
+
+@register_dataset('players')
+def _load_players():
+    """
+    Loads the FPL player DataFrame with selected columns and derived metrics from the local
+    bootstrap-static snapshot.
+
+    A stale snapshot is served as is while it is revalidated against the FPL API in the background,
+    so only the very first run, with nothing on disk yet, waits on the network.
+    """
+    store = get_bootstrap_store()
+    players = store.table()
+    if players is None:
+        try:
+            store.refresh()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            st.error(f"There was an error: {e} while retrieving data")
+            return pd.DataFrame()  # Return empty DataFrame on error
+        players = store.table()
+    elif store.is_stale():
+        store.refresh_in_background()
+
+    return add_derived_metrics(players)
+
+@register_dataset('fixtures')
+def _load_fixtures():
+    """
+    Loads every fixture of the current season (gameweek, home and away team ids) from the local
+    fixtures snapshot, revalidated in the background like the player table.
+    """
+    store = get_fixtures_store()
+    fixtures = store.table()
+    if fixtures is None:
+        try:
+            store.refresh()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            st.error(f"There was an error: {e} while retrieving data")
+            return pd.DataFrame(columns=FIXTURE_COLS)
+        fixtures = store.table()
+    elif store.is_stale():
+        store.refresh_in_background()
+
+    return fixtures
+
+def prepare_gameweek_data(df):
+    """Standardizes positions and adds accent-free player names to a gameweek DataFrame."""
+    df["position"] = df["position"].replace({'GK': 'GKP'})
+
+    # Remove accents from player names
+    df['name_cleaned'] = strip_accents(df['name'])
     
+    return apply_schema(df, GAMEWEEK_SCHEMA)
+
+@register_dataset('gameweeks')
+def _load_gameweeks(year: str):
+    """
+    Loads gameweek by gameweek player data for a season with selected columns.
+
+    The season is kept in a local store partitioned by gameweek; each call only downloads the
+    gameweeks from the Github Dataset that are new since the last one, then reads the store.
+    If Github cannot be reached the locally held gameweeks are returned.
+    """
     try:
-        url_gw = f"https://raw.githubusercontent.com/vaastav/Fantasy-Premier-League/master/data/{year}/gws/merged_gw.csv"
-        df = pd.read_csv(url_gw, usecols=READ_COLS)
-    except Exception as e:
-        st.error(f"There was an error: {e} while retrieving data")
-        return pd.DataFrame()
-    
-    df["position"] = df["position"].apply(lambda x: 'GKP' if x == 'GK' else x)
-    
-    # Function to remove accents
-    def remove_accents(input_str):
-        return ''.join(
-            char for char in unicodedata.normalize('NFD', input_str)
-            if unicodedata.category(char) != 'Mn'
-        )
-
-    # Apply the function to the 'web_name' column
-    df['name_cleaned'] = df['name'].apply(remove_accents)
-    
-    return df
\ No newline at end of file
+        sync_gameweeks(year, READ_COLS, prepare_gameweek_data)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        if not local_gameweeks(year):
+            st.error(f"There was an error: {e} while retrieving data")
+            return pd.DataFrame()
+
+    # Partitions carry their own categories; re-apply the schema so the season shares one set
+    return apply_schema(read_gameweeks(year), GAMEWEEK_SCHEMA)
+
+def load_player_data_from_api():
+    """Returns the shared FPL player DataFrame (see `_load_players`); treat it as read-only."""
+    return get_dataset('players').data
+
+def load_gameweek_data_from_github(year: str):
+    """Returns the shared gameweek DataFrame of a season (see `_load_gameweeks`); treat it as read-only."""
+    return get_dataset('gameweeks', year).data
+
+def load_fixtures():
+    """Returns the shared fixture DataFrame (see `_load_fixtures`); treat it as read-only."""
+    return get_dataset('fixtures').data
+
+def team_names():
+    """Returns {team id: team name} for the current season from the bootstrap snapshot."""
+    payload = get_bootstrap_store().payload() or {}
+    return {team['id']: team['name'] for team in payload.get('teams', [])}
+
+def gameweek_deadlines():
+    """Returns the deadline of every gameweek of the current season as a Unix time, from the bootstrap snapshot."""
+    payload = get_bootstrap_store().payload() or {}
+    deadlines = pd.to_datetime([event['deadline_time'] for event in payload.get('events', []) if event.get('deadline_time')], utc=True, errors='coerce')
+    return sorted(deadline.timestamp() for deadline in deadlines.dropna())
+
+def latest_finished_gameweek():
+    """Returns the last finished gameweek of the current season from the bootstrap snapshot, 0 before the season starts."""
+    payload = get_bootstrap_store().payload() or {}
+    finished = [event['id'] for event in payload.get('events', []) if event.get('finished')]
+    return max(finished, default=0)
+
+@register_dataset('element_summary')
+def _load_element_summary(table: str):
+    """
+    Loads one table ('history', 'history_past' or 'fixtures') of the per-player element-summary store.
+
+    Only reads the local store, which the refresh scheduler keeps up to date (see
+    `sync_element_summaries`). On a cold start, with nothing stored yet, a sync is started in the
+    background and the loaded tables are rebuilt once it lands; until then the table is empty.
+    """
+    store = get_element_store()
+    if not store.manifest()['synced']:
+        sync_element_summaries(background=True)
+    return store.read(table)
+
+def _refresh_element_summaries():
+    """Rebuilds the element-summary tables held by the registry from the store."""
+    for name, args in loaded_keys():
+        if name == 'element_summary':
+            refresh_dataset(name, *args)
+
+def sync_element_summaries(background: bool = False):
+    """
+    Brings the element-summary store up to date for every player of the bootstrap table; only
+    players not yet synced at the latest finished gameweek are downloaded. The element-summary
+    tables held by the registry are rebuilt once new summaries are stored.
+
+    Parameters:
+    - background (bool): Sync on a worker thread instead of waiting for it.
+
+    Returns:
+    - report (dict or None): The store's sync report, None for a background sync or without players.
+    """
+    players = get_dataset('players').data
+    if players.empty:
+        return None
+    store = get_element_store()
+    if background:
+        store.sync_in_background(players['id'], latest_finished_gameweek(), on_done=_refresh_element_summaries)
+        return None
+    report = store.sync(players['id'], latest_finished_gameweek())
+    if report['failed']:
+        logger.warning("Element summaries of %d players failed; they are retried on the next sync", len(report['failed']))
+    if report['fetched']:
+        _refresh_element_summaries()
+    return report
+
+def load_element_summary(table: str = 'history'):
+    """Returns the shared element-summary table (see `_load_element_summary`); treat it as read-only."""
+    return get_dataset('element_summary', table).data
+
+def next_gameweek(year: str):
+    """Returns the first gameweek of a season with no results yet."""
+    gameweeks = load_gameweek_data_from_github(year)
+    return int(gameweeks['GW'].max()) + 1 if not gameweeks.empty else 1
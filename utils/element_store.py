@@ -0,0 +1,275 @@
+# element_store.py
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import httpx
+import pandas as pd
+import streamlit as st
+from utils.snapshot_store import REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+ELEMENT_SUMMARY_URL = "https://fantasy.premierleague.com/api/element-summary/{id}/"
+ELEMENT_DIR = "data/element_summary"
+ELEMENT_TABLES = ('history', 'history_past', 'fixtures')
+MAX_CONCURRENCY = 20  # Requests in flight at once
+MAX_RETRIES = 4  # Retries per player after the first attempt
+BACKOFF = 0.5  # Seconds before the first retry; doubled (plus jitter) for each further one
+BATCH_SIZE = 100  # Players per written part, i.e. the progress kept if a sync is interrupted
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class ElementSummaryStore(object):
+    """
+    Local columnar store of the FPL `element-summary/{id}` endpoint, one table per payload section.
+
+    `sync` downloads the summaries of many players concurrently: an asyncio httpx client with a
+    bounded pool, at most `max_concurrency` requests in flight, and retries with exponential
+    backoff on timeouts, 429s and 5xx (honouring Retry-After). Players are written in batches,
+    each batch as one Parquet part per table plus an update of `manifest.json`, so an interrupted
+    or partly failed sync resumes where it stopped. The manifest records the gameweek each
+    player was synced at; a later sync only fetches players synced before the latest finished
+    gameweek, and players new to the game.
+
+    One store is shared by every session and thread: commits, compaction and reads hold the
+    store's lock, so a read never sees a manifest or part list another thread is rewriting, and
+    syncs run one at a time.
+    """
+
+    def __init__(self, root=ELEMENT_DIR, url=ELEMENT_SUMMARY_URL, max_concurrency=MAX_CONCURRENCY,
+                 retries=MAX_RETRIES, backoff=BACKOFF, batch_size=BATCH_SIZE, timeout=REQUEST_TIMEOUT):
+        self.root = root
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._lock = threading.RLock()  # Held while the parts or the manifest are read or rewritten
+        self._sync_lock = threading.Lock()
+        self._syncing = False
+
+    def _manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def manifest(self):
+        """Returns {'synced': {player id (str): gameweek}, 'updated_at': time}, empty if nothing is stored."""
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'synced': {}}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path())
+
+    def stale_ids(self, ids, gameweek):
+        """Returns the player ids not yet synced at `gameweek`."""
+        synced = self.manifest()['synced']
+        return [int(i) for i in dict.fromkeys(ids) if synced.get(str(int(i)), -1) < gameweek]
+
+    async def _fetch(self, client, semaphore, player_id):
+        """Returns the summary of one player, None if it does not exist, or raises after the last retry."""
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt * (1 + random.random() / 2)
+            try:
+                async with semaphore:
+                    response = await client.get(self.url.format(id=player_id))
+                if response.status_code == 404:
+                    return None
+                if response.status_code not in _RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                error = httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = e
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+        raise error
+
+    def _write_batch(self, summaries):
+        """Writes one Parquet part per table for a batch of {player id: summary}."""
+        os.makedirs(self.root, exist_ok=True)
+        part = f"part-{time.time_ns()}"
+        for table in ELEMENT_TABLES:
+            rows = [
+                dict(record, element=player_id)
+                for player_id, summary in summaries.items()
+                for record in summary.get(table, [])
+            ]
+            frame = pd.DataFrame(rows) if rows else pd.DataFrame({'element': pd.Series(dtype='int64')})
+            path = os.path.join(self.root, f"{table}.{part}.parquet")
+            frame.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+
+        # The player list is written last: it commits the part, and lets players whose sections
+        # are now empty replace their older rows on read
+        players_path = os.path.join(self.root, f"{part}.players.json")
+        with open(players_path + ".tmp", "w") as f:
+            json.dump(list(summaries), f)
+        os.replace(players_path + ".tmp", players_path)
+
+    def _commit(self, summaries, gameweek):
+        """Writes a batch and marks its players as synced at `gameweek`."""
+        with self._lock:
+            self._write_batch(summaries)
+            manifest = self.manifest()
+            manifest['synced'].update({str(player_id): gameweek for player_id in summaries})
+            manifest['updated_at'] = time.time()
+            self._write_manifest(manifest)
+        return len(summaries)
+
+    async def _sync(self, ids, gameweek):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        connect, read = self.timeout
+        timeout = httpx.Timeout(read, connect=connect, pool=None)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        fetched, failed = 0, []
+
+        async def fetch(player_id):
+            try:
+                return player_id, await self._fetch(client, semaphore, player_id)
+            except (httpx.HTTPError, ValueError) as e:
+                return player_id, e
+
+        summaries = {}
+        async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+            for done in asyncio.as_completed([fetch(player_id) for player_id in ids]):
+                player_id, result = await done
+                if isinstance(result, Exception):
+                    failed.append(player_id)
+                else:
+                    summaries[player_id] = result or {}
+                if len(summaries) >= self.batch_size:
+                    fetched += self._commit(summaries, gameweek)
+                    summaries = {}
+        if summaries:
+            fetched += self._commit(summaries, gameweek)
+        return fetched, failed
+
+    def sync(self, ids, gameweek):
+        """
+        Brings the store up to date for the given players, after any sync already running.
+
+        Parameters:
+        - ids (iterable of int): Bootstrap-static player ids.
+        - gameweek (int): Latest finished gameweek; players synced at it or later are skipped.
+
+        Returns:
+        - report (dict): Number of players `fetched`, `skipped` as up to date, and the ids that
+          `failed` after all retries (they are retried by the next sync).
+        """
+        ids = list(dict.fromkeys(int(i) for i in ids))
+        with self._sync_lock:
+            stale = self.stale_ids(ids, gameweek)
+            fetched, failed = asyncio.run(self._sync(stale, gameweek)) if stale else (0, [])
+            if fetched:
+                self.compact()
+        return {'fetched': fetched, 'skipped': len(ids) - len(stale), 'failed': failed}
+
+    def sync_in_background(self, ids, gameweek, on_done=None):
+        """Starts `sync` on a daemon thread unless one is already running, then calls `on_done` if it fetched anything."""
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        ids = list(ids)
+
+        def run():
+            try:
+                report = self.sync(ids, gameweek)
+                logger.info("Synced %d element summaries, %d failed", report['fetched'], len(report['failed']))
+                if report['fetched'] and on_done is not None:
+                    on_done()
+            except Exception as e:  # The next sync retries; the thread must not die with a traceback
+                logger.exception("Element summary sync failed: %s", e)
+            finally:
+                with self._lock:
+                    self._syncing = False
+
+        threading.Thread(target=run, name="element-summary-sync", daemon=True).start()
+
+    def _parts(self):
+        """Returns the part names in the order they were written."""
+        names = (os.path.basename(path)[:-len(".players.json")] for path in glob.glob(os.path.join(self.root, "*.players.json")))
+        return sorted(names, key=lambda name: int(name.split("-")[1]))
+
+    def read(self, table):
+        """
+        Returns one table of the store, e.g. 'history', with an `element` column holding the player id.
+
+        Each player's rows come from the last part that holds the player.
+        """
+        if table not in ELEMENT_TABLES:
+            raise ValueError(f"Unknown element-summary table {table!r}, expected one of {ELEMENT_TABLES}")
+        with self._lock:
+            return self._read(table)
+
+    def _read(self, table):
+        frames = []
+        claimed = set()
+        for part in reversed(self._parts()):
+            with open(os.path.join(self.root, f"{part}.players.json")) as f:
+                players = set(json.load(f)) - claimed
+            claimed |= players
+            if not players:
+                continue
+            frame = pd.read_parquet(os.path.join(self.root, f"{table}.{part}.parquet"))
+            frames.append(frame[frame['element'].isin(players)])
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames[::-1], ignore_index=True)
+
+    def compact(self):
+        """Rewrites all parts as a single part holding each player's latest rows."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        parts = self._parts()
+        if len(parts) < 2:
+            return
+        tables = {table: self._read(table) for table in ELEMENT_TABLES}
+        players = set()
+        for part in parts:
+            with open(os.path.join(self.root, f"{part}.players.json")) as f:
+                players |= set(json.load(f))
+
+        part = f"part-{time.time_ns()}"
+        for table, frame in tables.items():
+            if frame.empty:
+                frame = pd.DataFrame({'element': pd.Series(dtype='int64')})
+            path = os.path.join(self.root, f"{table}.{part}.parquet")
+            frame.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+        players_path = os.path.join(self.root, f"{part}.players.json")
+        with open(players_path + ".tmp", "w") as f:
+            json.dump(sorted(players), f)
+        os.replace(players_path + ".tmp", players_path)
+
+        for old in parts:
+            os.remove(os.path.join(self.root, f"{old}.players.json"))
+            for table in ELEMENT_TABLES:
+                os.remove(os.path.join(self.root, f"{table}.{old}.parquet"))
+
+
+@st.cache_resource
+def get_element_store():
+    """Returns the element-summary store shared by all sessions."""
+    return ElementSummaryStore()
@@ -0,0 +1,80 @@
+# figure_cache.py
+
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+import streamlit as st
+
+FIGURE_CACHE_SIZE = 32  # Figures kept across all sessions before the least recently used is dropped
+
+
+class FigureCache(object):
+    """
+    Least-recently-used cache of serialized Plotly figures, shared by every session.
+
+    Figures are stored as JSON, keyed by the chart, its parameters and the version of the
+    data it was drawn from, so a figure is built once per data version instead of on every
+    rerun of every session.
+    """
+
+    def __init__(self, max_entries=FIGURE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Returns the figure JSON stored under `key`, calling `build()` for the figure on a miss."""
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key]
+
+        figure_json = pio.to_json(build(), validate=False)
+        with self._lock:
+            self.misses += 1
+            self._figures[key] = figure_json
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        return figure_json
+
+    def stats(self):
+        """Returns the hit and miss counts, the number of cached figures and their total size in bytes."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._figures),
+                'bytes': sum(len(figure_json) for figure_json in self._figures.values()),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Returns the figure cache shared by all sessions."""
+    return FigureCache()
+
+
+def cached_figure(build, df, version, *params):
+    """
+    Returns the figure `build(df, *params)`, served from the shared figure cache.
+
+    Parameters:
+    - build (callable): Function returning a Plotly figure; it must depend only on its arguments.
+    - df (pd.DataFrame): Data the figure is drawn from.
+    - version (str): Version of `df`, e.g. its registry `Dataset.version`.
+    - *params: Further (hashable) arguments of `build`.
+
+    Returns:
+    - fig (go.Figure): The figure.
+    """
+    key = (build.__module__, build.__qualname__, version, params)
+    return pio.from_json(get_figure_cache().get(key, lambda: build(df, *params)))
@@ -0,0 +1,99 @@
+# gameweek_store.py
+
+import os
+import re
+from io import BytesIO
+
+import pandas as pd
+import requests
+from utils.snapshot_store import REQUEST_TIMEOUT
+
+GITHUB_DATA_URL = "https://raw.githubusercontent.com/vaastav/Fantasy-Premier-League/master/data"
+GAMEWEEK_DIR = "data/gameweeks"
+_PARTITION = re.compile(r"^GW(\d+)\.parquet$")
+
+
+def _season_dir(year, root):
+    return os.path.join(root, year)
+
+
+def _partition_path(year, gw, root):
+    return os.path.join(_season_dir(year, root), f"GW{gw:02d}.parquet")
+
+
+def local_gameweeks(year: str, root: str = GAMEWEEK_DIR):
+    """Returns the sorted gameweeks of a season held in the local store."""
+    season_dir = _season_dir(year, root)
+    if not os.path.isdir(season_dir):
+        return []
+    matches = (_PARTITION.match(name) for name in os.listdir(season_dir))
+    return sorted(int(match.group(1)) for match in matches if match)
+
+
+def _write_partition(df, year, gw, root):
+    os.makedirs(_season_dir(year, root), exist_ok=True)
+    tmp = _partition_path(year, gw, root) + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, _partition_path(year, gw, root))
+
+
+def _fetch_csv(url, columns):
+    """Downloads a CSV with a timeout; returns None if it does not exist (yet)."""
+    response = requests.get(url, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return pd.read_csv(BytesIO(response.content), usecols=lambda col: col in columns)
+
+
+def sync_gameweeks(year: str, columns, prepare, base_url: str = GITHUB_DATA_URL, root: str = GAMEWEEK_DIR):
+    """
+    Brings the local store of a season up to date, one Parquet partition per gameweek.
+
+    An empty store is seeded from the season's `merged_gw.csv`. After that only the latest
+    held gameweek (which may have been in progress) and the ones after it are downloaded from
+    the per-gameweek `gw{N}.csv` files, so a refresh costs one gameweek of I/O instead of the
+    whole season.
+
+    Parameters:
+    - year (str): Season, e.g. '2024-25'.
+    - columns (list): Columns to keep.
+    - prepare (callable): Transform applied to each gameweek's frame before it is stored.
+    - base_url (str): Root of the dataset.
+    - root (str): Local store directory.
+
+    Returns:
+    - written (list of int): Gameweeks that were (re)written.
+
+    Raises:
+    - requests.exceptions.RequestException: If the dataset cannot be reached.
+    """
+    held = local_gameweeks(year, root)
+    written = []
+
+    if not held:
+        merged = _fetch_csv(f"{base_url}/{year}/gws/merged_gw.csv", columns)
+        if merged is None:
+            return written
+        for gw, gw_df in prepare(merged).groupby("GW"):
+            _write_partition(gw_df, year, int(gw), root)
+            written.append(int(gw))
+        return written
+
+    gw = held[-1]
+    while True:
+        gw_df = _fetch_csv(f"{base_url}/{year}/gws/gw{gw}.csv", columns)
+        if gw_df is None:
+            break
+        _write_partition(prepare(gw_df.assign(GW=gw)), year, gw, root)
+        written.append(gw)
+        gw += 1
+    return written
+
+
+def read_gameweeks(year: str, root: str = GAMEWEEK_DIR):
+    """Returns every locally held gameweek of a season as one DataFrame, or an empty frame if none are held."""
+    gameweeks = local_gameweeks(year, root)
+    if not gameweeks:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(_partition_path(year, gw, root)) for gw in gameweeks], ignore_index=True)
@@ -0,0 +1,167 @@
+# identity.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_loader import load_player_data_from_api, load_gameweek_data_from_github
+from utils.normalization import name_keys, team_keys
+from utils.predictions import PREDICTIONS_PATH
+from utils.registry import get_dataset
+
+
+def _key_lookup(names, teams, keys):
+    """Returns a Series mapping (name key, team key) to player key, keeping the first of any duplicates."""
+    lookup = pd.Series(np.asarray(keys), index=pd.MultiIndex.from_arrays([name_keys(names), team_keys(teams)]))
+    return lookup[~lookup.index.duplicated(keep='first')]
+
+
+def _words(name_key):
+    return frozenset(name_key.replace('.', ' ').split())
+
+
+def _prediction_keys(prediction_table, player_data):
+    """
+    Returns the player key of every prediction row, -1 where no player matches.
+
+    Rows written by the points model carry the player's `element`. Other rows (such as the bundled
+    table) are matched within their team on the web name, then the full name, then a full name
+    with the same words in another order ('Tomiyasu Takehiro'), and last to the one player of the
+    team whose surname is the last word of the row's name ('Ola Aina' for Aina, but not
+    'Harrison Armstrong' for Harrison). Each distinct (name, web name, team) is matched once.
+    """
+    triples = pd.MultiIndex.from_arrays([
+        name_keys(prediction_table['player']).to_numpy(),
+        name_keys(prediction_table['web_name']).to_numpy(),
+        team_keys(prediction_table['team']).to_numpy(),
+    ])
+    codes, names = triples.factorize()
+    names = names.to_frame(index=False, name=['player', 'web_name', 'team'])
+
+    by_web_name = _key_lookup(player_data['web_name'], player_data['team_name'], player_data['id'])
+    by_full_name = _key_lookup(player_data['full_name'], player_data['team_name'], player_data['id'])
+    keys = by_web_name.reindex(pd.MultiIndex.from_arrays([names['web_name'], names['team']])).to_numpy(dtype=float, copy=True)
+    unmatched = np.isnan(keys)
+    keys[unmatched] = by_full_name.reindex(pd.MultiIndex.from_arrays([names['player'], names['team']])[unmatched]).to_numpy(dtype=float)
+
+    unmatched = np.flatnonzero(np.isnan(keys))
+    if len(unmatched):
+        candidates = pd.DataFrame({
+            'id': player_data['id'].to_numpy(),
+            'team': team_keys(player_data['team_name']).to_numpy(),
+            'words': name_keys(player_data['full_name']).map(_words).to_numpy(),
+            'surname': name_keys(player_data['web_name']).str.split('.').str[-1].to_numpy(),
+        })
+        by_team = dict(tuple(candidates.groupby('team')))
+        for i in unmatched:
+            team = by_team.get(names.at[i, 'team'])
+            if team is None:
+                continue
+            words = _words(names.at[i, 'player'])
+            surname = names.at[i, 'player'].split()[-1:]
+            for match in (team['words'] == words, team['surname'].isin(surname)):
+                if match.sum() == 1:
+                    keys[i] = team['id'][match].iloc[0]
+                    break
+    keys = np.nan_to_num(keys, nan=-1).astype(np.int64)[codes]
+
+    if 'element' in prediction_table:
+        element = pd.to_numeric(prediction_table['element'], errors='coerce')
+        known = element.isin(player_data['id']).to_numpy()
+        keys = np.where(known, element.fillna(-1).to_numpy(), keys).astype(np.int64)
+    return keys
+
+
+class PlayerIdentity(object):
+    """
+    One integer key per player across the FPL API, the gameweek data and the prediction table.
+
+    The key is the bootstrap-static `id`. Gameweek rows carry it as `element` when the
+    season matches, which is checked against the player's name; other rows are matched on
+    (name, team). Prediction rows are resolved by `_prediction_keys`, and the prediction index
+    is keyed on the result. Each source's rows are grouped by key once, so every later lookup
+    is a dictionary access instead of a string comparison over a whole column.
+    `version` identifies the data the index was built from, for caches derived from it.
+    """
+
+    def __init__(self, player_data, gameweek_data, prediction_table=None, version=None):
+        self.version = version
+        self.players = player_data.set_index('id', drop=False).rename_axis('player_key')
+        self.gameweek_data = gameweek_data
+
+        by_full_name = _key_lookup(player_data['full_name'], player_data['team_name'], player_data['id'])
+        full_name_keys = pd.Series(name_keys(player_data['full_name']).to_numpy(), index=player_data['id'].to_numpy())
+
+        # Gameweek rows: trust `element` when it points at a player of the same name
+        self.gameweek_keys = np.full(len(gameweek_data), -1, dtype=np.int64)
+        if not gameweek_data.empty:
+            triples = pd.MultiIndex.from_frame(gameweek_data[['element', 'name', 'team']].astype({'element': np.int64}))
+            codes, pairs = triples.factorize()
+            pairs = pairs.to_frame(index=False, name=['element', 'name', 'team'])
+            pair_name_keys = name_keys(pairs['name']).to_numpy()
+            same_player = full_name_keys.reindex(pairs['element']).to_numpy() == pair_name_keys
+            by_name = by_full_name.reindex(pd.MultiIndex.from_arrays([pair_name_keys, team_keys(pairs['team'])]))
+            pair_keys = np.where(same_player, pairs['element'], by_name.fillna(-1).to_numpy()).astype(np.int64)
+            self.gameweek_keys = pair_keys[codes]
+        self._gameweek_rows = pd.Series(self.gameweek_keys).groupby(self.gameweek_keys).indices
+
+        self.prediction_table = prediction_table
+        self.prediction_keys = np.full(0, -1, dtype=np.int64)
+        if prediction_table is not None:
+            self.prediction_keys = _prediction_keys(prediction_table, player_data)
+
+    @property
+    def unmatched_gameweek_rows(self):
+        """Number of gameweek rows that could not be linked to a player."""
+        return int((self.gameweek_keys == -1).sum())
+
+    @property
+    def unmatched_prediction_rows(self):
+        """Number of prediction rows that could not be linked to a player."""
+        return int((self.prediction_keys == -1).sum())
+
+    def name(self, key):
+        """Returns the full name of a player."""
+        return self.players.at[key, 'full_name']
+
+    def keys_by_name(self):
+        """Returns every player key, ordered by full name."""
+        return self.players.sort_values('full_name').index.tolist()
+
+    def gameweeks(self, keys):
+        """
+        Returns the gameweek rows of one or more players, with their `player_key` and `full_name`.
+
+        Parameters:
+        - keys (int or list of int): Player keys.
+
+        Returns:
+        - rows (pd.DataFrame): Gameweek rows of the players, in the original order.
+        """
+        keys = [keys] if np.isscalar(keys) else keys
+        empty = np.array([], dtype=np.int64)
+        positions = np.sort(np.concatenate([self._gameweek_rows.get(key, empty) for key in keys] + [empty]))
+        player_keys = self.gameweek_keys[positions]
+        return self.gameweek_data.iloc[positions].assign(
+            player_key=player_keys,
+            full_name=self.players['full_name'].reindex(player_keys).to_numpy(),
+        )
+
+
+@st.cache_resource(max_entries=2)
+def _player_identity(year, players_version, gameweeks_version, predictions_version):
+    return PlayerIdentity(
+        load_player_data_from_api(),
+        load_gameweek_data_from_github(year),
+        get_dataset('predictions', PREDICTIONS_PATH).data,
+        version=(year, players_version, gameweeks_version, predictions_version),
+    )
+
+
+def load_player_identity(year: str):
+    """Returns the identity index of the shared datasets, built once per combination of their versions."""
+    return _player_identity(
+        year,
+        get_dataset('players').version,
+        get_dataset('gameweeks', year).version,
+        get_dataset('predictions', PREDICTIONS_PATH).version,
+    )
@@ -0,0 +1,51 @@
+# normalization.py
+
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+from utils.constants import TEAM_NAME_ALIASES
+
+PHOTO_URL_PREFIX = "https://resources.premierleague.com/premierleague/photos/players/110x140/p"
+
+
+@lru_cache(maxsize=None)
+def remove_accents(input_str):
+    """Returns the string without accents (combining marks after NFD decomposition)."""
+    return ''.join(
+        char for char in unicodedata.normalize('NFD', input_str)
+        if unicodedata.category(char) != 'Mn'
+    )
+
+
+@lru_cache(maxsize=None)
+def name_key(input_str):
+    """Returns the accent-free, trimmed, case-folded form of a name used for exact matching."""
+    return remove_accents(input_str).strip().casefold()
+
+
+def _map_unique(values, func):
+    """Applies `func` once per distinct value and maps the results back onto every row."""
+    values = pd.Series(values)
+    uniques = values.dropna().unique()
+    return values.map(dict(zip(uniques, map(func, uniques))))
+
+
+def strip_accents(names):
+    """Removes accents from a Series of names, normalizing each distinct name only once."""
+    return _map_unique(names, remove_accents)
+
+
+def name_keys(names):
+    """Returns matching keys for a Series of player names, normalizing each distinct name only once."""
+    return _map_unique(pd.Series(names).astype(str), name_key)
+
+
+def team_keys(teams):
+    """Maps team names to the FPL API spelling and returns their matching keys."""
+    return name_keys(pd.Series(teams).astype(str).replace(TEAM_NAME_ALIASES))
+
+
+def photo_urls(codes):
+    """Builds the Premier League photo URL for a Series of player `code`s."""
+    return PHOTO_URL_PREFIX + pd.Series(codes).astype(str) + ".png"
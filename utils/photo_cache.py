@@ -0,0 +1,198 @@
+# photo_cache.py
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+
+import httpx
+import streamlit as st
+from PIL import Image, ImageDraw
+from utils.snapshot_store import REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+PHOTO_DIR = "data/photos"
+THUMBNAIL_SIZE = (110, 140)  # Bounding box of the stored thumbnails, the size of the FPL photos
+MAX_CONNECTIONS = 16  # Concurrent photo downloads
+RETRY_AFTER = 60 * 60  # Seconds before a photo that failed to download is tried again
+
+
+def _placeholder(size=THUMBNAIL_SIZE):
+    """Draws a plain silhouette shown while a photo is missing or being fetched."""
+    image = Image.new("RGB", size, (55, 0, 60))
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.ellipse([width * 0.3, height * 0.15, width * 0.7, height * 0.5], fill=(120, 120, 130))
+    draw.ellipse([width * 0.15, height * 0.55, width * 0.85, height * 1.2], fill=(120, 120, 130))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _thumbnail(content, size=THUMBNAIL_SIZE):
+    """Decodes an image and re-encodes it as a PNG that fits in `size`."""
+    image = Image.open(BytesIO(content))
+    image.thumbnail(size)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _data_uri(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+class PhotoCache(object):
+    """
+    Local, content-addressed cache of player photo thumbnails, filled concurrently in the background.
+
+    Thumbnails are stored as `<sha1 of the PNG>.png`, so photos shared by several players (like the
+    CDN's default silhouette) are kept once; `index.json` maps each photo URL to its file. Pages
+    read thumbnails from memory or disk and never wait on the network: `prefetch` downloads the
+    missing URLs on a worker thread with an asyncio client limited to `max_connections`, and until
+    a photo arrives `data_uri` returns a placeholder.
+    """
+
+    def __init__(self, root=PHOTO_DIR, size=THUMBNAIL_SIZE, max_connections=MAX_CONNECTIONS,
+                 timeout=REQUEST_TIMEOUT, retry_after=RETRY_AFTER):
+        self.root = root
+        self.size = size
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._fetching = False
+        self._failed = {}  # url -> time of the failed attempt
+        self._uris = {}  # url -> data URI, for thumbnails already read
+        self._index = self._read_index()
+        self.placeholder = _data_uri(_placeholder(size))
+
+    def _index_path(self):
+        return os.path.join(self.root, "index.json")
+
+    def _read_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        with self._lock:
+            index = dict(self._index)
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, self._index_path())
+
+    def _store(self, url, png):
+        digest = hashlib.sha1(png).hexdigest()
+        path = os.path.join(self.root, f"{digest}.png")
+        if not os.path.exists(path):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, path)
+        with self._lock:
+            self._index[url] = digest
+
+    def missing(self, urls):
+        """Returns the URLs without a cached thumbnail, leaving out recent failures."""
+        now = time.time()
+        with self._lock:
+            return [
+                url for url in dict.fromkeys(urls)
+                if url and url not in self._index and now - self._failed.get(url, 0) > self.retry_after
+            ]
+
+    def thumbnail(self, url):
+        """Returns the cached PNG thumbnail of a photo URL, or None if it is not cached."""
+        with self._lock:
+            digest = self._index.get(url)
+        if digest is None:
+            return None
+        try:
+            with open(os.path.join(self.root, f"{digest}.png"), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def data_uri(self, url):
+        """Returns the cached photo of `url` as a data URI for an <img> tag, or the placeholder."""
+        uri = self._uris.get(url)
+        if uri is None:
+            png = self.thumbnail(url)
+            if png is None:
+                return self.placeholder
+            uri = self._uris[url] = _data_uri(png)
+        return uri
+
+    async def _fetch_all(self, urls):
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        connect, read = self.timeout
+        timeout = httpx.Timeout(read, connect=connect, pool=None)  # Waiting for a free connection is not a failure
+        fetched = 0
+        async with httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True) as client:
+            async def fetch(url):
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    png = await asyncio.to_thread(_thumbnail, response.content, self.size)
+                except (httpx.HTTPError, OSError, ValueError):
+                    with self._lock:
+                        self._failed[url] = time.time()
+                    return 0
+                self._store(url, png)
+                return 1
+
+            for result in await asyncio.gather(*(fetch(url) for url in urls)):
+                fetched += result
+        return fetched
+
+    def fetch(self, urls):
+        """
+        Downloads the missing photos of `urls` concurrently and waits for them.
+
+        Returns:
+        - fetched (int): Number of photos downloaded and stored.
+        """
+        urls = self.missing(urls)
+        if not urls:
+            return 0
+        os.makedirs(self.root, exist_ok=True)
+        fetched = asyncio.run(self._fetch_all(urls))
+        if fetched:
+            self._write_index()
+        return fetched
+
+    def prefetch(self, urls):
+        """Starts downloading the missing photos of `urls` on a daemon thread, unless a download is running."""
+        urls = self.missing(urls)
+        if not urls:
+            return
+        with self._lock:
+            if self._fetching:
+                return
+            self._fetching = True
+
+        def run():
+            try:
+                fetched = self.fetch(urls)
+                logger.info("Cached %d of %d player photos", fetched, len(urls))
+            finally:
+                with self._lock:
+                    self._fetching = False
+
+        threading.Thread(target=run, name="photo-prefetch", daemon=True).start()
+
+
+@st.cache_resource
+def get_photo_cache():
+    """Returns the photo cache shared by all sessions."""
+    return PhotoCache()
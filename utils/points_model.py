@@ -0,0 +1,329 @@
+# points_model.py
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+MODEL_DIR = "data/predictions"
+FORM_WINDOW = 4  # Previous fixtures averaged into a player's form
+RIDGE_ALPHA = 1.0  # L2 penalty of the regression, not applied to the intercept
+POSITIONS = ('GKP', 'DEF', 'MID', 'FWD')  # In FPL `element_type` order
+
+# Form features: mean of the source column over a player's previous FORM_WINDOW fixtures
+FORM_FEATURES = {
+    'form_points': 'total_points',
+    'form_minutes': 'minutes',
+    'form_starts': 'starts',
+    'form_xg': 'expected_goals',
+    'form_xa': 'expected_assists',
+    'form_bonus': 'bonus',
+}
+FEATURES = list(FORM_FEATURES) + ['season_points', 'opponent_conceded', 'was_home'] + [f'is_{p}' for p in POSITIONS]
+
+# Divisors bringing the features to similar scales, so one penalty suits them all
+_FEATURE_SCALE = {'form_points': 5.0, 'form_minutes': 90.0, 'form_bonus': 3.0,
+                  'season_points': 5.0, 'opponent_conceded': 5.0}
+
+PREDICTION_COLUMNS = ['element', 'player', 'web_name', 'gw', 'team', 'opponent_team', 'position', 'total_points',
+                      'pred_points_rounded']
+
+
+def _rolling_mean(values, groups, window=None, current=False):
+    """
+    Mean of each row's previous `window` rows (all of them if None) within its group, including
+    the row itself if `current`.
+
+    `values` must be sorted by group and time. Rolling sums are differences of one cumulative sum,
+    so the whole table takes a few vectorized passes. Rows with nothing to average are NaN.
+    """
+    shift = 0 if current else 1
+    cumsum = values.groupby(groups).cumsum()
+    total = cumsum.groupby(groups).shift(shift) if shift else cumsum
+    count = groups.groupby(groups).cumcount() + 1 - shift
+    if window is not None:
+        total = total - cumsum.groupby(groups).shift(window + shift).fillna(0)
+        count = count.clip(upper=window)
+    return total.div(count.replace(0, np.nan), axis=0)
+
+
+def _opponent_conceded(played, rows):
+    """
+    Mean points per appearance conceded by each row's opponent to the row's position, over the
+    gameweeks before the row's. Where the opponent is unknown, or has no history yet, the mean
+    conceded by all opponents is used; NaN before the first gameweek.
+    """
+    appearances = played[played['minutes'] > 0]
+    gameweeks = np.arange(1, int(rows['GW'].max()) + 1)
+    by_gameweek = appearances.groupby(['opponent_team', 'position', 'GW'])['total_points'].agg(['sum', 'count'])
+    sums = by_gameweek['sum'].unstack('GW').reindex(columns=gameweeks).fillna(0)
+    counts = by_gameweek['count'].unstack('GW').reindex(columns=gameweeks).fillna(0)
+
+    def prior_mean(sums, counts):
+        # Cumulative totals up to, but excluding, each gameweek
+        prior_sums = sums.cumsum(axis=1).shift(1, axis=1).to_numpy()
+        prior_counts = counts.cumsum(axis=1).shift(1, axis=1).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(prior_counts > 0, prior_sums / prior_counts, np.nan)
+
+    prior = prior_mean(sums, counts)
+    league = prior_mean(sums.groupby(level='position').sum(), counts.groupby(level='position').sum())
+    positions = sums.index.get_level_values('position').unique().sort_values()
+
+    column = rows['GW'].to_numpy(dtype=int) - 1
+    row = sums.index.get_indexer(pd.MultiIndex.from_arrays([rows['opponent_team'], rows['position']]))
+    position_row = positions.get_indexer(rows['position'])
+    conceded = np.full(len(rows), np.nan)
+    found = position_row >= 0
+    conceded[found] = league[position_row[found], column[found]]
+    found = row >= 0
+    by_opponent = prior[row[found], column[found]]
+    conceded[found] = np.where(np.isnan(by_opponent), conceded[found], by_opponent)
+    return conceded
+
+
+def build_features(played, upcoming=None, window=FORM_WINDOW):
+    """
+    Builds the model features of every played fixture, and of upcoming ones, in one vectorized pass.
+
+    Features only use fixtures before the row's gameweek: form over the last `window` fixtures
+    (points, minutes, starts, xG, xA, bonus), points per fixture so far this season, the
+    opponent's points conceded to the position so far, home / away and position.
+
+    Parameters:
+    - played (pd.DataFrame): Gameweek rows with `element`, `GW`, `position`, `opponent_team`,
+      `was_home`, `total_points` and the form source columns.
+    - upcoming (pd.DataFrame): Optional fixtures to predict, with `element`, `GW`, `position`,
+      `opponent_team` (NaN if unknown) and `was_home` (NaN if unknown).
+    - window (int): Fixtures averaged into the form features.
+
+    Returns:
+    - features (pd.DataFrame): The rows of `played` sorted by player and gameweek, then those
+      of `upcoming`, with the FEATURES columns added.
+    """
+    source = list(FORM_FEATURES.values())
+    order = ['element', 'GW', 'kickoff_time'] if 'kickoff_time' in played else ['element', 'GW']
+    played = played.sort_values(order, kind='stable').reset_index(drop=True)
+    played = played.assign(position=played['position'].astype(str))
+    groups = played['element'].astype(int)
+    values = played[source].astype(float)
+
+    form = _rolling_mean(values, groups, window).set_axis(list(FORM_FEATURES), axis=1)
+    season = _rolling_mean(values['total_points'], groups).rename('season_points')
+    features = pd.concat([played, form, season], axis=1)
+
+    if upcoming is not None and not upcoming.empty:
+        # Upcoming fixtures see the form through each player's last played fixture
+        latest = pd.concat([
+            _rolling_mean(values, groups, window, current=True).set_axis(list(FORM_FEATURES), axis=1),
+            _rolling_mean(values['total_points'], groups, current=True).rename('season_points'),
+        ], axis=1).groupby(groups).last()
+        upcoming = upcoming.reset_index(drop=True)
+        upcoming = upcoming.assign(position=upcoming['position'].astype(str))
+        upcoming = pd.concat([upcoming, latest.reindex(upcoming['element'].astype(int)).reset_index(drop=True)], axis=1)
+        features = pd.concat([features, upcoming], ignore_index=True)
+
+    features['opponent_conceded'] = _opponent_conceded(played, features)
+    features['was_home'] = features['was_home'].astype(float)
+    for position in POSITIONS:
+        features[f'is_{position}'] = (features['position'] == position).astype(float)
+
+    # Players with no history yet have no form; fills only use earlier gameweeks, so the
+    # features of a played gameweek do not change when later ones arrive
+    features[FEATURES] = features[FEATURES].astype(float).fillna(0)
+    return features
+
+
+def _design(features):
+    """Returns the design matrix of a feature table: scaled FEATURES and an intercept column."""
+    scale = np.array([_FEATURE_SCALE.get(feature, 1.0) for feature in FEATURES])
+    return np.column_stack([features[FEATURES].to_numpy(dtype=float) / scale, np.ones(len(features))])
+
+
+class PointsModel(object):
+    """
+    Ridge regression of a player's points in a fixture on the FEATURES of `build_features`.
+
+    The fit is kept as per-gameweek sufficient statistics, X'X and X'y of the gameweek's
+    fixtures, next to a digest of the rows they came from. `update` only recomputes the
+    gameweeks that are new or whose rows changed, and the model through any gameweek is a sum
+    and one small solve, so a new gameweek costs its own rows and backtests come for free.
+    """
+
+    def __init__(self, gameweeks=(), xtx=None, xty=None, digests=(), alpha=RIDGE_ALPHA):
+        size = len(FEATURES) + 1
+        self.gameweeks = np.asarray(gameweeks, dtype=np.int64)
+        self.xtx = xtx if xtx is not None else np.zeros((0, size, size))
+        self.xty = xty if xty is not None else np.zeros((0, size))
+        self.digests = list(digests)
+        self.alpha = alpha
+
+    def update(self, features):
+        """
+        Brings the statistics up to date with the played rows of a feature table.
+
+        Returns:
+        - updated (list of int): Gameweeks whose statistics were (re)computed.
+        """
+        stored = dict(zip(self.gameweeks.tolist(), zip(self.digests, self.xtx, self.xty)))
+        training = features[features['total_points'].notna()]
+        gameweeks, digests, xtx, xty, updated = [], [], [], [], []
+        for gameweek, rows in training.groupby('GW', sort=True):
+            X, y = _design(rows), rows['total_points'].to_numpy(dtype=float)
+            digest = hashlib.sha1(X.tobytes() + y.tobytes()).hexdigest()[:16]
+            if gameweek in stored and stored[gameweek][0] == digest:
+                _, gram, moment = stored[gameweek]
+            else:
+                gram, moment = X.T @ X, X.T @ y
+                updated.append(int(gameweek))
+            gameweeks.append(int(gameweek))
+            digests.append(digest)
+            xtx.append(gram)
+            xty.append(moment)
+
+        size = len(FEATURES) + 1
+        self.gameweeks = np.asarray(gameweeks, dtype=np.int64)
+        self.digests = digests
+        self.xtx = np.array(xtx).reshape(-1, size, size)
+        self.xty = np.array(xty).reshape(-1, size)
+        return updated
+
+    def coefficients(self, through=None):
+        """Returns the coefficients fitted on the gameweeks up to `through` (all if None), or None if there are none."""
+        use = self.gameweeks <= through if through is not None else np.ones(len(self.gameweeks), dtype=bool)
+        if not use.any():
+            return None
+        penalty = self.alpha * np.eye(len(FEATURES) + 1)
+        penalty[-1, -1] = 0  # Leave the intercept unpenalized
+        return np.linalg.solve(self.xtx[use].sum(axis=0) + penalty, self.xty[use].sum(axis=0))
+
+    def predict(self, features, through=None):
+        """Returns the predicted points of every row of a feature table, NaN if there is no model through `through`."""
+        coefficients = self.coefficients(through)
+        if coefficients is None:
+            return np.full(len(features), np.nan)
+        return _design(features) @ coefficients
+
+    def save(self, path):
+        """Writes the statistics to an .npz file, atomically."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, gameweeks=self.gameweeks, xtx=self.xtx, xty=self.xty,
+                     digests=np.array(self.digests, dtype=str), features=np.array(FEATURES))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads statistics written by `save`; returns an empty model if there are none, or they use other features."""
+        try:
+            with np.load(path) as arrays:
+                if arrays['features'].tolist() != FEATURES:
+                    return cls()
+                return cls(arrays['gameweeks'], arrays['xtx'], arrays['xty'], arrays['digests'].tolist())
+        except (OSError, ValueError, KeyError):
+            return cls()
+
+
+def upcoming_fixtures(player_data, fixtures, teams, gameweek):
+    """
+    Lists the fixtures of every player in `gameweek`.
+
+    Parameters:
+    - player_data (pd.DataFrame): Player table with `id`, `position` and `team_name`.
+    - fixtures (pd.DataFrame): Fixture table with `event`, `team_h` and `team_a`; if empty, every
+      player gets one fixture against an unknown opponent.
+    - teams (dict): {team id: team name}.
+    - gameweek (int): Gameweek to list.
+
+    Returns:
+    - upcoming (pd.DataFrame): One row per player and fixture with `element`, `GW`, `position`,
+      `team`, `opponent_team` and `was_home`. Players without a fixture (a blank gameweek) have none.
+    """
+    players = pd.DataFrame({
+        'element': player_data['id'].to_numpy(dtype=int),
+        'position': player_data['position'].astype(str).to_numpy(),
+        'team': player_data['team_name'].astype(str).to_numpy(),
+    })
+    if fixtures.empty:
+        return players.assign(GW=gameweek, opponent_team=np.nan, was_home=np.nan)
+
+    team_ids = {name: team_id for team_id, name in teams.items()}
+    players['team_id'] = players['team'].map(team_ids)
+    fixtures = fixtures[fixtures['event'] == gameweek]
+    sides = pd.concat([
+        pd.DataFrame({'team_id': fixtures['team_h'], 'opponent_team': fixtures['team_a'], 'was_home': True}),
+        pd.DataFrame({'team_id': fixtures['team_a'], 'opponent_team': fixtures['team_h'], 'was_home': False}),
+    ])
+    upcoming = players.merge(sides, on='team_id', how='inner').drop(columns='team_id')
+    return upcoming.assign(GW=gameweek)
+
+
+def predict_points(gameweek_data, player_data, fixtures, teams, model=None, window=FORM_WINDOW):
+    """
+    Trains the points model on a season's gameweeks and predicts every player's next gameweek.
+
+    Each played gameweek is also predicted with the model fitted on the gameweeks before it,
+    so the table holds a backtest next to the forecast.
+
+    Parameters:
+    - gameweek_data (pd.DataFrame): The season's gameweek rows.
+    - player_data (pd.DataFrame): Current player table (`id`, `web_name`, `first_name`,
+      `second_name`, `position`, `team_name`).
+    - fixtures (pd.DataFrame): The season's fixtures (see `upcoming_fixtures`).
+    - teams (dict): {team id: team name}.
+    - model (PointsModel): Model to update, e.g. one loaded from disk; a new one if None.
+    - window (int): Fixtures averaged into the form features.
+
+    Returns:
+    - predictions (pd.DataFrame): One row per player and gameweek in the PREDICTION_COLUMNS
+      schema; `total_points` is NaN for the upcoming gameweek.
+    - model (PointsModel): The updated model.
+    """
+    model = model if model is not None else PointsModel()
+    if gameweek_data.empty:
+        return pd.DataFrame(columns=PREDICTION_COLUMNS), model
+
+    played = gameweek_data[['element', 'name', 'team', 'GW', 'position', 'opponent_team', 'was_home']
+                           + list(dict.fromkeys(FORM_FEATURES.values()))
+                           + (['kickoff_time'] if 'kickoff_time' in gameweek_data else [])]
+    next_gw = int(played['GW'].max()) + 1
+    upcoming = upcoming_fixtures(player_data, fixtures, teams, next_gw)
+    features = build_features(played, upcoming, window)
+    model.update(features)
+
+    # Every gameweek is predicted by the model fitted on the ones before it
+    gameweek = features['GW'].to_numpy()
+    predicted = np.full(len(features), np.nan)
+    for gw in np.unique(gameweek):
+        rows = gameweek == gw
+        predicted[rows] = model.predict(features[rows], through=gw - 1)
+
+    names = player_data.set_index('id')
+    element = features['element'].astype(int)
+    full_names = (names['first_name'] + ' ' + names['second_name']).reindex(element).to_numpy()
+    table = pd.DataFrame({
+        'element': element,
+        'player': features['name'].astype(object).where(features['name'].notna(), full_names),
+        'web_name': names['web_name'].reindex(element).to_numpy(),
+        'gw': gameweek.astype(int),
+        'team': features['team'].astype(str),
+        'opponent_team': features['opponent_team'].map(teams).fillna(''),
+        'position': features['position'].map({p: i + 1 for i, p in enumerate(POSITIONS)}),
+        'total_points': features['total_points'],
+        'pred_points': predicted,
+    })
+    table['web_name'] = table['web_name'].fillna(table['player'])
+
+    # One row per player and gameweek: double gameweeks add up, gameweeks with no model are left out
+    table = table.dropna(subset=['pred_points'])
+    grouped = table.groupby(['element', 'gw'], sort=True)
+    predictions = grouped[['player', 'web_name', 'team', 'opponent_team', 'position']].first()
+    double = table[table.duplicated(['element', 'gw'], keep=False)]
+    if not double.empty:
+        opponents = double.groupby(['element', 'gw'])['opponent_team'].agg(', '.join)
+        predictions.loc[opponents.index, 'opponent_team'] = opponents
+    predictions['total_points'] = grouped['total_points'].sum(min_count=1)
+    predictions['pred_points_rounded'] = grouped['pred_points'].sum().round().astype(int)
+    return predictions.reset_index()[PREDICTION_COLUMNS], model
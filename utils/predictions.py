@@ -0,0 +1,186 @@
+# predictions.py
+
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.constants import SEASON
+from utils.data_loader import load_player_data_from_api, load_gameweek_data_from_github, load_fixtures, team_names
+from utils.normalization import name_keys, team_keys
+from utils.points_model import PointsModel, predict_points, MODEL_DIR
+from utils.registry import register_dataset, get_dataset, refresh_dataset
+
+PREDICTIONS_PATH = "data/predictions/predicted_df.csv"  # Written by the points model
+BUNDLED_PREDICTIONS_PATH = "data/predicted_df.csv"  # Shipped table, read until the model has run once
+
+
+class PredictionIndex(object):
+    """
+    Exact lookup of each player's latest-gameweek prediction.
+
+    Predictions are keyed by player key, the FPL `id` each prediction row was resolved to once by
+    `PlayerIdentity`, so a lookup is a hash probe instead of a scan of the table. Players without
+    a resolved row fall back to (normalized name, normalized team), where the name is either the
+    player's `web_name` or full name. Lookups that find no prediction score 0 and are counted in
+    `misses` / `missed_keys`.
+    """
+
+    def __init__(self, pred_df: pd.DataFrame, player_keys=None):
+        self.table = pred_df.assign(
+            name_key=name_keys(pred_df['web_name']),
+            full_name_key=name_keys(pred_df['player']),
+            team_key=team_keys(pred_df['team']),
+            player_key=np.asarray(player_keys, dtype=np.int64) if player_keys is not None else -1,
+        )
+        keyed = self.table[self.table['player_key'] != -1]
+        self._by_key = keyed.sort_values('gw').groupby('player_key')['pred_points_rounded'].last()
+
+        latest = self.table.sort_values('gw').groupby(['name_key', 'team_key']).tail(1)
+        by_web_name = latest.set_index(['name_key', 'team_key'])['pred_points_rounded']
+        by_full_name = latest.set_index(['full_name_key', 'team_key'])['pred_points_rounded']
+        by_full_name.index.names = by_web_name.index.names
+
+        self._latest = pd.concat([by_web_name, by_full_name])
+        self._latest = self._latest[~self._latest.index.duplicated(keep='first')]
+        self.misses = 0
+        self.missed_keys = Counter()
+
+    def keys(self, names, teams):
+        """Returns the name index keys for Series of player names and team names."""
+        return pd.MultiIndex.from_arrays([name_keys(names), team_keys(teams)],
+                                         names=['name_key', 'team_key'])
+
+    def predict(self, names, teams, player_keys=None):
+        """
+        Looks up the latest predicted points for many players in one vectorized call.
+
+        Parameters:
+        - names (pd.Series): Player `web_name`s or full names.
+        - teams (pd.Series): Player team names.
+        - player_keys (array-like): Player ids, looked up first; names are the fallback.
+
+        Returns:
+        - points (np.ndarray): Predicted points per player, 0 where no prediction exists.
+        """
+        names, teams = pd.Series(names, dtype=object), pd.Series(teams, dtype=object)
+        points = np.full(len(names), np.nan)
+        if player_keys is not None:
+            points = self._by_key.reindex(np.asarray(player_keys, dtype=np.int64)).to_numpy(dtype=float, copy=True)
+        missing = np.isnan(points)
+        if missing.any():
+            keys = self.keys(names, teams)
+            points[missing] = self._latest.reindex(keys[missing]).to_numpy(dtype=float)
+            missing = np.isnan(points)
+        if missing.any():
+            # FPL web names such as 'M.Salah' appear without the initial in the prediction table
+            surnames = self.keys(names.str.split('.').str[-1], teams)
+            points[missing] = self._latest.reindex(surnames[missing]).to_numpy(dtype=float)
+            missing = np.isnan(points)
+        if missing.any():
+            self.misses += int(missing.sum())
+            self.missed_keys.update(keys[missing])
+        return np.where(missing, 0, points).astype(int)
+
+    def predict_team(self, team):
+        """Returns the predicted points of every player in a team (list of dict)."""
+        return self.predict([player['web_name'] for player in team], [player['team_name'] for player in team],
+                            [player['id'] for player in team])
+
+    def predict_players(self, player_data):
+        """Returns predicted points for every row of `player_data`, aligned to its index."""
+        points = self.predict(player_data['web_name'], player_data['team_name'], player_data['id'])
+        return pd.Series(points, index=player_data.index)
+
+
+def update_predictions(year: str, path: str = PREDICTIONS_PATH, model_dir: str = MODEL_DIR):
+    """
+    Retrains the points model on a season's gameweeks and writes every player's predictions to `path`.
+
+    The model's statistics are kept in `model_dir` per season, so only gameweeks that are new
+    since the last run are added to the fit.
+
+    Parameters:
+    - year (str): Season, e.g. '2024-25'; its player ids must be those of the live player table.
+    - path (str): CSV file written with the predictions.
+    - model_dir (str): Directory of the saved model statistics.
+
+    Returns:
+    - predictions (pd.DataFrame): The table written, empty (and nothing written) without gameweek data.
+    """
+    players = load_player_data_from_api()
+    gameweeks = load_gameweek_data_from_github(year)
+    if players.empty or gameweeks.empty:
+        return pd.DataFrame()
+
+    # Keep the rows whose `element` is the same player in the live table (it is not across seasons)
+    same_player = name_keys(gameweeks['name']).to_numpy() == \
+        name_keys(players.set_index('id')['full_name'].reindex(gameweeks['element'].astype(int))).to_numpy()
+    model_path = os.path.join(model_dir, f"{year}.npz")
+    predictions, model = predict_points(gameweeks[same_player], players, load_fixtures(), team_names(),
+                                        PointsModel.load(model_path))
+    if predictions.empty:
+        return predictions
+
+    model.save(model_path)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    predictions.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return predictions
+
+
+def refresh_predictions(year: str = SEASON, path: str = PREDICTIONS_PATH, model_dir: str = MODEL_DIR):
+    """
+    Runs `update_predictions` once a gameweek the model has not been trained on has landed in the
+    season's gameweek data (or nothing has been written yet), then rebuilds the predictions dataset.
+
+    Returns:
+    - updated (bool): Whether a new table was written.
+    """
+    gameweeks = load_gameweek_data_from_github(year)
+    if gameweeks.empty:
+        return False
+    trained = PointsModel.load(os.path.join(model_dir, f"{year}.npz")).gameweeks
+    if os.path.exists(path) and int(gameweeks['GW'].max()) in trained:
+        return False
+    if update_predictions(year, path, model_dir).empty:
+        return False
+    refresh_dataset('predictions', path)
+    return True
+
+
+@register_dataset('predictions')
+def _load_predictions(path: str):
+    """
+    Loads the table of predicted points per player and gameweek.
+
+    The default table is the last one written by `update_predictions`, which the refresh
+    scheduler runs when a new gameweek lands (see `refresh_predictions`); until the model has
+    run once the bundled table is read.
+    """
+    if path == PREDICTIONS_PATH and not os.path.exists(path):
+        path = BUNDLED_PREDICTIONS_PATH
+    return pd.read_csv(path)
+
+
+@st.cache_resource(max_entries=2)
+def _prediction_index(path, version):
+    if path != PREDICTIONS_PATH:
+        return PredictionIndex(get_dataset('predictions', path).data)
+    from utils.identity import load_player_identity  # The identity index is built on this module's dataset
+    identity = load_player_identity(SEASON)
+    return PredictionIndex(identity.prediction_table, identity.prediction_keys)
+
+
+def load_prediction_index(path: str = PREDICTIONS_PATH):
+    """
+    Returns the prediction index of the shared predictions dataset, built once per dataset version.
+
+    The default table is keyed by the player ids the season's `PlayerIdentity` resolved its rows
+    to; other tables are looked up by name only.
+    """
+    if path != PREDICTIONS_PATH:
+        return _prediction_index(path, get_dataset('predictions', path).version)
+    from utils.identity import load_player_identity
+    return _prediction_index(path, load_player_identity(SEASON).version)
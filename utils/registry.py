@@ -0,0 +1,201 @@
+# registry.py
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from utils.schema import frame_memory_mb
+from utils.snapshot_store import SNAPSHOT_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+DATASET_CACHE_SIZE = 8  # Loaded datasets kept per process, e.g. players, predictions and a few seasons
+
+_LOADERS = {}
+_DATASETS = OrderedDict()  # (name, args) -> Dataset, least recently used first
+_LOCK = threading.Lock()
+_KEY_LOCKS = {}  # (name, args) -> lock held while the dataset is being built
+_REFRESHING = set()  # (name, args) of the background refreshes running
+
+
+class Dataset(object):
+    """
+    A loaded dataset, shared by every session of the process.
+
+    `data` is the same object for every caller, so it must be treated as read-only: derive new
+    frames from it (`assign`, `copy`, filtering) instead of changing it in place. `version` is a
+    fingerprint of the contents, and changes only when the data does. `memory_mb` is measured
+    once when the dataset is built, since the data never changes afterwards.
+    """
+
+    def __init__(self, name, data, version, loaded_at, memory_mb=None):
+        self.name = name
+        self.data = data
+        self.version = version
+        self.loaded_at = loaded_at
+        self.memory_mb = memory_mb
+
+    def __repr__(self):
+        return f"Dataset({self.name!r}, version={self.version!r})"
+
+
+def fingerprint(df: pd.DataFrame):
+    """Returns a short hash of a DataFrame's columns and contents."""
+    digest = hashlib.sha1(",".join(map(str, df.columns)).encode())
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def register_dataset(name):
+    """Registers the decorated function as the loader of dataset `name`; it is called with the arguments of `get_dataset`."""
+    def register(loader):
+        _LOADERS[name] = loader
+        return loader
+    return register
+
+
+def _key_lock(key):
+    with _LOCK:
+        return _KEY_LOCKS.setdefault(key, threading.Lock())
+
+
+def _current(key):
+    with _LOCK:
+        dataset = _DATASETS.get(key)
+        if dataset is not None:
+            _DATASETS.move_to_end(key)
+        return dataset
+
+
+def _swap(key, dataset):
+    """Makes `dataset` the one served under `key`; callers holding the old one keep it intact."""
+    with _LOCK:
+        _DATASETS[key] = dataset
+        _DATASETS.move_to_end(key)
+        while len(_DATASETS) > DATASET_CACHE_SIZE:
+            _DATASETS.popitem(last=False)
+
+
+def _build(name, args):
+    data = _LOADERS[name](*args)
+    memory_mb = frame_memory_mb(data) if isinstance(data, pd.DataFrame) else None
+    return Dataset(name, data, fingerprint(data), time.time(), memory_mb)
+
+
+def _valid(new, old):
+    """A rebuilt dataset replaces the current one only if it has rows and keeps all of its columns."""
+    if old is None or not isinstance(new.data, pd.DataFrame):
+        return True
+    return not new.data.empty and set(old.data.columns) <= set(new.data.columns)
+
+
+def get_dataset(name: str, *args, max_age: float = SNAPSHOT_MAX_AGE):
+    """
+    Returns a registered dataset, loading it at most once per process.
+
+    Only the first call for a dataset waits for it to load. Later calls return the current
+    dataset at once; if it is older than `max_age` seconds it is rebuilt in the background and
+    swapped in when ready (see `refresh_dataset`).
+
+    Parameters:
+    - name (str): Registered dataset name, e.g. 'players'.
+    - *args: Passed to the dataset's loader, e.g. the season of 'gameweeks'.
+    - max_age (float): Seconds after which a background refresh is started.
+
+    Returns:
+    - dataset (Dataset): The shared dataset and its version.
+
+    Raises:
+    - KeyError: If no loader is registered under `name`.
+    """
+    key = (name, args)
+    dataset = _current(key)
+    if dataset is None:
+        with _key_lock(key):
+            # Another session may have loaded it while this one waited
+            dataset = _current(key)
+            if dataset is None:
+                dataset = _build(name, args)
+                _swap(key, dataset)
+    elif time.time() - dataset.loaded_at > max_age:
+        refresh_in_background(name, *args)
+    return dataset
+
+
+def refresh_dataset(name: str, *args):
+    """
+    Rebuilds a dataset and swaps it in if it is valid: it must have rows and keep every column of
+    the current version. Sessions keep reading the current version while the new one is built.
+
+    Returns:
+    - dataset (Dataset): The dataset served from now on, the old one if the rebuild was rejected.
+    """
+    key = (name, args)
+    with _key_lock(key):
+        old = _current(key)
+        new = _build(name, args)
+        if not _valid(new, old):
+            logger.warning("Keeping %r, the rebuilt dataset is empty or lost columns", old)
+            return old
+        if old is not None and new.version == old.version:
+            # Unchanged: keep the same object, so caches keyed on it stay warm, but restart its age
+            old.loaded_at = new.loaded_at
+            return old
+        _swap(key, new)
+        return new
+
+
+def refresh_in_background(name: str, *args):
+    """Starts `refresh_dataset` on a daemon thread unless a refresh of the dataset is already running."""
+    key = (name, args)
+    with _LOCK:
+        if key in _REFRESHING:
+            return
+        _REFRESHING.add(key)
+
+    def run():
+        try:
+            refresh_dataset(name, *args)
+        except Exception as e:  # Keep serving the current version whatever the loader raised
+            logger.exception("Refreshing dataset %r failed: %s", name, e)
+        finally:
+            with _LOCK:
+                _REFRESHING.discard(key)
+
+    threading.Thread(target=run, name=f"{name}-dataset-refresh", daemon=True).start()
+
+
+def loaded_keys():
+    """Returns the (name, args) of the datasets held, in the order their loaders were registered."""
+    order = {name: i for i, name in enumerate(_LOADERS)}
+    with _LOCK:
+        keys = list(_DATASETS)
+    return sorted(keys, key=lambda key: order.get(key[0], len(order)))
+
+
+def loaded_datasets():
+    """
+    Summarizes the datasets currently held by the registry, from what was measured at build time.
+
+    Returns:
+    - report (pd.DataFrame): One row per dataset with its arguments, version, rows, memory in MB
+      and age in seconds.
+    """
+    now = time.time()
+    rows = []
+    with _LOCK:
+        held = list(_DATASETS.items())
+    for (name, args), dataset in held:
+        rows.append({
+            'dataset': name,
+            'args': ', '.join(map(str, args)),
+            'version': dataset.version,
+            'rows': len(dataset.data),
+            'memory_mb': dataset.memory_mb,
+            'age_s': round(now - dataset.loaded_at),
+        })
+    return pd.DataFrame(rows, columns=['dataset', 'args', 'version', 'rows', 'memory_mb', 'age_s'])
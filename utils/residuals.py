@@ -0,0 +1,78 @@
+# residuals.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.identity import load_player_identity
+
+# Two-sided control limits drawn on the funnel plot
+FUNNEL_LIMITS = {'95%': 1.96, '99.8%': 3.09}
+STATS_COLUMNS = ['n', 'mean_residual', 'std_residual', 'se_residual']
+
+
+def residual_stats(gameweek_data, player_keys, total_points_column='total_points', xp_column='xP'):
+    """
+    Summarizes every player's points above expectation (actual - expected points) in one pass.
+
+    Parameters:
+    - gameweek_data (pd.DataFrame): One row per player and gameweek.
+    - player_keys (np.ndarray): Player key of each row of `gameweek_data`; -1 for rows to leave out.
+    - total_points_column (str): Actual points column.
+    - xp_column (str): Expected points column.
+
+    Returns:
+    - stats (pd.DataFrame): Indexed by player key, with the number of gameweeks `n`, the
+      `mean_residual`, `std_residual` and standard error `se_residual` of each player; empty
+      if there are no gameweeks yet.
+    """
+    if gameweek_data.empty or not {total_points_column, xp_column} <= set(gameweek_data.columns):
+        return pd.DataFrame(columns=STATS_COLUMNS, dtype=float).rename_axis('player_key')
+    residuals = (
+        pd.to_numeric(gameweek_data[total_points_column], errors='coerce').to_numpy(dtype=float)
+        - pd.to_numeric(gameweek_data[xp_column], errors='coerce').to_numpy(dtype=float)
+    )
+    keep = (np.asarray(player_keys) != -1) & ~np.isnan(residuals)
+    grouped = pd.Series(residuals[keep]).groupby(np.asarray(player_keys)[keep])
+    stats = grouped.agg(['count', 'mean', 'std']).rename(
+        columns={'count': 'n', 'mean': 'mean_residual', 'std': 'std_residual'}
+    )
+    stats['se_residual'] = stats['std_residual'] / np.sqrt(stats['n'])
+    return stats.rename_axis('player_key')
+
+
+def funnel_limits(stats, limits=FUNNEL_LIMITS):
+    """
+    Computes funnel control limits: the pooled mean residual +/- z * sigma / sqrt(n), for each n.
+
+    sigma is the pooled standard deviation of a single gameweek's residual, so a player whose
+    mean falls outside the limits for their `n` over- or under-performs beyond chance.
+
+    Returns:
+    - limits (pd.DataFrame): Indexed by n, with the pooled `mean` and a lower / upper column per limit.
+    """
+    n = stats['n'].to_numpy(dtype=float)
+    total = n.sum()
+    mean = (stats['mean_residual'] * n).sum() / total
+    # Pooled variance around the overall mean: within-player plus between-player parts
+    within = (stats['std_residual'].fillna(0) ** 2 * (n - 1)).sum()
+    between = (n * (stats['mean_residual'] - mean) ** 2).sum()
+    sigma = np.sqrt((within + between) / max(total - 1, 1))
+
+    ns = np.arange(1, int(stats['n'].max()) + 1 if len(stats) else 2)
+    table = pd.DataFrame({'mean': mean}, index=pd.Index(ns, name='n'))
+    for label, z in limits.items():
+        table[f'lower {label}'] = mean - z * sigma / np.sqrt(ns)
+        table[f'upper {label}'] = mean + z * sigma / np.sqrt(ns)
+    return table
+
+
+@st.cache_resource(max_entries=2)
+def _residual_stats(year, version):
+    identity = load_player_identity(year)
+    stats = residual_stats(identity.gameweek_data, identity.gameweek_keys)
+    return stats.join(identity.players[['full_name', 'position']], how='left')
+
+
+def load_residual_stats(year: str):
+    """Returns the residual statistics of every player of a season, computed once per data version."""
+    return _residual_stats(year, load_player_identity(year).version)
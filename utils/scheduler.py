@@ -0,0 +1,142 @@
+# scheduler.py
+
+import logging
+import threading
+import time
+
+import streamlit as st
+from utils.constants import SEASON
+from utils.data_loader import get_bootstrap_store, get_fixtures_store, gameweek_deadlines, sync_element_summaries
+from utils.identity import load_player_identity
+from utils.predictions import load_prediction_index, refresh_predictions
+from utils.registry import loaded_keys, refresh_dataset
+from utils.residuals import load_residual_stats
+from utils.similarity import load_similarity_table
+from utils.simulation import load_points_simulator
+
+logger = logging.getLogger(__name__)
+
+# Refreshes relative to each gameweek deadline, in seconds: before it for late price and injury
+# news, after it for ownership and transfers, and three days on for the gameweek's results
+REFRESH_OFFSETS = (-60 * 60, 60 * 60, 3 * 24 * 60 * 60)
+REFRESH_INTERVAL = 6 * 60 * 60  # Longest gap between two refreshes, deadline or not
+MAX_SLEEP = 15 * 60  # The timetable is re-read at least this often, as deadlines can move
+
+
+class RefreshScheduler(object):
+    """
+    Refreshes the shared data on a background thread, on a timetable built from the FPL deadlines.
+
+    A refresh runs `jobs` in order (revalidating the snapshots, rebuilding every dataset held by
+    the registry, retraining the points model on a new gameweek, then downloading the changed
+    per-player summaries) and then `warm`, which rebuilds the caches derived from the new
+    versions. Each dataset is swapped in only once it is fully built and valid, so sessions keep
+    reading the previous version meanwhile and never wait on the network or on parsing. A
+    failed job is logged and leaves the data it would have replaced in place.
+    """
+
+    def __init__(self, jobs, deadlines, warm=(), offsets=REFRESH_OFFSETS, interval=REFRESH_INTERVAL):
+        self.jobs = jobs
+        self.deadlines = deadlines
+        self.warm = warm
+        self.offsets = offsets
+        self.interval = interval
+        self.last_run = time.time()
+        self.last_errors = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def timetable(self):
+        """Returns the planned refresh times (Unix times), from the deadlines and offsets."""
+        try:
+            deadlines = self.deadlines()
+        except Exception as e:  # No deadlines to plan from; the interval still applies
+            logger.warning("Reading the gameweek deadlines failed: %s", e)
+            deadlines = []
+        return sorted(deadline + offset for deadline in deadlines for offset in self.offsets)
+
+    def next_refresh(self):
+        """Returns the Unix time of the next refresh: the first planned time since the last run, or the interval."""
+        planned = [when for when in self.timetable() if when > self.last_run]
+        return min(planned[:1] + [self.last_run + self.interval])
+
+    def refresh(self):
+        """
+        Runs every job then every warm-up now, unless a refresh is already running.
+
+        Returns:
+        - errors (dict): {job name: error message} of the jobs that failed.
+        """
+        if not self._lock.acquire(blocking=False):
+            return {}
+        try:
+            errors = {}
+            for job in list(self.jobs) + list(self.warm):
+                name = getattr(job, '__name__', repr(job))
+                try:
+                    job()
+                except Exception as e:  # One failing source must not stop the others
+                    errors[name] = str(e)
+                    logger.exception("Refresh job %s failed: %s", name, e)
+            self.last_run = time.time()
+            self.last_errors = errors
+            return errors
+        finally:
+            self._lock.release()
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self.next_refresh() - time.time()
+            if delay > 0:
+                self._stop.wait(min(delay, MAX_SLEEP))
+                continue
+            self.refresh()
+
+    def start(self):
+        """Starts the scheduler thread, once."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def refresh_bootstrap():
+    """Revalidates the bootstrap-static snapshot against the FPL API."""
+    get_bootstrap_store().refresh()
+
+
+def refresh_fixtures():
+    """Revalidates the fixtures snapshot against the FPL API."""
+    get_fixtures_store().refresh()
+
+
+def refresh_datasets():
+    """Rebuilds every dataset held by the registry, in the order their loaders were registered."""
+    failed = []
+    for name, args in loaded_keys():
+        try:
+            refresh_dataset(name, *args)
+        except Exception as e:  # Later datasets are still rebuilt
+            failed.append(f"{name}{args}: {e}")
+    if failed:
+        raise RuntimeError("; ".join(failed))
+
+
+def warm_caches():
+    """Builds the caches derived from the current datasets, so no session waits to build them."""
+    load_prediction_index()
+    load_player_identity(SEASON)
+    load_residual_stats(SEASON)
+    load_points_simulator(SEASON)
+    load_similarity_table(wait=True)  # Built here rather than on the first session that opens the page
+
+
+@st.cache_resource
+def get_refresh_scheduler():
+    """Returns the refresh scheduler of the process, started on first use."""
+    jobs = [refresh_bootstrap, refresh_fixtures, refresh_datasets, refresh_predictions, sync_element_summaries]
+    return RefreshScheduler(jobs, gameweek_deadlines, warm=[warm_caches]).start()
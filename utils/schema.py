@@ -0,0 +1,117 @@
+# schema.py
+
+import numpy as np
+import pandas as pd
+
+# Declared dtypes applied at ingestion. Repeated strings become categoricals, counts are
+# downcast to the smallest integer that holds a season's values, and FPL's decimal-as-string
+# fields become floats.
+GAMEWEEK_SCHEMA = {
+    'name': 'category',
+    'name_cleaned': 'category',
+    'position': 'category',
+    'team': 'category',
+    'kickoff_time': 'datetime64[ns, UTC]',
+    'was_home': 'bool',
+    'xP': 'float32',
+    'creativity': 'float32',
+    'influence': 'float32',
+    'threat': 'float32',
+    'ict_index': 'float32',
+    'expected_assists': 'float32',
+    'expected_goal_involvements': 'float32',
+    'expected_goals': 'float32',
+    'expected_goals_conceded': 'float32',
+    'assists': 'int8',
+    'bonus': 'int8',
+    'clean_sheets': 'int8',
+    'goals_conceded': 'int8',
+    'goals_scored': 'int8',
+    'own_goals': 'int8',
+    'penalties_missed': 'int8',
+    'penalties_saved': 'int8',
+    'red_cards': 'int8',
+    'yellow_cards': 'int8',
+    'saves': 'int8',
+    'starts': 'int8',
+    'team_a_score': 'int8',
+    'team_h_score': 'int8',
+    'total_points': 'int8',
+    'round': 'int8',
+    'GW': 'int8',
+    'opponent_team': 'int8',
+    'bps': 'int16',
+    'minutes': 'int16',
+    'element': 'int32',
+    'fixture': 'int16',
+    'value': 'int16',
+    'selected': 'int32',
+    'transfers_balance': 'int32',
+    'transfers_in': 'int32',
+    'transfers_out': 'int32',
+}
+
+PLAYER_SCHEMA = {
+    'position': 'category',
+    'plural_name': 'category',
+    'team_name': 'category',
+    'in_dreamteam': 'bool',
+    'influence': 'float32',
+    'creativity': 'float32',
+    'threat': 'float32',
+    'ict_index': 'float32',
+    'selected_by_percent': 'float32',
+    'form': 'float32',
+    'points_per_game': 'float32',
+    'dreamteam_count': 'int8',
+    'yellow_cards': 'int8',
+    'red_cards': 'int8',
+    'id': 'int32',
+    'now_cost': 'int16',
+    'total_points': 'int16',
+    'player_value_score': 'int16',
+    'minutes': 'int16',
+    'goals_scored': 'int16',
+    'assists': 'int16',
+    'clean_sheets': 'int16',
+    'goals_conceded': 'int16',
+    'saves': 'int16',
+    'bonus': 'int16',
+    'bps': 'int16',
+}
+
+
+def apply_schema(df: pd.DataFrame, schema: dict):
+    """
+    Casts the columns of `df` that appear in `schema` to their declared dtype.
+
+    Numeric text is parsed, and integer columns holding missing values (e.g. scores of fixtures
+    not yet played) fall back to float32 instead of failing.
+
+    Parameters:
+    - df (pd.DataFrame): Frame to cast.
+    - schema (dict): Column name to dtype.
+
+    Returns:
+    - df (pd.DataFrame): A new frame with the declared dtypes.
+    """
+    columns = {}
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if dtype.startswith('datetime'):
+            columns[column] = pd.to_datetime(values, utc=True, errors='coerce')
+        elif dtype == 'category' or dtype == 'bool':
+            columns[column] = values.astype(dtype)
+        else:
+            values = pd.to_numeric(values, errors='coerce')
+            if np.issubdtype(np.dtype(dtype), np.integer) and values.isna().any():
+                dtype = 'float32'
+            columns[column] = values.astype(dtype)
+    return df.assign(**columns)
+
+
+def frame_memory_mb(df: pd.DataFrame):
+    """Returns the in-memory size of a DataFrame in MB, counting the contents of string columns."""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
@@ -0,0 +1,334 @@
+# similarity.py
+
+import glob
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils import data_loader  # Registers the 'players' dataset
+from utils.registry import get_dataset
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_DIR = "data/similarity"
+SIMILARITY_TOP_K = 10  # Neighbours stored per player in the precomputed table
+
+# Features compared for each position
+SIMILARITY_FEATURES = {
+    'GKP': ["now_cost_m", "total_points", "minutes", "goals_conceded", "clean_sheets", "ict_index"],
+    'DEF': ["now_cost_m", "total_points", "minutes", "goals_conceded", "clean_sheets", "assists", "creativity", "goals_scored", "ict_index"],
+    'MID': ["now_cost_m", "total_points", "minutes", "goals_scored", "assists", "creativity", "influence", "threat", "goals_conceded", "clean_sheets", "ict_index"],
+    'FWD': ["now_cost_m", "total_points", "minutes", "goals_scored", "assists", "creativity", "influence", "threat", "ict_index"],
+}
+
+
+def _position_features(player_data, position):
+    """Returns the ids and feature matrix of the players of one position, dropping incomplete rows."""
+    players = player_data[player_data['position'] == position]
+    players = players[['id'] + SIMILARITY_FEATURES[position]].dropna()
+    return players['id'].to_numpy(dtype=np.int64), players[SIMILARITY_FEATURES[position]].to_numpy(dtype=float)
+
+
+def fingerprint(player_data):
+    """Returns a short hash of the columns the similarity model is fitted on, identifying a data snapshot."""
+    columns = sorted({'id', 'position'} | {f for features in SIMILARITY_FEATURES.values() for f in features})
+    hashed = pd.util.hash_pandas_object(player_data[columns].astype({'position': str}), index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()[:16]
+
+
+def _scores(distances, farthest):
+    """Turns distances into 1 / (1 + distance), min-max scaled so that distance 0 scores 1 and `farthest` scores 0."""
+    farthest = np.broadcast_to(farthest, distances.shape)
+    min_score = 1 / (1 + farthest)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (1 / (1 + distances) - min_score) / (1 - min_score)
+    return np.where(farthest > 0, scores, 1.0)
+
+
+def _farthest(embedding, points, block=1024):
+    """Distance from each of `points` to the farthest row of `embedding`, computed in blocks to bound memory."""
+    return np.concatenate([
+        np.sqrt(((points[start:start + block, None, :] - embedding[None, :, :]) ** 2).sum(axis=2)).max(axis=1)
+        for start in range(0, len(points), block)
+    ] + [np.empty(0)])
+
+
+class SimilarityModel(object):
+    """
+    Per-position 2-D UMAP embeddings of the players, queried through a KD-tree.
+
+    Each position is scaled and embedded once per data snapshot; the embeddings are small
+    (two floats per player) and persisted, so a query is a nearest-neighbour lookup in the
+    player's position instead of a UMAP fit and an all-pairs distance matrix.
+    """
+
+    def __init__(self, embeddings: dict):
+        from sklearn.neighbors import KDTree
+
+        self.embeddings = embeddings
+        self._trees = {position: KDTree(embedding) for position, (ids, embedding) in embeddings.items()}
+        self._rows = {
+            player_id: (position, row)
+            for position, (ids, embedding) in embeddings.items()
+            for row, player_id in enumerate(ids.tolist())
+        }
+
+    @classmethod
+    def fit(cls, player_data, random_state=1337):
+        """Fits one embedding per position on the given player data."""
+        # umap JIT-compiles with numba on import, so it is only loaded when a model is fitted
+        import umap
+        from sklearn.preprocessing import StandardScaler
+
+        embeddings = {}
+        for position in SIMILARITY_FEATURES:
+            ids, features = _position_features(player_data, position)
+            if len(ids) < 2:
+                continue
+            normalized_features = StandardScaler().fit_transform(features)
+            reducer = umap.UMAP(n_neighbors=min(5, len(ids) - 1), min_dist=0.1, n_components=2, random_state=random_state)
+            embeddings[position] = (ids, reducer.fit_transform(normalized_features).astype(np.float32))
+        return cls(embeddings)
+
+    def save(self, path):
+        """Writes the embeddings to an .npz file, atomically."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {}
+        for position, (ids, embedding) in self.embeddings.items():
+            arrays[f"{position}_ids"] = ids
+            arrays[f"{position}_embedding"] = embedding
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads embeddings written by `save`."""
+        with np.load(path) as arrays:
+            embeddings = {
+                position: (arrays[f"{position}_ids"], arrays[f"{position}_embedding"])
+                for position in SIMILARITY_FEATURES
+                if f"{position}_ids" in arrays
+            }
+        return cls(embeddings)
+
+    def __contains__(self, player_id):
+        return player_id in self._rows
+
+    def similar(self, player_id, top_n: int = 5):
+        """
+        Returns the players of the same position closest to `player_id` in the embedding.
+
+        Scores are 1 / (1 + distance), min-max scaled over the position so that the player
+        itself scores 1 and the most distant player scores 0.
+
+        Parameters:
+        - player_id (int): FPL `id` of the player.
+        - top_n (int): Number of similar players to return.
+
+        Returns:
+        - similar_players (pd.Series): Similarity scores indexed by player id, most similar first.
+
+        Raises:
+        - KeyError: If the player is not in the model.
+        """
+        position, row = self._rows[player_id]
+        ids, embedding = self.embeddings[position]
+        point = embedding[row:row + 1]
+        k = min(top_n + 1, len(ids))
+        distances, rows = self._trees[position].query(point, k=k)
+        distances, rows = distances[0], rows[0]
+
+        # Drop the player itself, wherever ties with identical players put it
+        keep = ids[rows] != player_id
+        distances, rows = distances[keep][:top_n], rows[keep][:top_n]
+
+        scores = _scores(distances, _farthest(embedding, point)[0])
+        return pd.Series(scores, index=pd.Index(ids[rows], name='id'), name='Similarity Score')
+
+    def neighbour_table(self, top_k: int = SIMILARITY_TOP_K):
+        """
+        Returns the `top_k` most similar players of every player, in one vectorized pass per position.
+
+        Returns:
+        - table (pd.DataFrame): One row per (player_key, neighbour_key) with `rank` (1 = most
+          similar) and `score` as in `similar`, sorted by player and rank.
+        """
+        tables = []
+        for position, (ids, embedding) in self.embeddings.items():
+            k = min(top_k + 1, len(ids))
+            distances, rows = self._trees[position].query(embedding, k=k)
+            neighbour_ids = ids[rows]
+
+            # Drop each player from its own list and keep the first top_k of the rest
+            keep = neighbour_ids != ids[:, None]
+            keep &= np.cumsum(keep, axis=1) <= top_k
+            scores = _scores(distances, _farthest(embedding, embedding)[:, None])
+            ranks = np.cumsum(keep, axis=1)
+            tables.append(pd.DataFrame({
+                'player_key': np.broadcast_to(ids[:, None], keep.shape)[keep],
+                'neighbour_key': neighbour_ids[keep],
+                'rank': ranks[keep],
+                'score': scores[keep],
+            }))
+        table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=['player_key', 'neighbour_key', 'rank', 'score'])
+        table = table.astype({'player_key': 'int32', 'neighbour_key': 'int32', 'rank': 'int8', 'score': 'float32'})
+        return table.sort_values(['player_key', 'rank'], ignore_index=True)
+
+
+class SimilarityTable(object):
+    """The precomputed neighbour table, with each player's rows found by key instead of a scan."""
+
+    def __init__(self, table: pd.DataFrame, fingerprint: str):
+        self.table = table
+        self.fingerprint = fingerprint
+        self._rows = table.groupby('player_key').indices
+
+    def __contains__(self, player_key):
+        return player_key in self._rows
+
+    def similar(self, player_key, top_n: int = 5):
+        """Returns the scores of the `top_n` players most similar to `player_key`, indexed by player id."""
+        rows = self.table.iloc[self._rows.get(player_key, np.array([], dtype=np.int64))[:top_n]]
+        return pd.Series(rows['score'].to_numpy(), index=pd.Index(rows['neighbour_key'], name='id'), name='Similarity Score')
+
+
+def _remove_stale(root, keep, suffix):
+    for stale in glob.glob(os.path.join(root, f"*.{suffix}")):
+        if stale != keep:
+            os.remove(stale)
+
+
+def similarity_model(player_data, root: str = SIMILARITY_DIR, remove_stale: bool = True):
+    """
+    Returns the similarity model of a player snapshot, fitting and persisting it on first use.
+
+    Models of older snapshots are removed when a new one is written, unless `remove_stale` is False.
+    """
+    path = os.path.join(root, f"{fingerprint(player_data)}.npz")
+    if os.path.exists(path):
+        try:
+            return SimilarityModel.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Refitting the similarity model, could not read %s: %s", path, e)
+
+    model = SimilarityModel.fit(player_data)
+    model.save(path)
+    if remove_stale:
+        _remove_stale(root, path, "npz")
+    return model
+
+
+class SimilarityTableBuilder(object):
+    """
+    Keeps the neighbour table of the latest player snapshot, building new ones on a worker thread.
+
+    `get` never blocks on a fit: it returns the table of the current snapshot if one is on disk,
+    otherwise starts a build and returns the previous table (or None on a cold start) until the
+    new one is swapped in.
+
+    Builds of successive snapshots can overlap; only the build of the newest snapshot requested
+    writes its table, becomes current and removes the files of older snapshots, so a slow build of
+    an older snapshot finishing last cannot replace or delete the newer table.
+    """
+
+    def __init__(self, root=SIMILARITY_DIR, top_k=SIMILARITY_TOP_K):
+        self.root = root
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._building = None
+        self._latest = None
+        self._current = None
+
+    def _path(self, fingerprint):
+        return os.path.join(self.root, f"{fingerprint}.parquet")
+
+    def build(self, player_data, snapshot=None):
+        """Fits (or loads) the model of a snapshot, writes its neighbour table and makes it current."""
+        snapshot = snapshot or fingerprint(player_data)
+        with self._lock:
+            self._latest = snapshot
+        return self._build(player_data, snapshot)
+
+    def _build(self, player_data, snapshot):
+        """Builds the table of `snapshot`, keeping it on disk and current only if no newer snapshot was requested meanwhile."""
+        model = similarity_model(player_data, self.root, remove_stale=False)
+        table = SimilarityTable(model.neighbour_table(self.top_k), snapshot)
+        with self._lock:
+            if snapshot != self._latest:
+                logger.info("Discarding the similarity table of %s, a newer snapshot was requested", snapshot)
+                return table
+            os.makedirs(self.root, exist_ok=True)
+            tmp = self._path(snapshot) + ".tmp"
+            table.table.to_parquet(tmp, index=False)
+            os.replace(tmp, self._path(snapshot))
+            _remove_stale(self.root, self._path(snapshot), "parquet")
+            _remove_stale(self.root, os.path.join(self.root, f"{fingerprint(player_data)}.npz"), "npz")
+            self._current = table
+        return table
+
+    def get(self, player_data, snapshot=None, wait=False):
+        """
+        Returns the best available table for `player_data`, starting a build of it if none exists.
+
+        The build runs on a background thread and the previous table (or None) is returned meanwhile,
+        unless `wait` is set: then it runs on the calling thread, and its errors are raised (a build
+        of the same snapshot already running elsewhere is not waited for).
+        """
+        snapshot = snapshot or fingerprint(player_data)
+        with self._lock:
+            current = self._current
+            if current is not None and current.fingerprint == snapshot:
+                return current
+
+        if os.path.exists(self._path(snapshot)):
+            try:
+                table = SimilarityTable(pd.read_parquet(self._path(snapshot)), snapshot)
+                with self._lock:
+                    self._current = table
+                return table
+            except (OSError, ValueError) as e:
+                logger.warning("Rebuilding the similarity table, could not read %s: %s", self._path(snapshot), e)
+
+        with self._lock:
+            if self._building == snapshot:
+                return current
+            self._building = snapshot
+            self._latest = snapshot
+
+        def run():
+            try:
+                return self._build(player_data, snapshot)
+            finally:
+                with self._lock:
+                    if self._building == snapshot:
+                        self._building = None
+
+        if wait:
+            return run()
+
+        def run_logged():
+            try:
+                run()
+            except Exception as e:
+                logger.exception("Similarity table build failed: %s", e)
+
+        threading.Thread(target=run_logged, name="similarity-table", daemon=True).start()
+        return current
+
+
+@st.cache_resource
+def get_similarity_table_builder():
+    """Returns the neighbour table builder shared by all sessions."""
+    return SimilarityTableBuilder()
+
+
+def load_similarity_table(wait=False):
+    """Returns the precomputed neighbour table of the current player snapshot, or None while the first one is built."""
+    players = get_dataset('players')
+    return get_similarity_table_builder().get(players.data, players.version, wait)
@@ -0,0 +1,199 @@
+# simulation.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.identity import load_player_identity
+
+N_SIMULATIONS = 100_000
+SIMULATION_SEED = 0  # Fixed, so the same teams show the same distribution on every rerun
+SCORE_PERCENTILES = (5, 25, 50, 75, 95)
+PRIOR_WEIGHT = 4  # Gameweeks of the position average mixed into each player's own estimates
+MIN_PLAY_PROBABILITY = 0.05  # Floor of the chance to play, so a rare starter's points stay bounded
+FIT_COLUMNS = ('minutes', 'total_points', 'xP')
+
+
+class PointsSimulator(object):
+    """
+    Draws gameweek scores for many players and simulations as one array.
+
+    Each player plays with their own probability, estimated from the gameweeks they got minutes
+    in and shrunk towards their position's rate. A player who plays scores their expected points
+    given that they play, plus a residual: the residuals of the position's played gameweeks
+    (actual - xP, centred) are resampled and scaled to the player's own spread, so the draws
+    keep the skew of FPL scores (many blanks, a few hauls). A player who does not play scores 0.
+
+    The expected points given that a player plays never exceed the best average of any player of
+    their position in the games they played, shrunk towards the position average like the other
+    estimates (`max_mean_points`); where that cap binds, the
+    player's chance to play is raised instead, so the draws still average to the expected points.
+    """
+
+    def __init__(self, play_probability, spread, residuals, positions, max_mean_points=None):
+        self.play_probability = play_probability
+        self.spread = spread
+        self.residuals = residuals
+        self.positions = positions
+        self.max_mean_points = max_mean_points if max_mean_points is not None else pd.Series(dtype=float)
+
+    @property
+    def fitted(self):
+        """Whether there were played gameweeks to fit on; an unfitted simulator cannot draw."""
+        return bool(self.residuals)
+
+    @classmethod
+    def fit(cls, gameweek_data, player_keys, positions, prior_weight=PRIOR_WEIGHT):
+        """
+        Fits the per-player distributions on a season's gameweek history.
+
+        Parameters:
+        - gameweek_data (pd.DataFrame): One row per player and gameweek, with `minutes`,
+          `total_points` and `xP`.
+        - player_keys (np.ndarray): Player key of each row of `gameweek_data`; -1 for rows to leave out.
+        - positions (pd.Series): Position of every player, indexed by player key.
+        - prior_weight (float): Gameweeks of the position average mixed into each player's estimates.
+
+        Returns:
+        - simulator (PointsSimulator): The fitted simulator; not `fitted` if there is no gameweek
+          history yet (e.g. before the season starts).
+        """
+        if gameweek_data.empty or not set(FIT_COLUMNS) <= set(gameweek_data.columns):
+            return cls(pd.Series(dtype=float), pd.Series(dtype=float), {}, positions.astype(str))
+        player_keys = np.asarray(player_keys)
+        keep = player_keys != -1
+        rows = pd.DataFrame({
+            'player_key': player_keys[keep],
+            'played': gameweek_data['minutes'].to_numpy()[keep] > 0,
+            'points': pd.to_numeric(gameweek_data['total_points'], errors='coerce').to_numpy(dtype=float)[keep],
+            'residual': (pd.to_numeric(gameweek_data['total_points'], errors='coerce')
+                         - pd.to_numeric(gameweek_data['xP'], errors='coerce')).to_numpy(dtype=float)[keep],
+        })
+        rows['position'] = positions.reindex(rows['player_key']).astype(str).to_numpy()
+        rows = rows[rows['position'].isin(positions.astype(str).unique())]
+        played = rows[rows['played'] & rows['residual'].notna()]
+
+        # Position-level rates and spreads, the prior every player is shrunk towards
+        position_play = rows.groupby('position')['played'].mean()
+        position_spread = played.groupby('position')['residual'].std()
+        # Each player's points per played gameweek, shrunk like the rates below so that one haul
+        # in a single appearance does not set the position's cap
+        position_points = played.groupby('position')['points'].mean()
+        player_points = played.groupby(['position', 'player_key'])['points'].agg(['sum', 'count'])
+        prior_points = position_points.reindex(player_points.index.get_level_values('position')).to_numpy()
+        shrunk_points = (player_points['sum'] + prior_weight * prior_points) / (player_points['count'] + prior_weight)
+        max_mean_points = shrunk_points.groupby(level='position').max()
+
+        by_player = rows.groupby('player_key')['played'].agg(['sum', 'count'])
+        residuals = played.groupby('player_key')['residual'].agg(['count', 'var'])
+        player_positions = positions.astype(str)
+        prior_play = player_positions.map(position_play).fillna(position_play.mean())
+        prior_var = player_positions.map(position_spread ** 2).fillna((position_spread ** 2).mean())
+
+        plays = by_player['sum'].reindex(positions.index).fillna(0)
+        gameweeks = by_player['count'].reindex(positions.index).fillna(0)
+        play_probability = (plays + prior_weight * prior_play) / (gameweeks + prior_weight)
+
+        count = residuals['count'].reindex(positions.index).fillna(0)
+        sum_of_squares = (residuals['var'].reindex(positions.index).fillna(0) * (count - 1)).clip(lower=0)
+        spread = np.sqrt((sum_of_squares + prior_weight * prior_var) / (count.clip(lower=1) - 1 + prior_weight))
+
+        # Standardized, centred residuals per position, resampled as the shape of every draw
+        standardized = {}
+        for position, group in played.groupby('position'):
+            values = group['residual'].to_numpy(dtype=float)
+            standardized[position] = ((values - values.mean()) / (values.std() or 1.0)).astype(np.float32)
+        return cls(play_probability.clip(MIN_PLAY_PROBABILITY, 1.0), spread.fillna(spread.mean()),
+                   standardized, player_positions, max_mean_points)
+
+    def draw(self, player_keys, expected_points, n_simulations=N_SIMULATIONS, seed=SIMULATION_SEED):
+        """
+        Draws whether each of a set of players plays, and their gameweek score.
+
+        Parameters:
+        - player_keys (list of int): Players to simulate.
+        - expected_points (array-like): Each player's expected points (e.g. the model's
+          prediction), which the draws average to.
+        - n_simulations (int): Simulated gameweeks.
+        - seed (int): Seed of the random generator.
+
+        Returns:
+        - plays (np.ndarray): players x simulations boolean array, True where the player plays.
+        - points (np.ndarray): players x simulations array of scores (float32, whole points).
+
+        Raises:
+        - ValueError: If the simulator is not `fitted`.
+        """
+        if not self.fitted:
+            raise ValueError("The points simulator has no gameweek history to draw from")
+        rng = np.random.default_rng(seed)
+        player_keys = list(player_keys)
+        expected = np.asarray(expected_points, dtype=np.float32)
+        probability = self.play_probability.reindex(player_keys).fillna(self.play_probability.mean()).to_numpy(np.float32)
+        spread = self.spread.reindex(player_keys).fillna(self.spread.mean()).to_numpy(np.float32)
+        positions = self.positions.reindex(player_keys).to_numpy()
+
+        # Scores when playing are centred so that the unconditional mean is the expected points;
+        # past the position's cap, a higher chance to play makes up the mean instead of a higher score
+        cap = pd.Series(positions.astype(str)).map(self.max_mean_points).fillna(self.max_mean_points.max())
+        cap = cap.fillna(np.inf).to_numpy(np.float32)
+        probability = np.clip(np.maximum(probability, expected / np.maximum(cap, 1e-6)), 0, 1).astype(np.float32)
+        mean_if_played = np.minimum(expected / probability, cap)
+        plays = rng.random((len(player_keys), n_simulations), dtype=np.float32) < probability[:, None]
+
+        shapes = np.zeros((len(player_keys), n_simulations), dtype=np.float32)
+        pooled = np.concatenate(list(self.residuals.values())) if self.residuals else np.zeros(1, np.float32)
+        for position in np.unique(positions.astype(str)):
+            rows = np.flatnonzero(positions.astype(str) == position)
+            residuals = self.residuals.get(position, pooled)
+            shapes[rows] = residuals[rng.integers(0, len(residuals), (len(rows), n_simulations))]
+
+        points = mean_if_played[:, None] + spread[:, None] * shapes
+        return plays, np.where(plays, np.rint(points), 0).astype(np.float32)
+
+    def simulate(self, player_keys, expected_points, n_simulations=N_SIMULATIONS, seed=SIMULATION_SEED):
+        """Draws gameweek scores for a set of players; returns the players x simulations array of `draw`."""
+        return self.draw(player_keys, expected_points, n_simulations, seed)[1]
+
+
+def score_summary(totals, percentiles=SCORE_PERCENTILES):
+    """Returns the mean, standard deviation and percentiles of simulated team totals."""
+    values = np.percentile(totals, percentiles)
+    summary = {'Mean': float(totals.mean()), 'Std': float(totals.std())}
+    summary.update({f'P{p}': float(v) for p, v in zip(percentiles, values)})
+    return summary
+
+
+def simulate_teams(simulator, teams, expected_points, n_simulations=N_SIMULATIONS, seed=SIMULATION_SEED):
+    """
+    Simulates the total scores of several teams over the same draws.
+
+    Players picked in more than one team are drawn once, so teams are compared on the same
+    simulated gameweeks.
+
+    Parameters:
+    - simulator (PointsSimulator): Fitted simulator.
+    - teams (dict): {team name: list of player keys}.
+    - expected_points (dict): {player key: expected points}.
+    - n_simulations (int): Simulated gameweeks.
+    - seed (int): Seed of the random generator.
+
+    Returns:
+    - totals (dict): {team name: array of simulated total scores}.
+    """
+    players = list(dict.fromkeys(key for keys in teams.values() for key in keys))
+    if not players:
+        return {name: np.zeros(n_simulations, dtype=np.float32) for name in teams}
+    rows = {key: i for i, key in enumerate(players)}
+    points = simulator.simulate(players, [expected_points[key] for key in players], n_simulations, seed)
+    return {name: points[[rows[key] for key in keys]].sum(axis=0) for name, keys in teams.items()}
+
+
+@st.cache_resource(max_entries=2)
+def _points_simulator(year, version):
+    identity = load_player_identity(year)
+    return PointsSimulator.fit(identity.gameweek_data, identity.gameweek_keys, identity.players['position'])
+
+
+def load_points_simulator(year: str):
+    """Returns the points simulator of a season, fitted once per data version."""
+    return _points_simulator(year, load_player_identity(year).version)
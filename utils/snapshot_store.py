@@ -0,0 +1,145 @@
+# snapshot_store.py
+
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import requests
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "data/snapshots"
+REQUEST_TIMEOUT = (3.05, 15)  # (connect, read) seconds
+SNAPSHOT_MAX_AGE = 15 * 60  # Seconds before a snapshot is revalidated against the upstream
+
+
+class SnapshotStore(object):
+    """
+    Persists the last good copy of a JSON endpoint and a table derived from it.
+
+    The raw payload is kept as JSON next to its ETag / Last-Modified headers, and the derived
+    table as Parquet. `refresh` revalidates with a conditional request, so an unchanged
+    upstream costs a 304 and no parsing; when the upstream is slow or down the previous
+    snapshot stays in place. Files are written to a temporary name and renamed, so readers
+    never see a half-written snapshot.
+    """
+
+    def __init__(self, name, url, transform, root=SNAPSHOT_DIR, timeout=REQUEST_TIMEOUT, max_age=SNAPSHOT_MAX_AGE):
+        self.name = name
+        self.url = url
+        self.transform = transform
+        self.root = root
+        self.timeout = timeout
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _path(self, suffix):
+        return os.path.join(self.root, f"{self.name}.{suffix}")
+
+    def _write(self, suffix, write):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._path(suffix) + ".tmp"
+        write(tmp)
+        os.replace(tmp, self._path(suffix))
+
+    def _write_json(self, suffix, obj):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(obj, f)
+        self._write(suffix, write)
+
+    def meta(self):
+        """Returns the snapshot metadata (etag, last_modified, fetched_at, checked_at), or {} if none exists."""
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def payload(self):
+        """Returns the last good raw payload, or None if no snapshot exists."""
+        try:
+            with open(self._path("json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def table(self):
+        """Returns the last good derived table, or None if no snapshot exists."""
+        if not os.path.exists(self._path("parquet")):
+            return None
+        return pd.read_parquet(self._path("parquet"))
+
+    def is_stale(self):
+        """Whether the snapshot is missing or was last checked against the upstream more than `max_age` ago."""
+        return time.time() - self.meta().get("checked_at", 0) > self.max_age
+
+    def refresh(self):
+        """
+        Revalidates the snapshot against the upstream with a conditional GET.
+
+        A failed check is recorded like a successful one, so the next attempt waits `max_age`
+        instead of downloading again on every rerun; the previous snapshot stays in place.
+
+        Returns:
+        - changed (bool): True if a new payload was stored, False if the upstream answered 304.
+
+        Raises:
+        - requests.exceptions.RequestException: If the upstream cannot be reached or errors.
+        - ValueError: If the payload is not JSON or `transform` cannot build the table from it.
+        """
+        meta = self.meta()
+        headers = {}
+        if meta and os.path.exists(self._path("parquet")):
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        now = time.time()
+        try:
+            response = requests.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                self._write_json("meta.json", {**meta, "checked_at": now})
+                return False
+            response.raise_for_status()
+            try:
+                payload = response.json()
+                table = self.transform(payload)
+            except Exception as e:  # Any parse or transform error means the payload is unusable
+                raise ValueError(f"Malformed {self.name} payload: {e!r}") from e
+        except (requests.exceptions.RequestException, ValueError):
+            self._write_json("meta.json", {**meta, "checked_at": now, "failed_at": now})
+            raise
+
+        self._write_json("json", payload)
+        self._write("parquet", lambda path: table.to_parquet(path, index=False))
+        self._write_json("meta.json", {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": now,
+            "checked_at": now,
+        })
+        return True
+
+    def refresh_in_background(self):
+        """Starts a refresh on a daemon thread unless one is already running; failures keep the old snapshot."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:  # The thread must not die with a traceback; the old snapshot stays
+                logger.warning("Keeping the %s snapshot, refresh failed: %s", self.name, e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name=f"{self.name}-refresh", daemon=True).start()
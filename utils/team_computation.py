@@ -1,10 +1,11 @@
 # team_computation.py
 
+import bisect
+
+import numpy as np
 import pandas as pd
-from utils.constants import FORMATION_MAP
-from sklearn.preprocessing import StandardScaler
-from scipy.spatial.distance import cdist
-import umap
+from scipy.optimize import milp, LinearConstraint, Bounds
+from utils.constants import FORMATION_MAP, BUDGET, SQUAD_COMPOSITION, MAX_PLAYERS_PER_CLUB
 
 def get_top_players_by_position(player_data, formation):
     """
@@ -45,92 +46,249 @@ def get_top_players_by_position(player_data, formation):
 
     return best_team
 
-def adjust_team_to_budget(team, budget, player_data):
+def _candidate_pool(player_data, position_counts, objective):
     """
-    Adjusts the team to fit within the budget by replacing expensive players with cheaper alternatives.
+    Returns the rows eligible for selection together with their objective scores.
 
     Parameters:
-    - team (list of dict): The current team list.
+    - player_data (pd.DataFrame): DataFrame containing player statistics.
+    - position_counts (dict): Number of players required per position.
+    - objective (str or pd.Series): Column to maximise, or scores aligned to `player_data`'s index.
+
+    Returns:
+    - candidates (pd.DataFrame): Players in the required positions with a known cost.
+    - points (np.ndarray): Objective score of each candidate.
+    """
+    if isinstance(objective, str):
+        scores = pd.to_numeric(player_data[objective], errors='coerce')
+    else:
+        scores = pd.to_numeric(objective.reindex(player_data.index), errors='coerce')
+
+    eligible = player_data['position'].isin(list(position_counts)) & player_data['now_cost'].notna()
+    candidates = player_data[eligible]
+    points = scores[eligible].fillna(0).to_numpy(dtype=float)
+    return candidates, points
+
+
+def _prune_dominated(costs, points, positions, position_counts, clubs=None, max_per_club=None, full_clubs=0):
+    """
+    Flags the players that can still appear in an optimal selection.
+
+    A player is dropped when enough players of the same position cost no more and score no
+    less (ties broken by row order) that any selection using it could swap it for one of them
+    without losing points or breaking the budget. With a club limit, a dominator only counts
+    if its club cannot be full: either it plays for the same club, or it is outside the clubs
+    with the most dominators that the rest of the squad could fill (`full_clubs` of them).
+
+    Parameters:
+    - costs (np.ndarray): Player costs in tenths of millions.
+    - points (np.ndarray): Player objective scores.
+    - positions (np.ndarray): Player positions.
+    - position_counts (dict): Number of players selected per position.
+    - clubs (np.ndarray, optional): Player clubs when a club limit applies.
+    - max_per_club (int, optional): Maximum number of selected players from one club.
+    - full_clubs (int): Number of other clubs the squad could fill up to `max_per_club`.
+
+    Returns:
+    - mask (np.ndarray): Boolean mask of players that survive pruning.
+    """
+    mask = np.ones(len(costs), dtype=bool)
+    if clubs is None:
+        clubs, max_per_club = np.zeros(len(costs)), sum(position_counts.values())
+    club_codes = pd.factorize(clubs)[0]
+
+    for position, count in position_counts.items():
+        idx = np.flatnonzero(positions == position)
+        # In this order a player's dominators are exactly the earlier players scoring no less
+        order = idx[np.lexsort((idx, -points[idx], costs[idx]))]
+
+        # Both thresholds are at most `count`, so only each club's `count` best scorers seen so far
+        # matter. They are kept in one list sorted by score, best first, read until a query is decided
+        best_by_club, seen = {}, []
+        for j in order:
+            own_club, per_club = 0, {}
+            for neg_points, _, club in seen:
+                if -neg_points < points[j] or len(per_club) >= full_clubs + count:
+                    break
+                if club == club_codes[j]:
+                    own_club += 1
+                else:
+                    per_club[club] = per_club.get(club, 0) + 1
+            counts = sorted(per_club.values(), reverse=True)
+            available = own_club + sum(counts[full_clubs:])
+            mask[j] = (own_club < min(count, max_per_club)) & (available < count)
+
+            entry = (-points[j], j, club_codes[j])
+            club_best = best_by_club.setdefault(club_codes[j], [])
+            if len(club_best) == count:
+                if entry >= club_best[-1]:
+                    continue
+                seen.pop(bisect.bisect_left(seen, club_best.pop()))
+            bisect.insort(club_best, entry)
+            bisect.insort(seen, entry)
+    return mask
+
+
+def _to_records(candidates, points, selected, position_counts):
+    """
+    Converts a selection mask into player dictionaries ordered by position, then by score.
+
+    Parameters:
+    - candidates (pd.DataFrame): Candidate players.
+    - points (np.ndarray): Objective score of each candidate.
+    - selected (np.ndarray): Boolean mask of the chosen candidates.
+    - position_counts (dict): Positions in display order.
+
+    Returns:
+    - team (list of dict): The chosen players.
+    """
+    chosen = candidates.assign(_score=points)[selected]
+    chosen = chosen.assign(_order=chosen['position'].astype(str).map({pos: i for i, pos in enumerate(position_counts)}))
+    chosen = chosen.sort_values(by=['_order', '_score'], ascending=[True, False])
+    return chosen.drop(columns=['_order', '_score']).to_dict('records')
+
+
+def _select_within_budget(player_data, position_counts, budget, objective='total_points'):
+    """
+    Solves the budget-constrained selection exactly as a 0/1 integer program.
+
+    Parameters:
+    - player_data (pd.DataFrame): DataFrame containing player statistics.
+    - position_counts (dict): Number of players required per position.
     - budget (int): The total budget in tenths of millions.
+    - objective (str or pd.Series): Column to maximise, or scores aligned to `player_data`'s index.
+
+    Returns:
+    - team (list of dict): Selected players ordered by position, or an empty list if no selection fits the budget.
+    """
+    candidates, points = _candidate_pool(player_data, position_counts, objective)
+    positions = candidates['position'].to_numpy()
+    costs = candidates['now_cost'].to_numpy(dtype=np.int64)
+
+    mask = _prune_dominated(costs, points, positions, position_counts)
+    candidates, points, positions, costs = candidates[mask], points[mask], positions[mask], costs[mask]
+
+    constraints = [LinearConstraint(costs[None, :], -np.inf, budget)]
+    for position, count in position_counts.items():
+        constraints.append(LinearConstraint((positions == position)[None, :].astype(float), count, count))
+
+    result = milp(-points, constraints=constraints, integrality=np.ones(len(points)), bounds=Bounds(0, 1),
+                  options={'mip_rel_gap': 0})
+    if not result.success:
+        return []
+
+    return _to_records(candidates, points, result.x > 0.5, position_counts)
+
+
+def optimize_team(player_data, formation, budget=BUDGET, objective='total_points'):
+    """
+    Selects the highest scoring XI for a formation that fits within the budget.
+
+    Players that cannot be part of any optimal team are pruned by cost/points dominance first,
+    and the remaining selection is solved exactly with an integer program, so the result is
+    the provably best XI rather than a greedy approximation.
+
+    Parameters:
     - player_data (pd.DataFrame): DataFrame containing player statistics.
+    - formation (str): Selected team formation (e.g., '4-4-2').
+    - budget (int): The total budget in tenths of millions.
+    - objective (str or pd.Series): Column to maximise (e.g. 'total_points'), or predicted
+      points aligned to `player_data`'s index.
 
     Returns:
-    - adjusted_team (list of dict): The adjusted team list within budget constraints.
+    - best_team (list of dict): List of selected player dictionaries, empty if no XI fits the budget.
     """
-    total_cost = sum(player['now_cost'] for player in team)
-    if total_cost <= budget:
-        return team  # Team is within budget
+    return _select_within_budget(player_data, FORMATION_MAP[formation], budget, objective)
 
-    # Create a copy of the team to avoid modifying the original list
-    adjusted_team = team.copy()
-    # Sort the team by cost in descending order
-    adjusted_team.sort(key=lambda x: x['now_cost'], reverse=True)
-
-    # Iterate over players and replace with cheaper alternatives
-    for i in range(len(adjusted_team)):
-        if total_cost <= budget:
-            break  # Team is now within budget
-
-        expensive_player = adjusted_team[i]
-        position = expensive_player['position']
-
-        # Find a cheaper alternative
-        cheaper_players = player_data[
-            (player_data['position'] == position) &
-            (~player_data['web_name'].isin([p['web_name'] for p in adjusted_team])) &
-            (player_data['now_cost'] < expensive_player['now_cost'])
-        ].sort_values(by='total_points', ascending=False)
-
-        # Replace with the next best cheaper player
-        if not cheaper_players.empty:
-            candidate = cheaper_players.iloc[0]
-            adjusted_team[i] = candidate.to_dict()
-            total_cost = sum(player['now_cost'] for player in adjusted_team)
-        else:
-            continue  # No cheaper players available for this position
-
-    return adjusted_team
-
-def get_similar_players(df: pd.DataFrame, player_name:str, top_n: int = 5):
-    
-    """Returns top_n similar players based on the player input. Uses UMAP for dimensional reduction and euclidean distance to find similarities
-       Requires sklearn, scipy and umap modules.   
-    """
-    
-    df["now_cost_m"] = df["now_cost"]/10
-    target_position = df.loc[df['web_name'] == player_name, 'position'].values[0]
-    if target_position == 'GKP':
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_conceded", "clean_sheets", "ict_index"]
-    elif target_position == 'DEF':
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_conceded", "clean_sheets", "assists", "creativity", "goals_scored", "ict_index"]
-    elif target_position == "MID":
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_scored", "assists", "creativity", "influence", "threat", "goals_conceded", "clean_sheets", "ict_index"]
-    else:
-        numeric_features = ["now_cost_m", "total_points", "minutes", "goals_scored", "assists", "creativity", "influence", "threat", "ict_index"]
-    metadata = ['web_name', 'position']
-    filtered_data = df[metadata + numeric_features].dropna()
 
-    
-    scaler = StandardScaler()
-    normalized_features = scaler.fit_transform(filtered_data[numeric_features])
+def optimize_squad(player_data, formation, budget=BUDGET, objective='total_points', bench_weight=0.1,
+                   max_per_club=MAX_PLAYERS_PER_CLUB):
+    """
+    Selects the best full FPL squad: 15 players (SQUAD_COMPOSITION) within the budget, at most
+    `max_per_club` per `team_name`, with a starting XI in the given formation.
+
+    Starters count with their full score and bench players with `bench_weight` of it. The squad
+    and XI are chosen together by one integer program over vectorized cost/points arrays, after
+    pruning players dominated on cost and points within their position and club.
+
+    Parameters:
+    - player_data (pd.DataFrame): DataFrame containing player statistics.
+    - formation (str): Starting XI formation (e.g., '4-4-2').
+    - budget (int): The total budget for all 15 players in tenths of millions.
+    - objective (str or pd.Series): Column to maximise, or scores aligned to `player_data`'s index.
+    - bench_weight (float): Weight in [0, 1] of a bench player's score.
+    - max_per_club (int): Maximum number of players from the same club.
+
+    Returns:
+    - starting_xi (list of dict): The starting players, empty if no squad satisfies the constraints.
+    - bench (list of dict): The four substitutes.
+    """
+    if not 0 <= bench_weight <= 1:
+        raise ValueError(f"bench_weight must be between 0 and 1, got {bench_weight}")
+
+    starter_counts = FORMATION_MAP[formation]
+    candidates, points = _candidate_pool(player_data, SQUAD_COMPOSITION, objective)
+    positions = candidates['position'].to_numpy()
+    clubs = candidates['team_name'].to_numpy()
+    costs = candidates['now_cost'].to_numpy(dtype=np.int64)
+    full_clubs = (sum(SQUAD_COMPOSITION.values()) - 1) // max_per_club
 
-    umap_reducer = umap.UMAP(n_neighbors=5, min_dist=0.1, n_components=2)
-    umap_features = umap_reducer.fit_transform(normalized_features)
+    mask = _prune_dominated(costs, points, positions, SQUAD_COMPOSITION, clubs, max_per_club, full_clubs)
+    candidates, points = candidates[mask], points[mask]
+    positions, clubs, costs = positions[mask], clubs[mask], costs[mask]
+    # A benched dominator can swap roles with a starter, so starting slots prune further
+    can_start = _prune_dominated(costs, points, positions, starter_counts, clubs, max_per_club, full_clubs)
+    n = len(points)
 
-    distance_matrix_umap = cdist(umap_features, umap_features, metric='euclidean')
+    # Variables are [starting (n), bench (n)]
+    rows, lower, upper = [np.concatenate([costs, costs])], [-np.inf], [budget]
+    for position, count in SQUAD_COMPOSITION.items():
+        in_position = (positions == position).astype(float)
+        starters = starter_counts.get(position, 0)
+        rows += [np.concatenate([in_position, np.zeros(n)]), np.concatenate([np.zeros(n), in_position])]
+        lower += [starters, count - starters]
+        upper += [starters, count - starters]
+    for club in np.unique(clubs):
+        in_club = (clubs == club).astype(float)
+        rows.append(np.concatenate([in_club, in_club]))
+        lower.append(0)
+        upper.append(max_per_club)
+    constraints = [
+        LinearConstraint(np.vstack(rows), lower, upper),
+        LinearConstraint(np.hstack([np.eye(n), np.eye(n)]), 0, 1),  # A player fills at most one role
+    ]
 
-    distance_df_umap = pd.DataFrame(distance_matrix_umap, index=filtered_data['web_name'], columns=filtered_data['web_name'])
+    weights = -np.concatenate([points, bench_weight * points])
+    bounds = Bounds(0, np.concatenate([can_start, np.ones(n)]))
+    result = milp(weights, constraints=constraints, integrality=np.ones(2 * n), bounds=bounds,
+                  options={'mip_rel_gap': 0})
+    if not result.success:
+        return [], []
+
+    starting, bench = result.x[:n] > 0.5, result.x[n:] > 0.5
+    return (_to_records(candidates, points, starting, SQUAD_COMPOSITION),
+            _to_records(candidates, points, bench, SQUAD_COMPOSITION))
+
+
+def adjust_team_to_budget(team, budget, player_data):
+    """
+    Adjusts the team to fit within the budget by replacing it with the best selection of the
+    same shape (players per position) whose total cost is within budget.
 
-    if player_name not in distance_df_umap.index:
-        return f"Player '{player_name}' not found in the dataset."
+    Parameters:
+    - team (list of dict): The current team list.
+    - budget (int): The total budget in tenths of millions.
+    - player_data (pd.DataFrame): DataFrame containing player statistics.
 
-    same_position_players = df[df['position'] == target_position]['web_name']
-    distances = distance_df_umap.loc[player_name, same_position_players]
-    # Normalize similarity scores (invert distances and normalize)
-    similarity_scores = 1 / (1 + distances)  # Invert distances to get similarity
-    normalized_scores = (similarity_scores - similarity_scores.min()) / (similarity_scores.max() - similarity_scores.min())
+    Returns:
+    - adjusted_team (list of dict): The adjusted team list within budget constraints.
+    """
+    total_cost = sum(player['now_cost'] for player in team)
+    if total_cost <= budget:
+        return team  # Team is within budget
 
-    # Get top N most similar players (excluding the player itself)
-    similar_players = normalized_scores.sort_values(ascending=False)[1:top_n + 1]  # Exclude self (similarity = 1)
+    position_counts = {}
+    for player in team:
+        position_counts[player['position']] = position_counts.get(player['position'], 0) + 1
 
-    return similar_players
\ No newline at end of file
+    return _select_within_budget(player_data, position_counts, budget)
@@ -0,0 +1,244 @@
+# transfer_planner.py
+
+import numpy as np
+import pandas as pd
+from utils.constants import BUDGET, TRANSFER_HIT, MAX_FREE_TRANSFERS, MAX_PLAYERS_PER_CLUB, FORMATION_MAP, SQUAD_COMPOSITION
+
+
+def prediction_horizon(prediction_index, player_data, start_gw, horizon):
+    """
+    Builds a players x gameweeks matrix of predicted points for the planning horizon.
+
+    Players are joined on their id through the rows the prediction index resolved to them, or on
+    (name, team) if none were. Gameweeks missing from the prediction table carry the player's
+    latest earlier prediction forward; players without any prediction score 0.
+
+    Parameters:
+    - prediction_index (PredictionIndex): Index over the prediction table.
+    - player_data (pd.DataFrame): DataFrame containing player statistics.
+    - start_gw (int): First gameweek of the horizon.
+    - horizon (int): Number of gameweeks to plan for.
+
+    Returns:
+    - predictions (pd.DataFrame): Predicted points indexed by player `id`, one column per gameweek.
+    """
+    gameweeks = list(range(start_gw, start_gw + horizon))
+
+    def by_gameweek(table, index):
+        table = table.pivot_table(index=index, columns='gw', values='pred_points_rounded', aggfunc='last')
+        return table.reindex(columns=sorted(set(table.columns) | set(gameweeks))).ffill(axis=1)[gameweeks]
+
+    table = prediction_index.table
+    by_key = by_gameweek(table[table['player_key'] != -1], 'player_key')
+    by_name = by_gameweek(table, ['name_key', 'team_key'])
+
+    keyed = player_data['id'].isin(by_key.index).to_numpy()
+    points = np.where(keyed[:, None], by_key.reindex(player_data['id']).to_numpy(),
+                      by_name.reindex(prediction_index.keys(player_data['web_name'], player_data['team_name'])).to_numpy())
+    return pd.DataFrame(points, index=player_data['id'].to_numpy(), columns=gameweeks).fillna(0)
+
+
+def xi_budget(player_data, formation, budget=BUDGET):
+    """
+    Returns the part of the budget a starting XI can spend: the budget minus the cheapest bench
+    that completes it to a full squad (SQUAD_COMPOSITION).
+
+    Parameters:
+    - player_data (pd.DataFrame): DataFrame containing player statistics.
+    - formation (str): Formation of the XI (e.g., '4-4-2').
+    - budget (int): The total budget for all 15 players in tenths of millions.
+
+    Returns:
+    - budget (int): The XI's budget in tenths of millions.
+    """
+    starters = FORMATION_MAP[formation]
+    bench_cost = 0
+    for position, count in SQUAD_COMPOSITION.items():
+        costs = player_data.loc[player_data['position'] == position, 'now_cost']
+        bench_cost += costs.nsmallest(count - starters.get(position, 0)).sum()
+    return budget - int(bench_cost)
+
+
+def _non_dominated(costs, points, keep):
+    """
+    Flags players with fewer than `keep` others that cost no more and are predicted no less
+    in every gameweek (ties broken by row order).
+    """
+    no_worse = (costs[:, None] <= costs[None, :]) & (points[:, None, :] >= points[None, :, :]).all(axis=2)
+    idx = np.arange(len(costs))
+    better = (costs[:, None] < costs[None, :]) | (points[:, None, :] > points[None, :, :]).any(axis=2) \
+        | (idx[:, None] < idx[None, :])
+    return (no_worse & better).sum(axis=0) < keep
+
+
+def plan_transfers(squad, player_data, predictions, budget=BUDGET, free_transfers=1, max_transfers_per_gw=2,
+                   beam_width=50, max_per_club=MAX_PLAYERS_PER_CLUB):
+    """
+    Searches for a good sequence of transfers for a squad over the gameweeks in `predictions`.
+
+    The search walks the horizon one gameweek at a time. Incoming players never take a club
+    above `max_per_club` players. Each free transfer not used is banked (up to
+    MAX_FREE_TRANSFERS) and every transfer beyond the free ones costs TRANSFER_HIT points.
+    In every mode:
+    - states holding the same squad are merged, and a state is dropped when another with the
+      same squad has at least as many points and free transfers;
+    - transfer options are memoized per (squad, gameweek), since many orders of the same
+      transfers lead to the same squad.
+
+    With `beam_width=None` the search is exact: every state and every transfer is expanded,
+    which is only tractable for small candidate pools. Otherwise it is a beam search, and the
+    plan is the best one found among the states and options kept rather than the best possible.
+    To keep a 5-gameweek horizon over the full player list interactive:
+    - incoming players dominated on cost and on every gameweek's prediction are pruned up front;
+    - only the `beam_width` best single transfers that gain points are tried, and pairs are built from them;
+    - only the `beam_width` states with the best points-if-held-from-here are expanded.
+
+    Parameters:
+    - squad (list of dict): The current squad; each player needs `id`, `position` and `now_cost`.
+    - player_data (pd.DataFrame): DataFrame containing player statistics.
+    - predictions (pd.DataFrame): Predicted points indexed by player `id`, one column per gameweek.
+    - budget (int): The total budget in tenths of millions.
+    - free_transfers (int): Free transfers available before the first gameweek.
+    - max_transfers_per_gw (int): Maximum number of transfers considered in a single gameweek (1 or 2).
+    - beam_width (int or None): Number of states expanded per gameweek, and of transfer options tried
+      per state; None searches exhaustively.
+    - max_per_club (int): Maximum number of players from the same club (`team_name`).
+
+    Returns:
+    - plan (pd.DataFrame): One row per gameweek with the transfers out/in, free transfers
+      available, hit taken and predicted points after hits.
+    """
+    gameweeks = list(predictions.columns)
+    horizon = len(gameweeks)
+    squad_ids = [player['id'] for player in squad]
+    players = player_data.drop_duplicates('id').set_index('id')
+
+    exact = beam_width is None
+
+    # Candidate pool: the squad plus incoming players that are not dominated within their position.
+    # The exact search keeps every player, as club limits can make a dominated player the best pick
+    pool = players[players['position'].isin({player['position'] for player in squad})]
+    costs = pool['now_cost'].to_numpy(dtype=np.int64)
+    points = predictions.reindex(pool.index).fillna(0).to_numpy(dtype=float)
+    positions = pool['position'].to_numpy()
+    clubs = pd.factorize(pool['team_name'])[0]
+    keep = np.full(len(pool), exact)
+    if not exact:
+        for position in np.unique(positions):
+            idx = np.flatnonzero(positions == position)
+            slots = sum(player['position'] == position for player in squad)
+            keep[idx] = _non_dominated(costs[idx], points[idx], slots)
+    keep |= pool.index.isin(squad_ids)
+    pool, costs, points, positions, clubs = pool[keep], costs[keep], points[keep], positions[keep], clubs[keep]
+    ids = pool.index.to_numpy()
+
+    # remaining[i, t]: points player i is predicted to score from gameweek t to the end
+    remaining = np.cumsum(points[:, ::-1], axis=1)[:, ::-1]
+    remaining = np.hstack([remaining, np.zeros((len(pool), 1))])
+    start = tuple(sorted(np.flatnonzero(np.isin(ids, squad_ids))))
+
+    move_cache = {}
+
+    def transfer_options(current, t):
+        """Returns the transfer sets worth considering for a squad before gameweek t, best first."""
+        key = (current, t)
+        if key in move_cache:
+            return move_cache[key]
+
+        out = np.array(current)
+        bank = budget - costs[out].sum()
+        club_count = np.bincount(clubs[out], minlength=clubs.max() + 1)
+        outside = np.setdiff1d(np.arange(len(pool)), out)
+        same_position = positions[out][:, None] == positions[outside][None, :]
+        delta = costs[outside][None, :] - costs[out][:, None]
+        gain = remaining[outside, t][None, :] - remaining[out, t][:, None]
+        # The exact search also keeps transfers that lose points or overspend on their own, since
+        # they can free the money or club place another transfer in the same gameweek needs
+        if exact:
+            rows, cols = np.nonzero(same_position)
+        else:
+            rows, cols = np.nonzero(same_position & (delta <= bank) & (gain > 0))
+
+        order = np.argsort(-gain[rows, cols], kind='stable')[:beam_width]
+        outs, ins = out[rows[order]], outside[cols[order]]
+        deltas, gains = delta[rows[order], cols[order]], gain[rows[order], cols[order]]
+        # A single transfer fits the club limit if it swaps within a club or the new club has room
+        club_ok = ((clubs[ins] == clubs[outs]) | (club_count[clubs[ins]] < max_per_club)) & (deltas <= bank)
+        options = [((o,), (i,), g) for o, i, g in zip(outs[club_ok], ins[club_ok], gains[club_ok])]
+
+        if max_transfers_per_gw >= 2:
+            # Pairs of single transfers that swap distinct players and fit in the bank together.
+            # Each incoming club's count after both transfers must stay within the limit
+            in_a, in_b = clubs[ins][:, None], clubs[ins][None, :]
+            out_a, out_b = clubs[outs][:, None], clubs[outs][None, :]
+            count_a = club_count[clubs[ins]][:, None] - (out_a == in_a) - (out_b == in_a) + 1 + (in_b == in_a)
+            count_b = club_count[clubs[ins]][None, :] - (out_a == in_b) - (out_b == in_b) + 1 + (in_a == in_b)
+            valid = (outs[:, None] != outs[None, :]) & (ins[:, None] != ins[None, :]) \
+                & (deltas[:, None] + deltas[None, :] <= bank) \
+                & (count_a <= max_per_club) & (count_b <= max_per_club)
+            first, second = np.nonzero(np.triu(valid, k=1))
+            pair_gains = gains[first] + gains[second]
+            best = np.argsort(-pair_gains, kind='stable')[:beam_width]
+            options += [((outs[a], outs[b]), (ins[a], ins[b]), g)
+                        for a, b, g in zip(first[best], second[best], pair_gains[best])]
+
+        options.sort(key=lambda option: -option[2])
+        options = [((), (), 0.0)] + options[:beam_width]
+        move_cache[key] = options
+        return options
+
+    # Each state is (squad, free transfers) -> (points so far, parent state, transfers made)
+    frontier = {(start, free_transfers): (0.0, None, ((), ()))}
+    history = []
+    for t in range(horizon):
+        candidates = {}
+        for (current, ft), (score, _, _) in frontier.items():
+            for moved_out, moved_in, _ in transfer_options(current, t):
+                made = len(moved_out)
+                if made:
+                    new_squad = tuple(sorted(set(current) - set(moved_out) | set(moved_in)))
+                else:
+                    new_squad = current
+                hits = max(0, made - ft) * TRANSFER_HIT
+                gw_points = points[list(new_squad), t].sum() - hits
+                next_ft = min(MAX_FREE_TRANSFERS, max(ft - made, 0) + 1)
+                state = (new_squad, next_ft)
+                if state not in candidates or candidates[state][0] < score + gw_points:
+                    candidates[state] = (score + gw_points, (current, ft), (moved_out, moved_in, ft, hits, gw_points))
+
+        # Drop states beaten by one holding the same squad with at least as many points and free transfers
+        by_squad = {}
+        for (new_squad, ft), value in candidates.items():
+            by_squad.setdefault(new_squad, []).append((ft, value))
+        pruned = {}
+        for new_squad, entries in by_squad.items():
+            for ft, value in entries:
+                if not any(other_ft >= ft and other[0] >= value[0] and (other_ft, other[0]) != (ft, value[0])
+                           for other_ft, other in entries):
+                    pruned[(new_squad, ft)] = value
+
+        ranked = sorted(pruned.items(), key=lambda item: -(item[1][0] + remaining[list(item[0][0]), t + 1].sum()))
+        frontier = dict(ranked[:beam_width])
+        history.append(frontier)
+
+    # Walk back from the best final state
+    state = max(frontier, key=lambda s: frontier[s][0])
+    steps = []
+    for t in range(horizon - 1, -1, -1):
+        _, parent, step = history[t][state]
+        steps.append(step)
+        state = parent
+    steps.reverse()
+
+    names = pool['web_name'].to_numpy()
+    return pd.DataFrame([
+        {
+            'GW': gameweeks[t],
+            'Transfers Out': ', '.join(names[i] for i in moved_out),
+            'Transfers In': ', '.join(names[i] for i in moved_in),
+            'Free Transfers': ft,
+            'Hit': -hits,
+            'Predicted Points': gw_points,
+        }
+        for t, (moved_out, moved_in, ft, hits, gw_points) in enumerate(steps)
+    ])
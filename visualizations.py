@@ -5,26 +5,17 @@ from plotly.subplots import make_subplots
 from streamlit import title
 import pandas as pd
 from utils.constants import FIELD_COORDS_HALF, POSITION_COLORS, COMMON_METRICS, POSITION_METRICS, POSITION_FULL_NAMES, COLOR_PALETTE
+from utils.predictions import load_prediction_index
+from utils.figure_cache import cached_figure
+from utils.residuals import funnel_limits, FUNNEL_LIMITS
+from utils.simulation import score_summary
 import streamlit as st
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
 import plotly.express as px
 import pandas as pd
 
-players_pred_df = pd.read_csv('data/predicted_df.csv')
-
-def get_player_pred(name, team):
-    try:
-        name_clean = name.strip().split(".")[-1]
-        x = players_pred_df[players_pred_df.web_name.str.contains(name_clean)][players_pred_df.team == team]
-        return int(x.sort_values(['gw'], ascending = False).pred_points_rounded.iloc[0])
-    except:
-        return 0
-
-def draw_soccer_field(selected_team, formation):
-    """Draws a half soccer field with players positioned according to the formation."""
+def draw_soccer_field(selected_team, formation, prediction_index=None):
+    """Draws a half soccer field with players positioned according to the formation; predictions come from the shared index unless one is given."""
     field_color = "#6cba7c"  # Soft Grass Green
     line_color = "#ffffff"  # White lines
 
@@ -97,6 +88,8 @@ def draw_soccer_field(selected_team, formation):
 
     # Add players to the field
     coords = FIELD_COORDS_HALF[formation]  # Use half-field coordinates
+    prediction_index = prediction_index if prediction_index is not None else load_prediction_index()
+    predicted = dict(zip((p['id'] for p in selected_team), prediction_index.predict_team(selected_team)))
     for position, spots in coords.items():
         players = [p for p in selected_team if p['position'] == position]
         for i, (x, y) in enumerate(spots):
@@ -120,7 +113,7 @@ def draw_soccer_field(selected_team, formation):
                         f"Team: {player['team_name']}<br>"
                         f"Cost: £{player['now_cost'] / 10:.1f}m<br>"
                         f"Points: {player['total_points']}<br>"
-                        f"Expected Points next GW: {get_player_pred(player['web_name'], player['team_name'])}<extra></extra>"
+                        f"Expected Points next GW: {predicted[player['id']]}<extra></extra>"
                     ),
                     showlegend=False
                 ))
@@ -206,6 +199,45 @@ def plot_total_points_comparison(user_team, best_team):
     # Display the chart
     st.plotly_chart(fig, use_container_width=True)
 
+def plot_score_distributions(totals):
+    """
+    Plots the simulated score distributions of several teams, with a table of their percentiles.
+
+    Parameters:
+    - totals (dict): {team name: array of simulated total scores}, e.g. from `simulate_teams`.
+    """
+    TEAM_COLOR_MAP = {
+        'Your Team': '#e90052',
+        'Best Team': '#04f5ff'
+    }
+
+    fig = go.Figure()
+    for team, scores in totals.items():
+        # Scores are whole points, so the histogram is a count per score rather than the raw draws
+        scores = scores.astype(int)
+        low = scores.min()
+        probability = np.bincount(scores - low) / len(scores)
+        fig.add_trace(go.Bar(
+            x=np.arange(low, low + len(probability)), y=probability, name=team, opacity=0.6,
+            marker_color=TEAM_COLOR_MAP.get(team),
+            hovertemplate=f'{team}<br>Points: %{{x}}<br>Probability: %{{y:.1%}}<extra></extra>',
+        ))
+        fig.add_vline(x=float(np.median(scores)), line=dict(color=TEAM_COLOR_MAP.get(team, 'white'), dash='dash', width=1))
+
+    fig.update_layout(
+        title=dict(text="Simulated Points next GW", x=0.5, xanchor='center'),
+        xaxis_title="Team Points",
+        yaxis=dict(title="Probability", tickformat='.0%'),
+        barmode='overlay',
+        bargap=0,
+        legend=dict(orientation='h', yanchor='top', y=-0.2),
+        template='plotly_dark',
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    summary = pd.DataFrame({team: score_summary(scores) for team, scores in totals.items()}).T
+    st.dataframe(summary.round(1), use_container_width=True)
+
 def plot_team_radar_chart(user_team, best_team):
     """Plots a radar chart comparing average metrics between two teams."""
 
@@ -410,15 +442,31 @@ def plot_cost_breakdown_by_position(user_team, best_team):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def total_points_vs_cost_yearly(df: pd.DataFrame, min_minutes: int = 500):
-    """Plots a scatter plot of Points Scored vs Cost that can dynamically be adjusted based on position and cost."""
+def total_points_vs_cost_yearly_figure(df: pd.DataFrame, min_minutes: int = 500, max_cost: float = None, position: str = None):
+    """
+    Builds a scatter plot of Points Scored vs Cost, filtered by maximum cost and position.
 
-    # Step 1: Filter DataFrame by minimum minutes played
-    filtered_df = df[df["minutes"] > min_minutes]
-    filtered_df["now_cost_m"] = filtered_df["now_cost"] / 10  # Convert cost to millions
+    The filters are applied here rather than in the browser, so the figure carries each
+    player once instead of a copy of every trace per slider step.
+
+    Parameters:
+    - df (pd.DataFrame): Player data.
+    - min_minutes (int): Players with fewer minutes are left out.
+    - max_cost (float): Most expensive cost (in £M) to show, or None for all.
+    - position (str): Position to show, or None for all.
 
-    # Positions
+    Returns:
+    - fig (go.Figure): The chart.
+    """
+
+    # Step 1: Filter DataFrame by minimum minutes played, cost and position
+    filtered_df = df[df["minutes"] > min_minutes]
     positions = filtered_df['position'].unique().tolist()
+    if max_cost is not None:
+        filtered_df = filtered_df[filtered_df['now_cost_m'] <= max_cost]
+    if position is not None:
+        positions = [position]
+
     fig = go.Figure()
 
     # Step 2: Create scatter plot with POSITION_COLORS
@@ -436,89 +484,22 @@ def total_points_vs_cost_yearly(df: pd.DataFrame, min_minutes: int = 500):
                     line=dict(width=1, color='white'),
                     color=POSITION_COLORS.get(pos, COLOR_PALETTE['Gray'])  # Fallback to Gray if not found
                 ),
-                customdata=position_data[['web_name', 'position']],
+                customdata=position_data[['web_name']],
                 hovertemplate=(
                     '<b>%{customdata[0]}</b><br>'
-                    'Position: %{customdata[1]}<br>'
+                    f'Position: {pos}<br>'
                     'Cost: £%{x:.1f}M<br>'
                     'Points: %{y}<extra></extra>'
                 )
             )
         )
 
-    # Step 3: Create dropdown for position filtering
-    dropdown_buttons = [
-        dict(
-            label="All Positions",
-            method="update",
-            args=[
-                {"visible": [True] * len(fig.data)},  # Show all traces
-                {"title": "Player Points vs. Cost (All Positions)"}
-            ]
-        )
-    ]
-
-    for i, pos in enumerate(positions):
-        dropdown_buttons.append(
-            dict(
-                label=pos,
-                method="update",
-                args=[
-                    {"visible": [trace.name == pos for trace in fig.data]},
-                    {"title": f"Player Points vs. Cost ({pos})"}
-                ]
-            )
-        )
-
-    # Step 4: Add slider for max cost filtering
-    max_cost = int(filtered_df['now_cost_m'].max())
-    min_cost = int(filtered_df['now_cost_m'].min())
-
-    steps = []
-    for cost in range(min_cost, max_cost + 1):
-        step = dict(
-            method="restyle",
-            args=[
-                {
-                    "x": [trace.x[trace.x <= cost] if trace.x is not None else [] for trace in fig.data],
-                    "y": [trace.y[trace.x <= cost] if trace.y is not None else [] for trace in fig.data]
-                }
-            ],
-            label=f"{cost}M"
-        )
-        steps.append(step)
-
-    sliders = [dict(
-        active=0,
-        currentvalue={"prefix": "Max Cost: £", "font": {"color": "white", "size": 12}},
-        pad={"t": 50, "b": 20},
-        steps=steps,
-        transition={"duration": 0},
-        lenmode="fraction",
-        len=1.0,
-        # bgcolor='#d90050',
-        # bordercolor="#ccc",
-        borderwidth=1
-    )]
-
-    # Step 5: Update layout with dropdown and sliders
+    # Step 3: Update layout
+    title = f"Player Points vs. Cost ({position or 'All Positions'}"
+    title += f", up to £{max_cost:.1f}M)" if max_cost is not None else ")"
     fig.update_layout(
-        sliders=sliders,
-        updatemenus=[
-            dict(
-                buttons=dropdown_buttons,
-                direction="down",
-                showactive=True,
-                x=0.8,
-                y=1,
-                bgcolor="#9EFDFF",
-                bordercolor='#d90050',
-                borderwidth=1,
-                font=dict(color="black")
-            )
-        ],
         title={
-            "text": "Player Points vs. Cost in FPL",
+            "text": title,
             "x": 0.5, "xanchor": "center",
             "y": 0.9, "yanchor": "top",
             "font": {"color": "white", "size": 14}
@@ -540,11 +521,6 @@ def total_points_vs_cost_yearly(df: pd.DataFrame, min_minutes: int = 500):
             titlefont=dict(color="white"),
             tickfont=dict(color='white')
         ),
-        #height=700,
-        #width=1000,
-        # paper_bgcolor='#E0FEFF',
-        # plot_bgcolor='#E0FEFF',
-
         font=dict(
             family="Arial, sans-serif",
             color='white',
@@ -553,12 +529,42 @@ def total_points_vs_cost_yearly(df: pd.DataFrame, min_minutes: int = 500):
         template='plotly_dark',
     )
 
+    return fig
+
+@st.fragment
+def total_points_vs_cost_yearly(df: pd.DataFrame, min_minutes: int = 500, version: str = None):
+    """
+    Plots a scatter plot of Points Scored vs Cost that can dynamically be adjusted based on position and cost.
+
+    The position and maximum cost are Streamlit widgets; the chart runs as a fragment, so moving
+    them redraws only this chart. If the `version` of `df` is given, the figure is served from
+    the shared figure cache.
+    """
+    costs = df.loc[df["minutes"] > min_minutes, "now_cost_m"]
+    if costs.empty:
+        st.write("**No players have played enough minutes yet.**")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        positions = ['All Positions'] + [pos for pos in POSITION_FULL_NAMES if pos in set(df['position'])]
+        position = st.selectbox("Position", positions, key='points_vs_cost_position')
+    with col2:
+        min_cost, max_cost = float(costs.min()), float(costs.max())
+        cost_limit = st.slider("Max Cost (£M)", min_value=min_cost, max_value=max_cost, value=max_cost,
+                               step=0.5, key='points_vs_cost_max_cost')
+
+    position = None if position == 'All Positions' else position
+    cost_limit = None if cost_limit >= max_cost else cost_limit
+    if version is None:
+        fig = total_points_vs_cost_yearly_figure(df, min_minutes, cost_limit, position)
+    else:
+        fig = cached_figure(total_points_vs_cost_yearly_figure, df, version, min_minutes, cost_limit, position)
     st.plotly_chart(fig, use_container_width=True)
     
-def plot_gw_performance_by_player(player_name: str, df: pd.DataFrame):
-    """Plot the performance of a player every gameweek."""
+def plot_gw_performance_by_player(player_name: str, player_df: pd.DataFrame):
+    """Plot the performance of a player every gameweek, given the player's gameweek rows."""
     
-    player_df = df[df["name"] == player_name] 
     fig = px.line(
         data_frame = player_df,
         x = 'GW',
@@ -609,10 +615,9 @@ def plot_gw_performance_by_player(player_name: str, df: pd.DataFrame):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_transfers_in_out_by_player(player_name: str, df: pd.DataFrame):
-    """Plots the transfers in vs transfers out of a player every gameweek."""
+def plot_transfers_in_out_by_player(player_name: str, player_df: pd.DataFrame):
+    """Plots the transfers in vs transfers out of a player every gameweek, given the player's gameweek rows."""
 
-    player_df = df[df["name_cleaned"] == player_name]
     fig = go.Figure()
 
     # Add Transfers In line
@@ -691,30 +696,26 @@ def radar_chart_player_comparison(df: pd.DataFrame, player1: str, player2: str,
         'goals_conceded': 'Goals Conceded',
         'selected_by_percent': 'Ownership (%)'
     }
-     # Step 1: Ensure numeric columns for the metrics
-    for metric in metrics:
-        df[metric] = pd.to_numeric(df[metric], errors='coerce')
-
-    # Step 2: Normalize the metrics between 0 and 1
+    # Step 1: Normalize the metrics between 0 and 1
     normalized_df = df.copy()
     for metric in metrics:
         min_val = normalized_df[metric].min()
         max_val = normalized_df[metric].max()
         normalized_df[metric] = (normalized_df[metric] - min_val) / (max_val - min_val)
 
-    # Step 3: Filter data for the two players
+    # Step 2: Filter data for the two players
     players_df = normalized_df[normalized_df['full_name'].isin([player1, player2])]
 
-    # Step 4: Filter only the relevant metrics and player name
+    # Step 3: Filter only the relevant metrics and player name
     players_df = players_df[['full_name'] + metrics]
 
-    # Step 5: Reshape the data for radar plotting
+    # Step 4: Reshape the data for radar plotting
     melted_df = players_df.melt(id_vars='full_name', var_name='metric', value_name='value')
 
     # Map the 'metric' column values to user-friendly labels
     melted_df['metric'] = melted_df['metric'].apply(lambda x: METRIC_LABELS.get(x, x))
 
-    # Step 6: Create radar chart
+    # Step 5: Create radar chart
     fig = px.line_polar(
         melted_df,
         r='value',
@@ -760,13 +761,9 @@ def radar_chart_player_comparison(df: pd.DataFrame, player1: str, player2: str,
     
 def top_n_roi_by_position(df: pd.DataFrame, pos:str, top_n:int = 5):
     """
-    Calculates the ROI of a player per 90 minutes, filtered for minutes played greater than 400 mins. 
-    Returns a bar chart of top_n players per position.
+    Plots the players of a position with the best ROI (points per 90 minutes per £M, precomputed with
+    the player table), filtered for minutes played greater than 400 mins.
     """
-    
-    df["points/90"] = round((df["total_points"]/df["minutes"])*90, 3).fillna(0)
-    df["ROI"] = round(df["points/90"]/df["now_cost_m"],3).fillna(0)
-    
     filtered_df = df[(df["minutes"] > 400) & (df["position"] == pos)].sort_values(by = ["ROI"], ascending=False)[:5]
     
     fig = px.bar(
@@ -788,77 +785,77 @@ def top_n_roi_by_position(df: pd.DataFrame, pos:str, top_n:int = 5):
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def plot_fpl_performance_funnel(df, players, player='full_name', total_points_column='total_points', xp_column='xP'):
-    # Set the background to black
-    plt.style.use('dark_background')
-    # Filter the dataframe for the players in the list
-    df_filtered = df[df[player].isin(players)]
-    # If the filtered dataframe is empty, inform the user
-    if df_filtered.empty:
-        print(f"Error: No players found matching the names in the list {players}")
+def plot_fpl_performance_funnel(stats: pd.DataFrame, player_keys: list):
+    """
+    Plots a funnel plot of points above expectation: each player's mean residual (actual - expected
+    points) against the number of gameweeks it is averaged over, inside the funnel of control limits.
+
+    Parameters:
+    - stats (pd.DataFrame): Residual statistics of every player, from `load_residual_stats`.
+    - player_keys (list of int): Players to highlight; any number.
+    """
+    if stats.empty:
+        st.write("**No gameweek data yet.**")
         return
-    # Calculate the residuals (actual points - expected points)
-    df_filtered['Residual'] = df_filtered[total_points_column] - df_filtered[xp_column]
-    # Calculate mean and standard deviation of the residuals for each player
-    residual_stats = df_filtered.groupby(player)['Residual'].agg(['mean', 'std']).reset_index()
-    # Rename columns to match the original dataframe's player column name
-    residual_stats.rename(columns={'mean': 'mean_residual', 
-                                   'std': 'std_residual'}, inplace=True)
-    # Merge the residual statistics back with the original filtered dataframe
-    df_filtered = pd.merge(df_filtered, residual_stats[[player, 'mean_residual', 'std_residual']], 
-                           on=player, how='left')
-    # Define custom colors for the first two players (green, red) and others (random colors)
-    colors = ['#04f5ff', '#e90052', 'white']
-    
-    fig, ax = plt.subplots(figsize=(5,5), frameon=False)
-    custom_palette = sns.color_palette(['#04f5ff', '#e90052'])
-    # Scatter plot of actual points (total_points) vs expected points (xP)
-    sns.scatterplot(data=df_filtered, 
-                    x=xp_column, 
-                    y=total_points_column, 
-                    hue=player,      # Color by player name
-                    style=player,    # Different marker for each player
-                    palette=custom_palette,   # Choose a palette for colors
-                    markers='o',      # Use circle markers (default)
-                    size='Residual',  # Size by residual
-                    sizes=(20, 200),  # Adjust size range
-                    alpha=0.8, 
-                    ax=ax)        # Set transparency for better visibility
-    # Set distinct colors for players, with the first two being green and red
-    color_map = sns.color_palette("Set2", len(players))  # Generate a color palette for the players
-    player_colors = {players[i]: colors[i] for i in range(len(players))}  # Assign colors
-    # Plot the funnel plot bounds for each player with different colors
-    for player_name, group in df_filtered.groupby(player):
-        player_mean = group['mean_residual'].iloc[0]
-        
-        # Get the player's color from the color_map
-        player_color = player_colors.get(player_name, 'gray')
-        # Plot bounds for each player with their specific color
-        ax.axhline(player_mean, color=player_color, linestyle='--', label=f'{player_name} Mean Residual')
-    # Labels and title
-    ax.set_title("FPL Performance Funnel Plot:\nActual vs Expected Points", fontsize=12, color='white')
-    ax.set_xlabel(f"Expected Points ({xp_column})", fontsize=10, color='white')
-    ax.set_ylabel(f"Total Points ({total_points_column})", fontsize=10, color='white')
-    ax.legend(title="Player Performance", loc="upper left", bbox_to_anchor=(0.01, -0.25), frameon=False, labelcolor='white')
-    plt.grid(alpha=0.25)
-    st.pyplot(fig, use_container_width=True)
-
-
-def ownership_vs_points_bubble_chart_with_dropdown(df: pd.DataFrame, min_ownership_pct: float):
+    player_keys = [key for key in player_keys if key in stats.index]
+    if not player_keys:
+        st.write("**No gameweek data found for the selected players.**")
+        return
+
+    limits = funnel_limits(stats)
+    fig = go.Figure()
+
+    # Funnel: control limits narrow as a player's mean is taken over more gameweeks
+    fig.add_trace(go.Scatter(x=limits.index, y=limits['mean'], mode='lines', name='Average',
+                             line=dict(color='white', dash='dash', width=1), hoverinfo='skip'))
+    for label, dash in zip(FUNNEL_LIMITS, ['dot', 'dashdot']):
+        for side in ['lower', 'upper']:
+            fig.add_trace(go.Scatter(
+                x=limits.index, y=limits[f'{side} {label}'], mode='lines', name=f'{label} limits',
+                line=dict(color='gray', dash=dash, width=1), legendgroup=label,
+                showlegend=(side == 'upper'), hoverinfo='skip',
+            ))
+
+    # Every player, for context
+    fig.add_trace(go.Scatter(
+        x=stats['n'], y=stats['mean_residual'], mode='markers', name='All Players',
+        marker=dict(color='gray', size=5, opacity=0.35),
+        customdata=stats[['full_name']],
+        hovertemplate='%{customdata[0]}<br>Gameweeks: %{x}<br>Mean Residual: %{y:.2f}<extra></extra>',
+    ))
+
+    # Selected players: the first two in the app's player colors, the rest from a qualitative palette
+    colors = ['#04f5ff', '#e90052'] + px.colors.qualitative.Set2
+    for i, key in enumerate(player_keys):
+        row = stats.loc[key]
+        fig.add_trace(go.Scatter(
+            x=[row['n']], y=[row['mean_residual']], mode='markers', name=row['full_name'],
+            marker=dict(color=colors[i % len(colors)], size=14, line=dict(width=1, color='white')),
+            error_y=dict(type='data', array=[FUNNEL_LIMITS['95%'] * row['se_residual']], visible=True),
+            hovertemplate=(
+                f"<b>{row['full_name']}</b><br>Gameweeks: %{{x}}<br>Mean Residual: %{{y:.2f}}"
+                f"<br>Std: {row['std_residual']:.2f}<extra></extra>"
+            ),
+        ))
+
+    fig.update_layout(
+        title=dict(text="FPL Performance Funnel Plot:<br>Actual - Expected Points per Gameweek", x=0.5, xanchor='center'),
+        xaxis_title="Gameweeks",
+        yaxis_title="Mean Residual (Actual - xP)",
+        legend=dict(orientation='h', yanchor='top', y=-0.2),
+        template='plotly_dark',
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def ownership_vs_points_bubble_chart_figure(df: pd.DataFrame, min_ownership_pct: float):
     """
-    Create a bubble chart with a dropdown to filter by player position.
+    Builds a bubble chart with a dropdown to filter by player position.
     Parameters:
         df (pd.DataFrame): The dataset containing player stats.
         min_ownership_pct (float): The maximum ownership percentage for filtering players.
     """
-    # Step 1: Ensure required columns are numeric
-    df["now_cost_m"] = df["now_cost"]/10
-    df["points/90"] = round((df["total_points"]/df["minutes"])*90, 3).fillna(0)
-    df["ROI"] = round(df["points/90"]/df["now_cost_m"],3).fillna(0)
-    df['selected_by_percent'] = pd.to_numeric(df['selected_by_percent'], errors='coerce')
-    df['total_points'] = pd.to_numeric(df['total_points'], errors='coerce')
-    df['now_cost_m'] = pd.to_numeric(df['now_cost_m'], errors='coerce')
-    df['ROI'] = pd.to_numeric(df['ROI'], errors='coerce')
+    # Step 1: Cost in millions and ROI come precomputed with the player table (see add_derived_metrics)
     # Step 2: Get unique positions
     positions = df['position'].unique()
     # Step 3: Filter data for each position
@@ -947,10 +944,25 @@ def ownership_vs_points_bubble_chart_with_dropdown(df: pd.DataFrame, min_ownersh
         }
 
     )
+    return fig
+
+def ownership_vs_points_bubble_chart_with_dropdown(df: pd.DataFrame, min_ownership_pct: float, version: str = None):
+    """
+    Create a bubble chart with a dropdown to filter by player position.
+
+    If the `version` of `df` is given, the figure is served from the shared figure cache.
+    """
+    if version is None:
+        fig = ownership_vs_points_bubble_chart_figure(df, min_ownership_pct)
+    else:
+        fig = cached_figure(ownership_vs_points_bubble_chart_figure, df, version, min_ownership_pct)
     # Show the chart
     st.plotly_chart(fig, use_container_width=False)
     
 def plot_player_vs_avg_actual_points(df, full_name):
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
+
     # Filter the data for the specific player
     player_data = df[df['name'] == full_name]
     # Find the player's position